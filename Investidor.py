@@ -1,99 +1,42 @@
 import streamlit as st
-import matplotlib.pyplot as plt
-import sqlite3
 import os
-
-# Função para criar/abrir conexão com o banco de dados SQLite
-def conectar_bd():
-    conn = sqlite3.connect('clientes.db')
-    return conn
-
-# Função para criar a tabela no banco de dados, se não existir
-def criar_tabela(conn):
-    conn.execute('''
-        CREATE TABLE IF NOT EXISTS clientes (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            nome TEXT,
-            telefone TEXT,
-            email TEXT,
-            investidor TEXT,
-            capital TEXT,
-            patrimonio REAL,
-            valor_virtus REAL,
-            reserva_emergencia REAL,
-            custos_abertura REAL,
-            custos_trafego REAL,
-            treinamento_empresarial REAL,
-            infraestrutura REAL
-        )
-    ''')
-    conn.commit()
-
-# Função para salvar os dados do cliente no banco de dados
-def salvar_dados(conn, nome, telefone, email, investidor, capital, alocacao):
-    conn.execute('''
-        INSERT INTO clientes 
-        (nome, telefone, email, investidor, capital, patrimonio, valor_virtus, reserva_emergencia, custos_abertura, custos_trafego, treinamento_empresarial, infraestrutura) 
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-    ''', (nome, telefone, email, investidor, capital, alocacao['Valor em Patrimônio'], alocacao['10% para o valor de investimento na Virtus'], 
-          alocacao['30% para reserva de emergência'], alocacao['10% para custos de abertura'], alocacao['20% para custos de tráfego'], 
-          alocacao['15% para Treinamento Empresarial'], alocacao['15% para infraestrutura']))
-    conn.commit()
-
-# Função para mostrar as informações de alocação e gerar o gráfico de pizza
+import sqlite3
+import database
+import alocacao as alocacao_engine
+import graficos
+import metrics
+import leads
+import group_commit
+import migrations
+
+# Função para salvar os dados do cliente no banco de dados.
+# O mesmo e-mail ou telefone atualiza o cliente já cadastrado. Envios
+# simultâneos são gravados juntos pelo escritor do group_commit; o id volta
+# depois do COMMIT. Em caso de erro mostra a mensagem e retorna None. Se o
+# banco demorar e a gravação ainda estiver em andamento, sai
+# group_commit.WritePending.
+@metrics.timed('investidor.salvar_dados')
+def salvar_dados(nome, telefone, email, investidor, capital, alocacao):
+    dados = {'nome': nome, 'telefone': telefone, 'email': email, 'investidor': investidor, 'capital': capital}
+    dados.update(zip(alocacao_engine.COLUNAS, (alocacao[rotulo] for rotulo in alocacao_engine.ROTULOS)))
+    try:
+        cliente_id, _ = group_commit.write(database.CLIENTES_DB, lambda conn: leads.upsert(conn, 'clientes', dados))
+        return cliente_id
+    except group_commit.WritePending:
+        raise
+    except (sqlite3.Error, ValueError, TimeoutError) as e:
+        st.error(f"Erro ao salvar os dados: {e}")
+
+# Função para mostrar as informações de alocação e gerar o gráfico de pizza.
+# O gráfico vem do cache de graficos.py (PNG já renderizado).
+@metrics.timed('investidor.alocacao_e_grafico')
 def mostrar_alocacao_e_grafico(investidor, capital):
-    alocacoes = {
-        'Inicial': {
-            '20mil': {'Valor em Patrimônio': 60000, '10% para o valor de investimento na Virtus': 2000, '30% para reserva de emergência': 6000,
-                      '10% para custos de abertura': 2000, '20% para custos de tráfego': 4000, '15% para Treinamento Empresarial': 3000,
-                      '15% para infraestrutura': 3000},
-            '40mil': {'Valor em Patrimônio': 120000, '10% para o valor de investimento na Virtus': 4000, '30% para reserva de emergência': 12000,
-                      '10% para custos de abertura': 4000, '20% para custos de tráfego': 8000, '15% para Treinamento Empresarial': 6000,
-                      '15% para infraestrutura': 6000},
-            '60mil': {'Valor em Patrimônio': 180000, '10% para o valor de investimento na Virtus': 6000, '30% para reserva de emergência': 18000,
-                      '10% para custos de abertura': 6000, '20% para custos de tráfego': 12000, '15% para Treinamento Empresarial': 9000,
-                      '15% para infraestrutura': 9000},
-            '80mil': {'Valor em Patrimônio': 240000, '10% para o valor de investimento na Virtus': 8000, '30% para reserva de emergência': 24000,
-                      '10% para custos de abertura': 8000, '20% para custos de tráfego': 16000, '15% para Treinamento Empresarial': 12000,
-                      '15% para infraestrutura': 12000},
-            '100mil': {'Valor em Patrimônio': 300000, '10% para o valor de investimento na Virtus': 10000, '30% para reserva de emergência': 30000,
-                       '10% para custos de abertura': 10000, '20% para custos de tráfego': 20000, '15% para Treinamento Empresarial': 15000,
-                       '15% para infraestrutura': 15000}
-        },
-        'Intermediário': {
-            '200mil': {'Valor em Patrimônio': 600000, '10% para o valor de investimento na Virtus': 20000, '30% para reserva de emergência': 60000,
-                       '10% para custos de abertura': 20000, '20% para custos de tráfego': 40000, '15% para Treinamento Empresarial': 30000,
-                       '15% para infraestrutura': 30000},
-            '400mil': {'Valor em Patrimônio': 1200000, '10% para o valor de investimento na Virtus': 40000, '30% para reserva de emergência': 120000,
-                       '10% para custos de abertura': 40000, '20% para custos de tráfego': 80000, '15% para Treinamento Empresarial': 60000,
-                       '15% para infraestrutura': 60000},
-            '600mil': {'Valor em Patrimônio': 1800000, '10% para o valor de investimento na Virtus': 60000, '30% para reserva de emergência': 180000,
-                       '10% para custos de abertura': 60000, '20% para custos de tráfego': 120000, '15% para Treinamento Empresarial': 90000,
-                       '15% para infraestrutura': 90000},
-            '800mil': {'Valor em Patrimônio': 2400000, '10% para o valor de investimento na Virtus': 80000, '30% para reserva de emergência': 240000,
-                       '10% para custos de abertura': 80000, '20% para custos de tráfego': 160000, '15% para Treinamento Empresarial': 120000,
-                       '15% para infraestrutura': 120000},
-            '1milhão': {'Valor em Patrimônio': 3000000, '10% para o valor de investimento na Virtus': 100000, '30% para reserva de emergência': 300000,
-                        '10% para custos de abertura': 100000, '20% para custos de tráfego': 200000, '15% para Treinamento Empresarial': 150000,
-                        '15% para infraestrutura': 150000}
-        },
-        'Avançado': {
-            '1milhão': {'Valor em Patrimônio': 3000000, '10% para o valor de investimento na Virtus': 100000, '30% para reserva de emergência': 300000,
-                        '10% para custos de abertura': 100000, '20% para custos de tráfego': 200000, '15% para Treinamento Empresarial': 150000,
-                        '15% para infraestrutura': 150000}
-        }
-    }
-    alocacao = alocacoes[investidor][capital]
-    
-    # Criar gráfico de pizza
-    labels = list(alocacao.keys())[1:]  # Excluir 'Valor em Patrimônio'
-    sizes = list(alocacao.values())[1:]  # Excluir 'Valor em Patrimônio'
-    
-    fig, ax = plt.subplots()
-    ax.pie(sizes, labels=labels, autopct='%1.1f%%', startangle=90, colors=plt.cm.Paired(range(len(labels))))
-    ax.axis('equal')  # Equal aspect ratio ensures that pie is drawn as a circle.
+    alocacao = alocacao_engine.alocacao_por_nivel(investidor, capital)
+    grafico = graficos.grafico_alocacao(investidor, capital)
+    return alocacao, grafico
 
-    return alocacao, fig
+# Renderiza os gráficos em segundo plano para que nenhum usuário espere o primeiro
+graficos.aquecer_em_segundo_plano()
 
 # Título da aplicação
 st.title('Olá')
@@ -126,20 +69,13 @@ investidor = st.selectbox(
 )
 
 # Níveis de capital para cada tipo de investidor
-nivels_capital = {
-    'Inicial': ['20mil', '40mil', '60mil', '80mil', '100mil'],
-    'Intermediário': ['200mil', '400mil', '600mil', '800mil', '1milhão'],
-    'Avançado': ['1milhão']
-}
-
 capital = st.selectbox(
     'Selecione o capital disponível:',
-    nivels_capital[investidor]
+    alocacao_engine.NIVEIS_CAPITAL[investidor]
 )
 
-# Conectar ao banco de dados e criar a tabela, se não existir
-conn = conectar_bd()
-criar_tabela(conn)
+# Criar e atualizar a tabela (uma vez por processo, não a cada interação)
+migrations.ensure_migrated(database.CLIENTES_DB)
 
 # Botão para enviar os dados e gerar o gráfico
 if st.button('Enviar'):
@@ -148,22 +84,26 @@ if st.button('Enviar'):
     # Exibir as informações de alocação
     st.subheader('Informações de Alocação de Capital')
     for key, value in alocacao.items():
-        st.write(f"{key}: {value}")
+        st.write(f"{key}: R$ {value:,.2f}")
     
     # Exibir o gráfico de pizza
     st.subheader('Distribuição do Capital')
-    st.pyplot(grafico)
+    st.image(grafico)
     
-    # Salvar os dados no banco de dados
-    salvar_dados(conn, nome, telefone, email, investidor, capital, alocacao)
-    
-    # Manter a mensagem e o link que você pediu para não mudar
-    st.success(
-        "Teste realizado com sucesso! Vou dar uma olhada no seu perfil e te contatar em breve. Enquanto isso, conheça mais sobre nossos serviços e oportunidades em nosso site oficial: [Visite nosso site](https://perfildecliente-bx5se8ftwibx9xprerpcrd.streamlit.app)."
-    )
-
-# Fechar a conexão com o banco de dados
-conn.close()
+    # Salvar os dados no banco de dados (a mensagem de sucesso só aparece depois do COMMIT)
+    try:
+        salvo = salvar_dados(nome, telefone, email, investidor, capital, alocacao) is not None
+    except group_commit.WritePending:
+        # O banco demorou, mas a gravação continua: um novo envio duplicaria o cadastro
+        salvo = False
+        st.info("O banco está ocupado: seus dados ainda estão sendo gravados e aparecerão em instantes. "
+                "Não é preciso enviar de novo.")
+
+    if salvo:
+        # Manter a mensagem e o link que você pediu para não mudar
+        st.success(
+            "Teste realizado com sucesso! Vou dar uma olhada no seu perfil e te contatar em breve. Enquanto isso, conheça mais sobre nossos serviços e oportunidades em nosso site oficial: [Visite nosso site](https://perfildecliente-bx5se8ftwibx9xprerpcrd.streamlit.app)."
+        )
 
 # Manter o link que você pediu para não mudar
 st.markdown(
@@ -1,32 +1,392 @@
-import streamlit as st
+import os
 import sqlite3
-import pandas as pd
-from io import BytesIO
+import math
+import zlib
+import time
+import shutil
+import secrets
+import tempfile
+import streamlit as st
+import database
+import file_index
+import search
+import bulk_import
+import query_cache
+import segments
+import metrics
+import schema
+import leads
+import summaries
+import migrations
+import thumbnails
+import reports
+import upload_queue
+import alocacao as alocacao_engine
+
+# O pandas é importado dentro das funções que montam DataFrames, para não
+# pesar na abertura do painel.
+
+# zstd é opcional; sem o pacote a exportação oferece apenas gzip
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Tamanho dos blocos lidos/comprimidos durante a exportação do banco
+EXPORT_CHUNK_SIZE = 1024 * 1024
+
+# Exportações servidas pelo Streamlit em /app/static (server.enableStaticServing
+# em .streamlit/config.toml). O servidor lê o arquivo em blocos durante o
+# download, então nem o painel nem o servidor carregam a exportação na memória.
+EXPORT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static', 'exports')
+EXPORT_URL = 'app/static/exports'
+# Exportações mais antigas que isso (s) são apagadas na próxima exportação
+EXPORT_TTL = 60 * 60
+# Maior arquivo servido pelo Streamlit em /app/static
+EXPORT_MAX_BYTES = 200 * 1024 * 1024
+
+# Formatos de exportação: compressão -> extensão
+EXPORT_FORMATS = {
+    None: '',
+    'gzip': '.gz',
+    'zstd': '.zst',
+}
+
+# Quantidade de registros exibidos por página
+PAGE_SIZE = 50
 
-# Função para conectar ao banco de dados e buscar os dados
+# Colunas filtráveis de cada tabela (os índices são criados pelas migrações)
+FILTER_COLUMNS = schema.FILTER_COLUMNS
+
+# Função para conectar ao banco de dados e buscar os dados.
+# As leituras do painel passam pelo query_cache e só vão ao banco quando
+# houve escrita desde a última vez (PRAGMA data_version).
 def view_data(db_name, table_name):
-    conn = sqlite3.connect(db_name)
+    import pandas as pd
     query = f"SELECT * FROM {table_name}"
-    df = pd.read_sql_query(query, conn)
-    conn.close()
-    return df
 
-# Função para criar um botão de download para o banco de dados
-def download_database(db_name):
-    conn = sqlite3.connect(db_name)
-    with BytesIO() as buffer:
-        for line in conn.iterdump():
-            buffer.write(f"{line}\n".encode())
-        buffer.seek(0)
-        return buffer.read()
+    def read():
+        with database.connection(db_name) as conn:
+            return pd.read_sql_query(query, conn)
+    return query_cache.cached(db_name, ('frame', query), read)
+
+# Função para montar a cláusula WHERE dos filtros por prefixo.
+# O prefixo vira um intervalo (>= valor AND < valor + '\uffff') para usar o índice.
+# Os filtros de segmento (listas de profiles) usam o índice de profile_tags.
+def build_filters(filters, segment_filters=None):
+    clauses, params = [], []
+    for column, value in filters.items():
+        if value:
+            clauses.append(f"{column} >= ? AND {column} < ?")
+            params.extend([value, value + '\uffff'])
+    if segment_filters:
+        clause, segment_params = segments.segment_clause(segment_filters)
+        if clause is not None:
+            clauses.append(clause)
+            params.extend(segment_params)
+    return clauses, params
+
+# Função para contar os registros que atendem aos filtros
+def count_rows(db_name, table_name, filters=None, segment_filters=None):
+    clauses, params = build_filters(filters or {}, segment_filters)
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    query = f"SELECT COUNT(*) FROM {table_name} {where}"
+
+    def read():
+        with database.connection(db_name) as conn:
+            return conn.execute(query, params).fetchone()[0]
+    return query_cache.cached(db_name, ('scalar', query, tuple(params)), read)
+
+# Função para buscar uma página de dados com paginação por chave (seek) no id
+def fetch_page(db_name, table_name, filters=None, after_id=None, descending=False, page_size=PAGE_SIZE,
+               segment_filters=None):
+    import pandas as pd
+    clauses, params = build_filters(filters or {}, segment_filters)
+    if after_id is not None:
+        clauses.append("id < ?" if descending else "id > ?")
+        params.append(after_id)
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    order = "DESC" if descending else "ASC"
+    query = f"SELECT * FROM {table_name} {where} ORDER BY id {order} LIMIT ?"
+    params.append(page_size)
+
+    def read():
+        with database.connection(db_name) as conn:
+            return pd.read_sql_query(query, conn, params=params)
+    return query_cache.cached(db_name, ('frame', query, tuple(params)), read)
+
+# Função para voltar a navegação da tabela para a primeira página
+def reset_pagination(table_name):
+    st.session_state[f"cursors_{table_name}"] = [None]
+
+# Função para exibir os filtros de segmento (tipo de cliente, serviços, etc.)
+def segment_filter_widgets(db_name):
+    has_tags = database.fetch_all(
+        db_name, "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'profile_tags'")
+    if not has_tags:
+        return {}
+    segment_filters = {}
+    with st.expander("Filtrar por segmento"):
+        for attribute in segments.SEGMENT_ATTRIBUTES:
+            options = query_cache.cached(db_name, ('segment_values', attribute),
+                                         lambda: segments.attribute_values(attribute, db_name))
+            segment_filters[attribute] = st.multiselect(
+                attribute, [value for value, _ in options], key=f"segment_{attribute}")
+    return segment_filters
+
+# Função para exibir a tabela paginada, com filtros e ordenação feitos no SQL
+def browse_table(db_name, table_name):
+    columns = FILTER_COLUMNS[table_name]
+    filter_cols = st.columns(len(columns) + 1)
+    filters = {}
+    for col, column in zip(filter_cols, columns):
+        filters[column] = col.text_input(f"Filtrar {column}", key=f"filter_{table_name}_{column}")
+    descending = filter_cols[-1].checkbox("Mais recentes primeiro", value=True, key=f"desc_{table_name}")
+    segment_filters = segment_filter_widgets(db_name) if table_name == 'profiles' else {}
+
+    # Volta para a primeira página quando os filtros ou a ordenação mudam
+    signature = (tuple(filters.items()), tuple((k, tuple(v)) for k, v in segment_filters.items()), descending)
+    if st.session_state.get(f"signature_{table_name}") != signature:
+        st.session_state[f"signature_{table_name}"] = signature
+        reset_pagination(table_name)
+    cursors = st.session_state[f"cursors_{table_name}"]
+
+    total = count_rows(db_name, table_name, filters, segment_filters)
+    df = fetch_page(db_name, table_name, filters, after_id=cursors[-1], descending=descending,
+                    segment_filters=segment_filters)
+    if table_name == 'profiles':
+        display_data(with_thumbnails(df, db_name), {'logo': st.column_config.ImageColumn("Logo", width="small")})
+    else:
+        display_data(df)
+
+    page, pages = len(cursors), max(1, math.ceil(total / PAGE_SIZE))
+    prev_col, info_col, next_col = st.columns([1, 3, 1])
+    if prev_col.button("Anterior", disabled=page == 1, key=f"prev_{table_name}"):
+        cursors.pop()
+        st.rerun()
+    info_col.write(f"Página {page} de {pages} ({total} registros)")
+    if next_col.button("Próxima", disabled=page >= pages or df.empty, key=f"next_{table_name}"):
+        cursors.append(int(df['id'].iloc[-1]))
+        st.rerun()
+
+# Função para criar o compressor de um formato de exportação
+def make_compressor(compression):
+    if compression == 'gzip':
+        return zlib.compressobj(6, zlib.DEFLATED, 31)
+    if compression == 'zstd':
+        if zstandard is None:
+            raise RuntimeError("Compressão zstd indisponível: instale o pacote zstandard.")
+        return zstandard.ZstdCompressor(level=3).compressobj()
+    return None
+
+# Função para ler um arquivo em blocos, comprimindo cada bloco se necessário
+def iter_export_chunks(path, compression=None, chunk_size=EXPORT_CHUNK_SIZE):
+    compressor = make_compressor(compression)
+    with open(path, 'rb') as f:
+        while chunk := f.read(chunk_size):
+            yield compressor.compress(chunk) if compressor else chunk
+    if compressor:
+        yield compressor.flush()
+
+# Função para apagar as exportações com mais de EXPORT_TTL segundos
+def remove_old_exports(now=None):
+    now = time.time() if now is None else now
+    if not os.path.isdir(EXPORT_DIR):
+        return
+    for name in os.listdir(EXPORT_DIR):
+        path = os.path.join(EXPORT_DIR, name)
+        try:
+            if now - os.stat(path).st_mtime > EXPORT_TTL:
+                shutil.rmtree(path)
+        except OSError:
+            continue
+
+# Função para exportar o banco de dados para download.
+# Tira um snapshot com a API de backup e comprime em blocos direto para
+# EXPORT_DIR/<token>/, onde o Streamlit serve o arquivo sem lê-lo inteiro.
+# O token aleatório é o que protege o link: o diretório não é listado.
+# Retorna (caminho, URL relativa, nome do arquivo).
+def download_database(db_name, compression=None):
+    remove_old_exports()
+    token = secrets.token_urlsafe(24)
+    export_dir = os.path.join(EXPORT_DIR, token)
+    os.makedirs(export_dir)
+    file_name = os.path.basename(db_name) + EXPORT_FORMATS[compression]
+    path = os.path.join(export_dir, file_name)
+    fd, snapshot_path = tempfile.mkstemp(suffix='.db')
+    os.close(fd)
+    try:
+        database.backup_to(db_name, snapshot_path)
+        with open(path + '.tmp', 'wb') as export:
+            for chunk in iter_export_chunks(snapshot_path, compression):
+                export.write(chunk)
+        os.replace(path + '.tmp', path)
+    except BaseException:
+        shutil.rmtree(export_dir, ignore_errors=True)
+        raise
+    finally:
+        os.remove(snapshot_path)
+    return path, f"{EXPORT_URL}/{token}/{file_name}", file_name
+
+# Função para acrescentar a coluna de miniaturas dos logotipos a uma página de perfis.
+# As miniaturas vêm do cache de thumbnails.py; os originais não são abertos.
+def with_thumbnails(df, db_name):
+    if df.empty:
+        return df
+    df = df.copy()
+    df.insert(1, 'logo', thumbnails.thumbnail_column(df['logo_path'].tolist(), db_name))
+    return df
 
 # Função para exibir os dados em uma tabela
-def display_data(df):
+def display_data(df, column_config=None):
     if df.empty:
         st.write("Nenhum dado encontrado.")
         return
     st.write("**Dados Enviados:**")
-    st.dataframe(df)
+    st.dataframe(df, column_config=column_config)
+
+# Função para exibir o resumo de armazenamento (arquivos locais e no Drive)
+def display_storage_summary():
+    summary = file_index.storage_summary()
+    st.write("**Diretórios locais:**")
+    st.dataframe(summary['local'])
+    st.write("**Google Drive (deduplicado por conteúdo):**")
+    st.dataframe([summary['drive']])
+
+# Função para exibir os envios ao Drive que esgotaram as tentativas.
+# Cada envio pode voltar à fila ou ser descartado (o perfil fica sem o arquivo).
+def display_failed_uploads():
+    jobs = upload_queue.failed_jobs()
+    if not jobs:
+        st.write("Nenhum envio com falha.")
+        return
+    st.dataframe(jobs)
+    labels = {job['id']: f"#{job['id']} {job['file_name']} (perfil {job['profile_id']})" for job in jobs}
+    selected = st.multiselect("Envios", list(labels), format_func=labels.get)
+    retry_column, discard_column = st.columns(2)
+    if retry_column.button("Tentar de Novo", disabled=not selected):
+        st.session_state['flash'] = f"{upload_queue.requeue(selected)} envios devolvidos à fila."
+        st.rerun()
+    if discard_column.button("Descartar", disabled=not selected):
+        st.session_state['flash'] = f"{upload_queue.discard_failed(selected)} envios descartados."
+        st.rerun()
+
+# Função para exibir a busca textual nos perfis
+def display_profile_search():
+    text = st.text_input("Buscar por empresa, área, serviços, contexto ou dificuldades")
+    if not text:
+        return
+    results = search.search_profiles(text)
+    if not results:
+        st.write("Nenhum perfil encontrado.")
+        return
+    for result in results:
+        st.markdown(f"**#{result['id']}** {result['company_highlight'] or ''} "
+                    f"({result['contact_name'] or '-'}, {result['email'] or '-'})  \n{result['snippet'] or ''}")
+
+# Função para exibir a importação em lote de planilhas CSV/XLSX
+def display_bulk_import(db_name, table_name):
+    uploaded = st.file_uploader("Planilha (CSV ou XLSX)", type=['csv', 'xlsx'], key=f"import_{table_name}")
+    if uploaded is None or not st.button("Importar", key=f"import_button_{table_name}"):
+        return
+    status = st.empty()
+
+    def progress(read, inserted, errors):
+        status.write(f"{read} linhas lidas, {inserted} inseridas, {errors} com erro...")
+
+    try:
+        summary = bulk_import.import_file(db_name, table_name, uploaded, uploaded.name, progress)
+    except (ValueError, sqlite3.Error) as e:
+        st.error(f"Erro ao importar planilha: {e}")
+        return
+    status.empty()
+    st.success(f"{summary['inserted']} de {summary['read']} linhas importadas, "
+               f"{summary['updated']} atualizaram leads já cadastrados.")
+    if summary['ignored_columns']:
+        st.warning(f"Colunas ausentes na tabela (ignoradas): {', '.join(summary['ignored_columns'])}")
+    if summary['error_count']:
+        st.error(f"{summary['error_count']} linhas com erro:")
+        st.dataframe(summary['errors'])
+    reset_pagination(table_name)
+
+# Função para exibir a geração dos relatórios em PDF de um mês (ou de todos os
+# cadastros). Os PDFs são gerados no pool de reports.py e gravados num ZIP
+# temporário, entregue pelo botão de download.
+def display_reports(table_name):
+    month = st.text_input("Mês (AAAA-MM, vazio para todos)", key=f"report_month_{table_name}")
+    if not st.button("Gerar Relatórios", key=f"report_button_{table_name}"):
+        return
+    try:
+        since, until = reports.month_range(month) if month else (None, None)
+    except ValueError:
+        st.error("Mês inválido; use o formato AAAA-MM.")
+        return
+    status = st.empty()
+
+    def progress(generated, errors):
+        status.write(f"{generated} relatórios gerados, {errors} com erro...")
+
+    export = tempfile.TemporaryFile()
+    with export:
+        summary = reports.export_zip(export, table_name, since, until, progress)
+        status.empty()
+        if not summary['reports'] and not summary['errors']:
+            st.write("Nenhum cadastro no período.")
+            return
+        if summary['errors']:
+            st.warning(f"{len(summary['errors'])} relatórios com erro (listados em erros.txt).")
+        export.seek(0)
+        file_name = f"relatorios_{table_name}_{month or 'todos'}.zip"
+        st.download_button(label=f"Baixar {file_name}", data=export, file_name=file_name,
+                           mime='application/zip')
+
+# Função para exibir o resumo dos cadastros.
+# Lê só as tabelas de resumo mantidas pelos triggers (summaries.py), sem varrer
+# clientes nem profiles.
+def display_dashboard():
+    import pandas as pd
+    rows = summaries.clientes_summary()
+    total_clientes = sum(row[2] for row in rows)
+    cols = st.columns(4)
+    cols[0].metric("Clientes", total_clientes)
+    cols[1].metric("Patrimônio comprometido", f"R$ {sum(row[3] for row in rows):,.2f}")
+    cols[2].metric("Valor Virtus", f"R$ {sum(row[4] for row in rows):,.2f}")
+    cols[3].metric("Perfis", summaries.row_count(database.PROFILES_DB, 'profiles'))
+
+    if rows:
+        df = pd.DataFrame(rows, columns=['Investidor', 'Capital', 'Clientes', 'Patrimônio', 'Valor Virtus'])
+        st.write("**Clientes por nível de investidor e capital:**")
+        st.dataframe(df, hide_index=True)
+        st.bar_chart(df.groupby('Investidor', sort=False)['Clientes'].sum())
+
+    for attribute, label in zip(summaries.DASHBOARD_ATTRIBUTES, ("Tipo de cliente", "Serviços")):
+        counts = summaries.profile_counts(attribute)
+        if counts:
+            st.write(f"**Perfis por {label.lower()}:**")
+            st.bar_chart(pd.DataFrame(counts, columns=[label, 'Perfis']).set_index(label))
+
+# Função para exibir a página de desempenho: latências recentes e erros por operação,
+# somando as métricas gravadas por todos os aplicativos
+def display_performance():
+    import pandas as pd
+    operations = metrics.collect()
+    if not operations:
+        st.write("Nenhuma operação medida ainda.")
+        return
+    st.dataframe(pd.DataFrame(metrics.summary(operations)), hide_index=True)
+
+    name = st.selectbox("Operação", sorted(operations))
+    data = operations[name]
+    labels = [f"≤ {limit:g} ms" for limit in metrics.BUCKETS_MS] + [f"> {metrics.BUCKETS_MS[-1]:g} ms"]
+    st.write("**Distribuição (desde o início dos processos):**")
+    st.bar_chart(pd.DataFrame({'chamadas': data['buckets']}, index=pd.CategoricalIndex(labels, labels)))
+    if data['recent']:
+        recent = pd.DataFrame(data['recent'], columns=['momento', 'ms', 'erro'])
+        recent['momento'] = pd.to_datetime(recent['momento'], unit='s')
+        st.write(f"**Últimas {len(recent)} chamadas:** {int(recent['erro'].sum())} com erro")
+        st.line_chart(recent.set_index('momento')['ms'])
+    st.download_button("Baixar métricas (Prometheus)", metrics.prometheus_text(operations),
+                       file_name="metrics.prom", mime="text/plain")
 
 # Função para autenticação
 def authenticate():
@@ -39,28 +399,34 @@ def authenticate():
 
 # Função para apagar dados
 def delete_data(db_name, table_name, id):
-    conn = sqlite3.connect(db_name)
-    cursor = conn.cursor()
-    cursor.execute(f"DELETE FROM {table_name} WHERE id=?", (id,))
-    conn.commit()
-    conn.close()
+    database.execute(db_name, f"DELETE FROM {table_name} WHERE id=?", (id,))
 
-# Função para adicionar novos dados
+# Função para adicionar novos dados (validados pelo esquema compartilhado).
+# Um lead já cadastrado (mesmo e-mail, telefone ou CNPJ/CPF) é atualizado.
 def add_data(db_name, table_name, data):
-    conn = sqlite3.connect(db_name)
-    cursor = conn.cursor()
-    placeholders = ', '.join(['?' for _ in data])
-    columns = ', '.join(data.keys())
-    cursor.execute(f"INSERT INTO {table_name} ({columns}) VALUES ({placeholders})", tuple(data.values()))
-    conn.commit()
-    conn.close()
+    with database.transaction(db_name) as conn:
+        return leads.upsert(conn, table_name, data)
 
 # Aplicativo Streamlit
 def main():
     st.title("Painel Administrativo")
 
+    # Migrações dos dois bancos (uma vez por processo)
+    for db_name in migrations.MIGRATIONS:
+        migrations.ensure_migrated(db_name)
+
     if authenticate():
         st.sidebar.title("Opções")
+        page = st.sidebar.radio("Página", ("Dados", "Resumo", "Desempenho"))
+        if page == "Resumo":
+            st.subheader("Resumo")
+            display_dashboard()
+            return
+        if page == "Desempenho":
+            st.subheader("Desempenho")
+            display_performance()
+            return
+
         db_options = st.sidebar.radio("Escolha o banco de dados", ("client_profiles.db", "clientes.db"))
 
         if db_options == "client_profiles.db":
@@ -68,35 +434,62 @@ def main():
         else:
             table_name = "clientes"
 
+        compression_options = [None, 'gzip'] + (['zstd'] if zstandard else [])
+        compression = st.sidebar.selectbox("Compressão", compression_options,
+                                           format_func=lambda c: c or "Nenhuma")
         if st.sidebar.button("Baixar Banco de Dados"):
-            db_content = download_database(db_options)
-            st.download_button(
-                label=f"Baixar {db_options}",
-                data=db_content,
-                file_name=db_options,
-                mime="application/x-sqlite3"
-            )
+            path, url, file_name = download_database(db_options, compression)
+            if os.path.getsize(path) > EXPORT_MAX_BYTES:
+                shutil.rmtree(os.path.dirname(path))
+                st.sidebar.error(f"{file_name} passa de {EXPORT_MAX_BYTES // 1024 ** 2} MB: "
+                                 "escolha uma compressão ou copie o banco direto do servidor.")
+            else:
+                # O atributo download salva o arquivo em vez de abri-lo no navegador
+                st.sidebar.markdown(f'<a href="{url}" download="{file_name}">Baixar {file_name}</a>',
+                                    unsafe_allow_html=True)
+
+        if st.sidebar.checkbox("Mostrar armazenamento"):
+            st.subheader("Armazenamento")
+            display_storage_summary()
+
+        if table_name == "profiles":
+            st.subheader("Buscar Perfis")
+            display_profile_search()
+
+        # Mensagem da última ação, exibida depois do recarregamento da página
+        if 'flash' in st.session_state:
+            st.success(st.session_state.pop('flash'))
 
         # Exibir os dados
-        data_df = view_data(db_options, table_name)
-        display_data(data_df)
+        browse_table(db_options, table_name)
+
+        if table_name == "profiles":
+            st.subheader("Envios ao Drive com Falha")
+            display_failed_uploads()
+
+        st.subheader("Relatórios em PDF")
+        display_reports(table_name)
 
         # Opção para apagar dados
         st.subheader("Excluir Dados")
         id_to_delete = st.number_input("ID do Registro para Excluir:", min_value=1)
         if st.button("Excluir Registro"):
             delete_data(db_options, table_name, id_to_delete)
-            st.success(f"Registro com ID {id_to_delete} excluído com sucesso.")
+            st.session_state['flash'] = f"Registro com ID {id_to_delete} excluído com sucesso."
             # Atualizar a visualização dos dados
-            data_df = view_data(db_options, table_name)
-            display_data(data_df)
+            reset_pagination(table_name)
+            st.rerun()
+
+        # Importação em lote de planilhas
+        st.subheader("Importação em Lote")
+        display_bulk_import(db_options, table_name)
 
         # Opção para adicionar novos dados
         st.subheader("Cadastrar Novo Registro")
         with st.form("add_form"):
             if db_options == "client_profiles.db":
-                name = st.text_input("Nome da Empresa/Cliente")
-                site = st.text_input("Site")
+                company_name = st.text_input("Nome da Empresa/Cliente")
+                website = st.text_input("Site")
                 client_type = st.text_input("Tipo de Cliente (separado por vírgulas)")
                 contact_name = st.text_input("Nome do Contato")
                 city = st.text_input("Cidade")
@@ -104,37 +497,42 @@ def main():
                 phone = st.text_input("Telefone")
                 address = st.text_input("Endereço")
                 no_physical_address = st.checkbox("Não Possuo Endereço Físico")
-                capital_available = st.text_input("Valor de Capital Disponível")
+                capital = st.text_input("Valor de Capital Disponível")
                 desired_revenue = st.text_input("Faturamento Desejado")
-                required_services = st.text_input("Serviços Requeridos (separado por vírgulas)")
-                preferred_payment_method = st.text_input("Forma de Pagamento Preferida (separado por vírgulas)")
-                available_budget = st.text_input("Orçamento Disponível")
+                services = st.text_input("Serviços Requeridos (separado por vírgulas)")
+                payment_methods = st.text_input("Forma de Pagamento Preferida (separado por vírgulas)")
+                source = st.text_input("Como nos conheceu")
                 business_field = st.text_input("Ramo de Negócio")
                 business_type = st.text_input("Tipo de Negócio")
-                context_and_goals = st.text_input("Contexto e Objetivos")
-                desired_return_time = st.text_input("Tempo para Retorno Desejado")
+                context = st.text_input("Contexto e Objetivos")
+                return_time = st.text_input("Tempo para Retorno Desejado")
                 market_analysis = st.checkbox("Análise de Mercado")
-                difficulties_faced = st.text_input("Dificuldades Enfrentadas")
-                cnpj_cpf = st.text_input("CNPJ/CPF")
+                difficulties = st.text_input("Dificuldades Enfrentadas")
+                cnpj_or_cpf = st.text_input("CNPJ/CPF")
+                employees = st.text_input("Número de Funcionários")
                 logo_path = st.text_input("Caminho do Logo")
-                logo_provided = st.checkbox("Logo Fornecida")
 
                 submitted = st.form_submit_button("Cadastrar")
                 if submitted:
+                    def split(text):
+                        return [item.strip() for item in text.split(',') if item.strip()]
+
                     new_data = {
-                        'name': name, 'site': site, 'client_type': ','.join(client_type.split(',')), 'contact_name': contact_name,
-                        'city': city, 'email': email, 'phone': phone, 'address': address, 'no_physical_address': no_physical_address,
-                        'capital_available': capital_available, 'desired_revenue': desired_revenue, 'required_services': ','.join(required_services.split(',')),
-                        'preferred_payment_method': ','.join(preferred_payment_method.split(',')), 'available_budget': available_budget,
-                        'business_field': business_field, 'business_type': business_type, 'context_and_goals': context_and_goals,
-                        'desired_return_time': desired_return_time, 'market_analysis': market_analysis, 'difficulties_faced': difficulties_faced,
-                        'cnpj_cpf': cnpj_cpf, 'logo_path': logo_path, 'logo_provided': logo_provided
+                        'company_name': company_name, 'website': website, 'client_type': split(client_type),
+                        'contact_name': contact_name, 'city': city, 'email': email, 'phone': phone,
+                        'address': address, 'no_physical_address': no_physical_address, 'capital': capital,
+                        'desired_revenue': desired_revenue, 'services': split(services),
+                        'payment_methods': split(payment_methods), 'source': source,
+                        'business_field': business_field, 'business_type': business_type, 'context': context,
+                        'return_time': return_time, 'market_analysis': market_analysis,
+                        'difficulties': difficulties, 'cnpj_or_cpf': cnpj_or_cpf, 'employees': employees,
+                        'logo_path': logo_path
                     }
                     add_data(db_options, table_name, new_data)
-                    st.success("Novo registro adicionado com sucesso.")
+                    st.session_state['flash'] = "Novo registro adicionado com sucesso."
                     # Atualizar a visualização dos dados
-                    data_df = view_data(db_options, table_name)
-                    display_data(data_df)
+                    reset_pagination(table_name)
+                    st.rerun()
             else:
                 nome = st.text_input("Nome")
                 telefone = st.text_input("Telefone")
@@ -144,13 +542,8 @@ def main():
 
                 submitted = st.form_submit_button("Cadastrar")
                 if submitted:
-                    # Defina um dicionário de alocação padrão para exemplo
-                    alocacao = {
-                        'Valor em Patrimônio': 60000, '10% para o valor de investimento na Virtus': 2000,
-                        '30% para reserva de emergência': 6000, '10% para custos de abertura': 2000,
-                        '20% para custos de tráfego': 4000, '15% para Treinamento Empresarial': 3000,
-                        '15% para infraestrutura': 3000
-                    }
+                    # Alocação calculada pelo mesmo motor usado no formulário do investidor
+                    alocacao = alocacao_engine.calcular_alocacao(capital)
                     new_data = {
                         'nome': nome, 'telefone': telefone, 'email': email, 'investidor': investidor,
                         'capital': capital, 'patrimonio': alocacao['Valor em Patrimônio'], 'valor_virtus': alocacao['10% para o valor de investimento na Virtus'],
@@ -159,10 +552,10 @@ def main():
                         'infraestrutura': alocacao['15% para infraestrutura']
                     }
                     add_data(db_options, table_name, new_data)
-                    st.success("Novo registro adicionado com sucesso.")
+                    st.session_state['flash'] = "Novo registro adicionado com sucesso."
                     # Atualizar a visualização dos dados
-                    data_df = view_data(db_options, table_name)
-                    display_data(data_df)
+                    reset_pagination(table_name)
+                    st.rerun()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,117 @@
+import re
+from functools import lru_cache
+import database
+
+# Motor de alocação de capital.
+# A divisão é calculada a partir de regras percentuais sobre o capital, para
+# qualquer valor. As tabelas abaixo são montadas uma única vez por processo;
+# o NumPy só é importado quando a API em lote é usada.
+#
+# Os valores são em reais, arredondados para centavos: o capital vira um
+# inteiro em centavos e cada parte é capital * percentual / 100 arredondado
+# (meio centavo para cima) em aritmética inteira. calcular_alocacao e
+# projetar usam a mesma regra, então o resultado não depende do tipo do
+# capital (int, float ou rótulo) nem do caminho usado.
+
+# Regras de alocação: (rótulo exibido, coluna em clientes, % do capital)
+REGRAS = (
+    ('Valor em Patrimônio', 'patrimonio', 300),
+    ('10% para o valor de investimento na Virtus', 'valor_virtus', 10),
+    ('30% para reserva de emergência', 'reserva_emergencia', 30),
+    ('10% para custos de abertura', 'custos_abertura', 10),
+    ('20% para custos de tráfego', 'custos_trafego', 20),
+    ('15% para Treinamento Empresarial', 'treinamento_empresarial', 15),
+    ('15% para infraestrutura', 'infraestrutura', 15),
+)
+
+ROTULOS = tuple(rotulo for rotulo, _, _ in REGRAS)
+COLUNAS = tuple(coluna for _, coluna, _ in REGRAS)
+PERCENTUAIS = tuple(percentual for _, _, percentual in REGRAS)
+
+# Níveis de capital para cada tipo de investidor
+NIVEIS_CAPITAL = {
+    'Inicial': ['20mil', '40mil', '60mil', '80mil', '100mil'],
+    'Intermediário': ['200mil', '400mil', '600mil', '800mil', '1milhão'],
+    'Avançado': ['1milhão']
+}
+
+_MULTIPLICADORES = {'mil': 1_000, 'milhão': 1_000_000, 'milhões': 1_000_000}
+
+
+# Função para converter um rótulo de capital ('20mil', '1milhão') em valor
+@lru_cache(maxsize=256)
+def valor_capital(capital):
+    if isinstance(capital, (int, float)):
+        return capital
+    match = re.fullmatch(r'\s*(\d+(?:[.,]\d+)?)\s*(mil|milhão|milhões)?\s*', str(capital))
+    if match is None:
+        raise ValueError(f"Capital inválido: {capital}")
+    numero = float(match.group(1).replace(',', '.'))
+    valor = numero * _MULTIPLICADORES.get(match.group(2), 1)
+    return int(valor) if valor.is_integer() else valor
+
+
+# Função para calcular uma parte, em centavos, de um capital em centavos
+def _parte_centavos(centavos, percentual):
+    return (centavos * percentual + 50) // 100
+
+
+# Função para calcular a alocação de um único valor de capital (em reais, com centavos)
+def calcular_alocacao(capital):
+    centavos = round(valor_capital(capital) * 100)
+    return {rotulo: _parte_centavos(centavos, percentual) / 100 for rotulo, _, percentual in REGRAS}
+
+
+# Função para calcular a alocação de um investidor e nível de capital do formulário
+def alocacao_por_nivel(investidor, capital):
+    if capital not in NIVEIS_CAPITAL.get(investidor, ()):
+        raise ValueError(f"Capital {capital} não disponível para o investidor {investidor}")
+    return calcular_alocacao(capital)
+
+
+# Função para obter os percentuais como vetor NumPy (criado uma vez)
+@lru_cache(maxsize=1)
+def _vetor_percentuais():
+    import numpy as np
+    return np.array(PERCENTUAIS, dtype=np.int64)
+
+
+# Função para projetar a alocação de vários valores de capital de uma vez.
+# Retorna uma matriz (len(capitais), len(REGRAS)) na ordem de ROTULOS/COLUNAS,
+# com os mesmos valores de calcular_alocacao.
+def projetar(capitais):
+    import numpy as np
+    centavos = np.rint(np.asarray(capitais, dtype=np.float64) * 100).astype(np.int64)
+    return _parte_centavos(centavos[:, None], _vetor_percentuais()[None, :]) / 100
+
+
+# Função para projetar cenários de (investidor, capital) dados por rótulo
+def projetar_cenarios(investidores, capitais):
+    import numpy as np
+    valores = np.fromiter((valor_capital(c) for c in capitais), dtype=np.float64, count=len(capitais))
+    for investidor, capital in zip(investidores, capitais):
+        if capital not in NIVEIS_CAPITAL.get(investidor, ()):
+            raise ValueError(f"Capital {capital} não disponível para o investidor {investidor}")
+    return projetar(valores)
+
+
+# Função para recalcular em lote as colunas de alocação da tabela clientes.
+# Clientes sem capital ou com capital inválido ficam como estão, em vez de
+# desfazer o recálculo de todos. Retorna um resumo como o da importação em
+# lote: recalculados, quantidade de ignorados e os erros ({'id', 'erro'}).
+def recalcular_clientes(db_name=database.CLIENTES_DB):
+    with database.transaction(db_name) as conn:
+        ids, capitais, erros = [], [], []
+        for id_, capital in conn.execute("SELECT id, capital FROM clientes"):
+            try:
+                capitais.append(valor_capital(capital))
+            except (ValueError, TypeError):
+                erros.append({'id': id_, 'erro': f"Capital inválido: {capital}"})
+                continue
+            ids.append(id_)
+        if ids:
+            matriz = projetar(capitais)
+            atribuicoes = ', '.join(f"{coluna} = ?" for coluna in COLUNAS)
+            conn.executemany(f"UPDATE clientes SET {atribuicoes} WHERE id = ?",
+                             (tuple(valores) + (id_,) for id_, valores in zip(ids, matriz.tolist())))
+    return {'updated': len(ids), 'error_count': len(erros), 'errors': erros}
@@ -0,0 +1,156 @@
+import os
+import json
+import argparse
+import pyarrow as pa
+import pyarrow.parquet as pq
+import database
+import migrations
+import schema
+import segments
+
+# Exportação incremental de profiles e clientes para Parquet.
+# Os triggers de row_changes (migrations.create_change_log) registram cada
+# linha inserida, alterada (um lead juntado pelo leads.upsert, o ID do Drive
+# gravado pela fila de envios) ou apagada, uma entrada por linha com o seq da
+# última alteração. Cada execução grava uma nova
+# partição com o estado atual das linhas registradas depois da marca d'água
+# da execução anterior, e apaga do registro o que já foi exportado.
+#
+# As partições só acumulam: uma linha alterada aparece de novo numa partição
+# posterior. _change_seq cresce a cada alteração e _deleted marca as linhas
+# apagadas (só com o id), então a versão atual de cada linha é a de maior
+# _change_seq. Por exemplo:
+#
+#     python analytics_export.py
+#     df = pandas.read_parquet('analytics/profiles').sort_values('_change_seq')
+#     df = df.drop_duplicates('id', keep='last').query('not _deleted')
+
+OUTPUT_DIR = os.getenv('ANALYTICS_DIR', 'analytics')
+STATE_FILE = '_watermarks.json'
+
+# Linhas lidas do SQLite e gravadas por row group
+CHUNK_SIZE = 50000
+
+
+# Função para escolher o tipo Arrow de uma coluna a partir do tipo declarado no SQLite.
+# As colunas de lista (schema.LIST_COLUMNS) são exportadas como listas reais.
+def arrow_type(table_name, column, declared_type):
+    if column in schema.LIST_COLUMNS[table_name]:
+        return pa.list_(pa.string())
+    declared_type = (declared_type or '').upper()
+    if 'INT' in declared_type:
+        return pa.int64()
+    if 'BOOL' in declared_type:
+        return pa.bool_()
+    if any(name in declared_type for name in ('REAL', 'FLOA', 'DOUB')):
+        return pa.float64()
+    return pa.string()
+
+
+# Função para converter um valor do SQLite para o tipo Arrow da coluna
+def convert(value, type_):
+    if pa.types.is_list(type_):
+        return segments.split_values(value)
+    if value is None:
+        return None
+    if pa.types.is_boolean(type_):
+        return bool(value)
+    if pa.types.is_int64(type_):
+        return int(value)
+    if pa.types.is_float64(type_):
+        return float(value)
+    return str(value)
+
+
+# Função para ler as marcas d'água salvas
+def load_watermarks(output_dir=OUTPUT_DIR):
+    path = os.path.join(output_dir, STATE_FILE)
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+# Função para gravar as marcas d'água de forma atômica
+def save_watermarks(watermarks, output_dir=OUTPUT_DIR):
+    path = os.path.join(output_dir, STATE_FILE)
+    with open(path + '.tmp', 'w') as f:
+        json.dump(watermarks, f, indent=2)
+    os.replace(path + '.tmp', path)
+
+
+# Função para exportar as linhas novas, alteradas ou apagadas de uma tabela
+# numa partição Parquet. Retorna a quantidade de linhas exportadas.
+def export_table(table_name, db_name, output_dir=OUTPUT_DIR, watermarks=None):
+    migrations.ensure_migrated(db_name)
+    watermarks = load_watermarks(output_dir) if watermarks is None else watermarks
+    last_seq = watermarks.get(table_name, {}).get('seq', 0)
+    table_dir = os.path.join(output_dir, table_name)
+    os.makedirs(table_dir, exist_ok=True)
+
+    with database.connection(db_name) as conn:
+        # Uma única transação de leitura: todos os lotes vêm do mesmo snapshot
+        conn.execute("BEGIN")
+        try:
+            columns = conn.execute(f"PRAGMA table_info({table_name})").fetchall()
+            arrow_schema = pa.schema([(name, arrow_type(table_name, name, declared))
+                                      for _, name, declared, *_ in columns]
+                                     + [('_change_seq', pa.int64()), ('_deleted', pa.bool_())])
+            max_seq = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM row_changes WHERE table_name = ?",
+                                   (table_name,)).fetchone()[0]
+            max_seq = max(max_seq, last_seq)
+            if max_seq <= last_seq:
+                return 0
+
+            final_path = os.path.join(table_dir, f"changes-{last_seq + 1:012d}-{max_seq:012d}.parquet")
+            tmp_path = final_path + '.tmp'
+            # Estado atual de cada linha registrada; as apagadas voltam só com o id
+            cursor = conn.execute(f'''
+                SELECT changed.row_id, changed.seq, {table_name}.*
+                FROM row_changes AS changed
+                LEFT JOIN {table_name} ON {table_name}.id = changed.row_id
+                WHERE changed.table_name = ? AND changed.seq > ? AND changed.seq <= ?
+                ORDER BY changed.seq, changed.row_id
+            ''', (table_name, last_seq, max_seq))
+            id_index = [field.name for field in arrow_schema].index('id')
+            exported = 0
+            with pq.ParquetWriter(tmp_path, arrow_schema, compression='zstd') as writer:
+                while rows := cursor.fetchmany(CHUNK_SIZE):
+                    rows = [(*values[:id_index], row_id, *values[id_index + 1:], seq, values[id_index] is None)
+                            for row_id, seq, *values in rows]
+                    arrays = [pa.array([convert(row[i], field.type) for row in rows], type=field.type)
+                              for i, field in enumerate(arrow_schema)]
+                    writer.write_batch(pa.RecordBatch.from_arrays(arrays, schema=arrow_schema))
+                    exported += len(rows)
+        finally:
+            conn.rollback()
+
+    # A marca d'água só avança depois que a partição está no lugar definitivo
+    if exported:
+        os.replace(tmp_path, final_path)
+    else:
+        os.remove(tmp_path)
+    watermarks[table_name] = {'seq': max_seq}
+    save_watermarks(watermarks, output_dir)
+    database.execute(db_name, "DELETE FROM row_changes WHERE table_name = ? AND seq <= ?", (table_name, max_seq))
+    return exported
+
+
+# Função para exportar todas as tabelas
+def export_all(output_dir=OUTPUT_DIR):
+    os.makedirs(output_dir, exist_ok=True)
+    watermarks = load_watermarks(output_dir)
+    return {table_name: export_table(table_name, db_name, output_dir, watermarks)
+            for table_name, db_name in schema.DATABASES.items() if os.path.exists(db_name)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Exporta profiles e clientes para Parquet de forma incremental.")
+    parser.add_argument('--output', default=OUTPUT_DIR, help="diretório de saída")
+    args = parser.parse_args(argv)
+    for table_name, exported in export_all(args.output).items():
+        print(f"{table_name}: {exported} linhas novas ou alteradas")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,60 +1,83 @@
 import streamlit as st
-from google.oauth2.credentials import Credentials
-from googleapiclient.discovery import build
-from googleapiclient.http import MediaFileUpload
-from google.auth.transport.requests import Request
-from google_auth_oauthlib.flow import InstalledAppFlow
-import os
-
-def authenticate_google_drive():
-    SCOPES = ['https://www.googleapis.com/auth/drive.file']
-    
-    creds = None
-    # Verifique se o arquivo token.json existe
-    if os.path.exists('token.json'):
-        creds = Credentials.from_authorized_user_file('token.json', SCOPES)
-    
-    # Se não houver credenciais ou se forem inválidas, faça a autenticação novamente
-    if not creds or not creds.valid:
-        if creds and creds.expired and creds.refresh_token:
-            creds.refresh(Request())
+import drive
+import chunked_upload
+import batch_upload
+
+# Arquivo de client secret usado na primeira autenticação deste aplicativo
+CLIENT_SECRETS_PATH = 'client_secret_297185839442-0m4p4sbfbodbqsk816ca3q0o14phbk5u.apps.googleusercontent.com.json'
+
+# Prepara o cliente do Drive em segundo plano enquanto a página carrega
+drive.warm_up(CLIENT_SECRETS_PATH)
+
+# ID da pasta do Google Drive onde os arquivos serão salvos
+FOLDER_ID = '13X_YJqvB3jGdOxCCIrNzt5vi8UwtWNlE'
+FILE_TYPES = ["jpg", "png", "pdf", "txt", "mp4", "mov", "avi"]
+# Intervalo (s) entre as atualizações do andamento do lote
+REFRESH_INTERVAL = 1
+
+
+# Função para formatar um tamanho em bytes
+def format_size(size):
+    for unit in ('B', 'KB', 'MB'):
+        if size < 1024:
+            return f"{size:.0f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GB"
+
+
+# Função para exibir o andamento de cada arquivo do lote desta sessão.
+# Roda como fragmento: relê o estado do lote (atualizado pelas threads de
+# batch_upload) a cada intervalo sem reexecutar a página nem prendê-la.
+@st.fragment(run_every=REFRESH_INTERVAL)
+def show_batch_progress():
+    batch = st.session_state.get('upload_batch')
+    if batch is None:
+        return
+    sent, total, counts = batch.totals()
+    st.progress(sent / total if total else 1.0,
+                text=", ".join(f"{count} {status}" for status, count in counts.items()))
+    for item in batch.snapshot():
+        label = f"{item['name']} ({format_size(item['sent'])} de {format_size(item['total'])}): {item['status']}"
+        if item['attempts'] > 1 and item['status'] != batch_upload.DONE:
+            label += f" (tentativa {item['attempts']} de {batch.retries})"
+        if item['status'] == batch_upload.DONE:
+            st.success(f"{item['name']}: enviado, ID no Drive {item['file_id']}")
+        elif item['status'] == batch_upload.FAILED:
+            st.error(f"{item['name']}: {item['error']}")
         else:
-            # Use o caminho correto para seu arquivo client_secret
-            flow = InstalledAppFlow.from_client_secrets_file(
-                'client_secret_297185839442-0m4p4sbfbodbqsk816ca3q0o14phbk5u.apps.googleusercontent.com.json', SCOPES)
-            creds = flow.run_local_server(port=0)
-        # Salve as credenciais para futuras execuções
-        with open('token.json', 'w') as token:
-            token.write(creds.to_json())
-    
-    return build('drive', 'v3', credentials=creds)
+            st.progress(item['sent'] / item['total'] if item['total'] else 0.0, text=label)
 
-def upload_file_to_drive(service, file_path, folder_id=None):
-    file_metadata = {'name': os.path.basename(file_path)}
-    if folder_id:
-        file_metadata['parents'] = [folder_id]
-    media = MediaFileUpload(file_path, resumable=True)
-    file = service.files().create(body=file_metadata, media_body=media, fields='id').execute()
-    return file.get('id')
 
 st.title("Upload de Arquivo para o Google Drive")
 
+mode = st.radio("Modo", ("Um arquivo", "Vários arquivos"), horizontal=True)
+
+if mode == "Vários arquivos":
+    # Lote: os arquivos são enviados ao mesmo tempo (batch_upload), com um só
+    # cliente autenticado, e cada um que falhar é tentado de novo sozinho
+    uploaded_files = st.file_uploader("Escolha os arquivos", type=FILE_TYPES, accept_multiple_files=True)
+    if uploaded_files and st.button(f"Enviar {len(uploaded_files)} arquivos para o Google Drive"):
+        service = drive.get_service(CLIENT_SECRETS_PATH)
+        st.session_state['upload_batch'] = batch_upload.start(service, uploaded_files, FOLDER_ID)
+
+    # O lote continua nas threads se a página for recarregada
+    show_batch_progress()
+    st.stop()
+
 # Faça o upload do arquivo
-uploaded_file = st.file_uploader("Escolha um arquivo", type=["jpg", "png", "pdf", "txt"])
+uploaded_file = st.file_uploader("Escolha um arquivo", type=FILE_TYPES)
 
 if uploaded_file is not None:
-    # Crie um arquivo temporário para o upload
-    temp_file_path = "temp_file_" + uploaded_file.name
-    with open(temp_file_path, "wb") as f:
-        f.write(uploaded_file.getvalue())
-
     st.write("Arquivo selecionado: ", uploaded_file.name)
     
     if st.button("Fazer Upload para o Google Drive"):
-        service = authenticate_google_drive()
-        folder_id = '13X_YJqvB3jGdOxCCIrNzt5vi8UwtWNlE'  # ID da pasta do Google Drive onde o arquivo será salvo
-        file_id = upload_file_to_drive(service, temp_file_path, folder_id)
+        service = drive.get_service(CLIENT_SECRETS_PATH)
+
+        # Envia direto do buffer do upload, em partes, sem arquivo temporário.
+        # Vídeos e outros arquivos grandes usam o envio em partes do chunked_upload.
+        progress_bar = st.progress(0.0)
+        file_id = chunked_upload.upload(
+            service, uploaded_file, uploaded_file.name, uploaded_file.type, FOLDER_ID,
+            progress=lambda sent, total: progress_bar.progress(sent / total if total else 1.0)
+        )
         st.success(f"Arquivo carregado com sucesso! ID do arquivo no Drive: {file_id}")
-        
-        # Limpe o arquivo temporário após o upload
-        os.remove(temp_file_path)
@@ -0,0 +1,99 @@
+import os
+import time
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import chunked_upload
+
+# Envio de vários arquivos de uma vez ao Drive.
+# Os arquivos são enviados ao mesmo tempo por no máximo BATCH_UPLOAD_WORKERS
+# threads, todas com o mesmo serviço autenticado (drive.get_service já abre
+# uma conexão HTTP por requisição). Cada arquivo tem o seu estado; um arquivo
+# que falha é enviado de novo sozinho, com backoff, sem parar os outros.
+# Uso:
+#
+#     batch = batch_upload.start(service, files, folder_id)
+#     while not batch.done():
+#         print(batch.snapshot())
+#         time.sleep(0.5)
+
+# Arquivos enviados ao mesmo tempo
+BATCH_UPLOAD_WORKERS = int(os.getenv('BATCH_UPLOAD_WORKERS', '4'))
+# Tentativas de cada arquivo. Dentro de uma tentativa, uma parte que falha é
+# retomada na mesma sessão resumível, em ordem, a partir do último byte
+# confirmado (drive.upload_media); uma nova tentativa envia o arquivo de novo
+# desde o início. O MD5 do arquivo inteiro é conferido no fim de cada envio.
+FILE_RETRIES = 3
+
+# Estados de um arquivo
+WAITING, SENDING, RETRYING, DONE, FAILED = 'aguardando', 'enviando', 'tentando de novo', 'enviado', 'erro'
+
+
+# Lote de envios: guarda o estado de cada arquivo, atualizado pelas threads
+class UploadBatch:
+    def __init__(self, service, files, folder_id=None, workers=BATCH_UPLOAD_WORKERS, retries=FILE_RETRIES):
+        self.service = service
+        self.folder_id = folder_id
+        self.retries = retries
+        self.items = [{'name': getattr(file, 'name', f"arquivo_{index + 1}"), 'status': WAITING,
+                       'sent': 0, 'total': chunked_upload.stream_size(file), 'attempts': 0,
+                       'file_id': None, 'error': None}
+                      for index, file in enumerate(files)]
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max(1, min(workers, len(files))), thread_name_prefix='batch-upload')
+        self._futures = [self._executor.submit(self._send, index, file) for index, file in enumerate(files)]
+        self._executor.shutdown(wait=False)
+
+    def _update(self, index, **values):
+        with self._lock:
+            self.items[index].update(values)
+
+    def _send(self, index, file):
+        item = self.items[index]
+
+        def progress(sent, total):
+            self._update(index, sent=sent, total=total)
+
+        for attempt in range(1, self.retries + 1):
+            self._update(index, status=SENDING, attempts=attempt, sent=0, error=None)
+            try:
+                file.seek(0)
+                file_id = chunked_upload.upload(self.service, file, item['name'], getattr(file, 'type', None),
+                                                self.folder_id, progress)
+            except Exception as e:
+                if attempt == self.retries:
+                    self._update(index, status=FAILED, error=str(e))
+                    return
+                self._update(index, status=RETRYING, error=str(e))
+                time.sleep(min(2 ** attempt, 30) * random.uniform(0.5, 1.0))
+                continue
+            self._update(index, status=DONE, file_id=file_id, sent=item['total'], error=None)
+            return
+
+    # Cópia do estado de todos os arquivos, na ordem em que foram recebidos
+    def snapshot(self):
+        with self._lock:
+            return [dict(item) for item in self.items]
+
+    def done(self):
+        return all(future.done() for future in self._futures)
+
+    # Espera o fim do lote e retorna o estado final
+    def wait(self, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for future in self._futures:
+            future.result(None if deadline is None else max(0, deadline - time.monotonic()))
+        return self.snapshot()
+
+    # Resumo do lote: bytes enviados, total e quantos arquivos em cada estado
+    def totals(self):
+        items = self.snapshot()
+        counts = {}
+        for item in items:
+            counts[item['status']] = counts.get(item['status'], 0) + 1
+        return sum(item['sent'] for item in items), sum(item['total'] for item in items), counts
+
+
+# Função para começar o envio de uma lista de arquivos abertos (sem esperar)
+def start(service, files, folder_id=None, workers=BATCH_UPLOAD_WORKERS):
+    return UploadBatch(service, files, folder_id, workers)
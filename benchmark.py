@@ -0,0 +1,403 @@
+import io
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import tempfile
+import statistics
+import itertools
+import functools
+import importlib
+import subprocess
+import threading
+from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor
+import database
+import group_commit
+
+# Benchmark de carga dos caminhos de envio dos aplicativos.
+# Cada cenário é executado por N usuários simulados ao mesmo tempo (threads)
+# num diretório de trabalho temporário, com o Drive falso local. O relatório
+# mostra vazão, latências p50/p95/p99, erros e esperas pelo lock de escrita
+# do SQLite, e cada execução é gravada em BENCHMARK_RESULTS (fora do git;
+# outro arquivo com --output) para comparar com os commits anteriores. Uso:
+#
+#     python benchmark.py
+#     python benchmark.py --users 16 --iterations 50 --scenarios insert_data salvar_dados
+#     python benchmark.py --apptest --users 4 --iterations 5
+#     python benchmark.py --scenarios video_upload --users 2 --iterations 3
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+BENCHMARK_RESULTS = os.getenv('BENCHMARK_RESULTS', os.path.join(REPO_DIR, 'benchmark_results.jsonl'))
+
+DEFAULT_USERS = 8
+DEFAULT_ITERATIONS = 25
+# Perfis e clientes gravados antes das medições (para as leituras do painel)
+DEFAULT_SEED_ROWS = 2000
+# Tamanho (KB) do logotipo enviado em cada perfil; 0 desliga os uploads
+DEFAULT_UPLOAD_KB = 64
+# Tamanho (MB) do vídeo dos cenários de envio em partes
+DEFAULT_VIDEO_MB = 64
+
+CLIENT_TYPES = ["Empresário", "MEI", "Startup", "Holding", "CEO", "Investidor"]
+SERVICES = ["Marketing", "Consultoria", "Design", "Tráfego", "Treinamento"]
+PAYMENT_METHODS = ["Pix", "Boleto", "Cartão"]
+
+
+# Função para preparar o ambiente antes de carregar os aplicativos:
+# diretório de trabalho isolado e Drive falso com a latência pedida
+def configure_environment(workdir, drive_latency):
+    os.makedirs(workdir, exist_ok=True)
+    os.chdir(workdir)
+    os.environ['DRIVE_BACKEND'] = 'fake'
+    os.environ['FAKE_DRIVE_DIR'] = os.path.join(workdir, 'fake_drive')
+    os.environ['FAKE_DRIVE_LATENCY'] = str(drive_latency)
+    if REPO_DIR not in sys.path:
+        sys.path.insert(0, REPO_DIR)
+
+
+# Função para carregar um aplicativo Streamlit como módulo.
+# Fora do "streamlit run" os comandos st.* não fazem nada e o script só
+# define as funções, cria as tabelas e inicia os workers.
+def load_app(module_name):
+    return importlib.import_module(module_name)
+
+
+# Função para gerar os dados de um perfil como o formulário envia
+def fake_profile(n):
+    return {
+        'company_name': f"Empresa {n}", 'website': f"https://empresa{n}.com.br",
+        'website_no_site': False, 'client_type': random.sample(CLIENT_TYPES, 2),
+        'contact_name': f"Contato {n}", 'city': "São Paulo", 'email': f"contato{n}@empresa.com.br",
+        'phone': f"(11) 9{n % 100000000:08d}", 'market_segment': ["Serviços"],
+        'address': f"Rua {n}, 100", 'no_physical_address': False, 'capital': "50mil",
+        'desired_revenue': "100mil", 'services': random.sample(SERVICES, 2),
+        'payment_methods': random.sample(PAYMENT_METHODS, 1), 'source': "Indicação",
+        'business_field': "Tecnologia", 'business_type': "Serviços", 'context': "Benchmark",
+        'return_time': "12 meses", 'market_analysis': True, 'difficulties': "Nenhuma",
+        'cnpj_or_cpf': f"{n:014d}", 'employees': "10",
+    }
+
+
+# Função para gerar um arquivo enviado (mesma interface do UploadedFile do Streamlit)
+def fake_upload(name, size_kb):
+    file = io.BytesIO(os.urandom(size_kb * 1024))
+    file.name = name
+    return file
+
+
+# Função para gravar linhas iniciais em profiles e clientes
+def seed(rows):
+    import bulk_import
+    import alocacao as alocacao_engine
+
+    profiles = ((n, {key: json.dumps(value) if isinstance(value, list) else value
+                     for key, value in fake_profile(n).items()}) for n in range(rows))
+    bulk_import.import_rows(database.PROFILES_DB, 'profiles', profiles)
+    niveis = [(investidor, capital) for investidor, capitais in alocacao_engine.NIVEIS_CAPITAL.items()
+              for capital in capitais]
+    clientes = ((n, {'nome': f"Cliente {n}", 'email': f"cliente{n}@email.com",
+                     'investidor': niveis[n % len(niveis)][0], 'capital': niveis[n % len(niveis)][1]})
+                for n in range(rows))
+    bulk_import.import_rows(database.CLIENTES_DB, 'clientes', clientes)
+
+
+# Cenários: nome -> função que monta a operação de um usuário.
+# A operação recebe o número da iteração e é cronometrada pelo benchmark.
+def scenario_insert_data(upload_kb):
+    perfil = load_app('perfil')
+    import upload_queue
+
+    def run(n):
+        files = {'logo_path': fake_upload(f"logo_{n}.png", upload_kb) if upload_kb else None}
+        uploads, references = upload_queue.prepare(files)
+        if perfil.insert_data(fake_profile(n), uploads=uploads, **references) is None:
+            upload_queue.discard(uploads)
+            raise RuntimeError("insert_data falhou")
+    return run
+
+
+def scenario_salvar_dados(upload_kb):
+    investidor = load_app('Investidor')
+    import alocacao as alocacao_engine
+
+    def run(n):
+        nivel = random.choice(list(alocacao_engine.NIVEIS_CAPITAL))
+        capital = random.choice(alocacao_engine.NIVEIS_CAPITAL[nivel])
+        alocacao = alocacao_engine.alocacao_por_nivel(nivel, capital)
+        if investidor.salvar_dados(f"Cliente {n}", f"119{n % 100000000:08d}", f"cliente{n}@email.com",
+                                   nivel, capital, alocacao) is None:
+            raise RuntimeError("salvar_dados falhou")
+    return run
+
+
+def scenario_alocacao_grafico(upload_kb):
+    investidor = load_app('Investidor')
+    import alocacao as alocacao_engine
+
+    def run(n):
+        nivel = random.choice(list(alocacao_engine.NIVEIS_CAPITAL))
+        investidor.mostrar_alocacao_e_grafico(nivel, random.choice(alocacao_engine.NIVEIS_CAPITAL[nivel]))
+    return run
+
+
+def scenario_view_data(upload_kb):
+    admin_panel = load_app('admin_panel')
+    writes = load_app('perfil')
+
+    # Uma escrita a cada 10 leituras invalida o cache, como no uso real do painel
+    def run(n):
+        if n % 10 == 0:
+            writes.insert_data(fake_profile(n))
+        admin_panel.view_data(database.PROFILES_DB, 'profiles')
+    return run
+
+
+# Cenários de script inteiro via AppTest: cada iteração é uma sessão nova
+# que carrega a página, preenche o formulário e envia.
+def apptest_widget(widgets, label):
+    return next(widget for widget in widgets if widget.label == label)
+
+
+def scenario_apptest_perfil(upload_kb):
+    from streamlit.testing.v1 import AppTest
+
+    def run(n):
+        at = AppTest.from_file(os.path.join(REPO_DIR, 'perfil.py'), default_timeout=60).run()
+        apptest_widget(at.text_input, "Nome da Empresa/Cliente").input(f"Empresa {n}")
+        apptest_widget(at.text_input, "E-mail").input(f"contato{n}@empresa.com.br")
+        apptest_widget(at.button, "Enviar").click().run()
+        if at.exception:
+            raise RuntimeError(at.exception[0].message)
+    return run
+
+
+def scenario_apptest_investidor(upload_kb):
+    from streamlit.testing.v1 import AppTest
+
+    def run(n):
+        at = AppTest.from_file(os.path.join(REPO_DIR, 'Investidor.py'), default_timeout=60).run()
+        apptest_widget(at.text_input, "Nome:").input(f"Cliente {n}")
+        apptest_widget(at.text_input, "Email:").input(f"cliente{n}@email.com")
+        apptest_widget(at.button, "Enviar").click().run()
+        if at.exception:
+            raise RuntimeError(at.exception[0].message)
+    return run
+
+
+# Cenário de envio de vídeo ao Drive falso pelo chunked_upload (sessão
+# resumível com leitura antecipada, o mesmo caminho usado com o Google Drive)
+def scenario_video_upload(upload_kb, video_mb=DEFAULT_VIDEO_MB):
+    import chunked_upload
+    import fake_drive
+
+    path = os.path.abspath(f"video_{video_mb}mb.mp4")
+    if not os.path.exists(path):
+        with open(path, 'wb') as f:
+            for _ in range(video_mb):
+                f.write(os.urandom(1024 * 1024))
+    service = fake_drive.FakeDriveService()
+
+    def run(n):
+        chunked_upload.upload_file(service, path, f"video_{n}.mp4")
+    return run
+
+
+SCENARIOS = {
+    'insert_data': scenario_insert_data,
+    'salvar_dados': scenario_salvar_dados,
+    'alocacao_grafico': scenario_alocacao_grafico,
+    'view_data': scenario_view_data,
+}
+
+APPTEST_SCENARIOS = {
+    'apptest_perfil': scenario_apptest_perfil,
+    'apptest_investidor': scenario_apptest_investidor,
+}
+
+# Cenários de envio de arquivos grandes (só rodam quando pedidos em --scenarios)
+VIDEO_SCENARIOS = {
+    'video_upload': scenario_video_upload,
+}
+
+
+# Função para calcular um percentil (0-100) de uma lista de latências
+def percentile(values, p):
+    if not values:
+        return None
+    if len(values) == 1:
+        return values[0]
+    return statistics.quantiles(values, n=100, method='inclusive')[p - 1]
+
+
+# Função para executar um cenário com N usuários simultâneos.
+# Retorna o resumo com vazão, percentis (ms), erros e esperas por lock.
+def run_scenario(name, operation, users, iterations):
+    latencies, errors = [], []
+    lock = threading.Lock()
+    barrier = threading.Barrier(users)
+    counter = itertools.count(random.randrange(1_000_000) * 1000)
+
+    def user(user_id):
+        barrier.wait()
+        for _ in range(iterations):
+            n = next(counter)
+            start = time.perf_counter()
+            try:
+                operation(n)
+            except Exception as e:
+                with lock:
+                    errors.append(repr(e))
+                continue
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            with lock:
+                latencies.append(elapsed_ms)
+
+    database.reset_lock_stats()
+    writes_before = group_commit.stats()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=users) as executor:
+        list(executor.map(user, range(users)))
+    duration = time.perf_counter() - start
+    locks = database.lock_stats()
+    batches = writes = 0
+    for db_name, totals in group_commit.stats().items():
+        before = writes_before.get(db_name, {'batches': 0, 'writes': 0})
+        batches += totals['batches'] - before['batches']
+        writes += totals['writes'] - before['writes']
+
+    return {
+        'scenario': name,
+        'users': users,
+        'iterations': iterations,
+        'operations': len(latencies),
+        'errors': len(errors),
+        'error_samples': sorted(set(errors))[:5],
+        'duration_s': round(duration, 3),
+        'throughput_ops': round(len(latencies) / duration, 2) if duration else None,
+        'p50_ms': round(percentile(latencies, 50), 3) if latencies else None,
+        'p95_ms': round(percentile(latencies, 95), 3) if latencies else None,
+        'p99_ms': round(percentile(latencies, 99), 3) if latencies else None,
+        'max_ms': round(max(latencies), 3) if latencies else None,
+        'transactions': locks['transactions'],
+        'lock_waits': locks['waits'],
+        'lock_wait_ms': round(locks['wait_ms'], 3),
+        'lock_timeouts': locks['timeouts'],
+        'group_commit_batch': round(writes / batches, 2) if batches else None,
+    }
+
+
+# Função para identificar o commit medido (vazio fora de um repositório git)
+def git_commit():
+    result = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_DIR,
+                            capture_output=True, text=True)
+    commit = result.stdout.strip()
+    if commit and subprocess.run(['git', 'diff', '--quiet', 'HEAD'], cwd=REPO_DIR).returncode:
+        commit += '-dirty'
+    return commit
+
+
+# Função para ler as execuções anteriores gravadas em disco
+def load_results(path=BENCHMARK_RESULTS):
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+# Função para acrescentar o resultado de uma execução ao arquivo de resultados
+def save_results(run, path=BENCHMARK_RESULTS):
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(run, ensure_ascii=False) + '\n')
+
+
+# Função para achar o resultado anterior do mesmo cenário com a mesma carga
+def previous_result(history, result):
+    for run in reversed(history):
+        for previous in run['results']:
+            if (previous['scenario'], previous['users'], previous['iterations']) == \
+                    (result['scenario'], result['users'], result['iterations']):
+                return run['commit'], previous
+    return None, None
+
+
+# Função para formatar a variação percentual em relação à execução anterior
+def change(current, previous):
+    if not current or not previous:
+        return ''
+    return f"{(current - previous) / previous * 100:+.0f}%"
+
+
+# Função para imprimir o relatório comparando com a execução anterior
+def print_report(run, history):
+    print(f"\nCommit {run['commit'] or '?'} — {run['timestamp']}")
+    header = (f"{'cenário':<24}{'usuários':>9}{'ops/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+              f"{'erros':>7}{'locks':>7}{'espera ms':>11}{'lote':>6}   vs. anterior (p95, ops/s)")
+    print(header)
+    for result in run['results']:
+        commit, previous = previous_result(history, result)
+        comparison = ''
+        if previous is not None:
+            comparison = (f"{commit}: {change(result['p95_ms'], previous['p95_ms'])}, "
+                          f"{change(result['throughput_ops'], previous['throughput_ops'])}")
+        print(f"{result['scenario']:<24}{result['users']:>9}{result['throughput_ops'] or 0:>10.1f}"
+              f"{result['p50_ms'] or 0:>10.2f}{result['p95_ms'] or 0:>10.2f}{result['p99_ms'] or 0:>10.2f}"
+              f"{result['errors']:>7}{result['lock_waits']:>7}{result['lock_wait_ms']:>11.1f}"
+              f"{result.get('group_commit_batch') or 1:>6.1f}   {comparison}")
+        for sample in result['error_samples']:
+            print(f"    erro: {sample}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark de carga dos caminhos de envio dos aplicativos.")
+    parser.add_argument('--scenarios', nargs='*', choices=list(SCENARIOS) + list(APPTEST_SCENARIOS) + list(VIDEO_SCENARIOS),
+                        help="cenários executados (padrão: todos os de função)")
+    parser.add_argument('--apptest', action='store_true', help="inclui os cenários de script via AppTest")
+    parser.add_argument('--users', type=int, default=DEFAULT_USERS, help="usuários simultâneos")
+    parser.add_argument('--iterations', type=int, default=DEFAULT_ITERATIONS, help="operações por usuário")
+    parser.add_argument('--seed-rows', type=int, default=DEFAULT_SEED_ROWS, help="linhas gravadas antes das medições")
+    parser.add_argument('--upload-kb', type=int, default=DEFAULT_UPLOAD_KB, help="tamanho do logotipo de cada perfil")
+    parser.add_argument('--video-mb', type=int, default=DEFAULT_VIDEO_MB, help="tamanho do vídeo dos cenários de vídeo")
+    parser.add_argument('--drive-latency', type=float, default=0.05, help="latência (s) do Drive falso por requisição")
+    parser.add_argument('--workdir', help="diretório dos bancos e do Drive falso (padrão: temporário)")
+    parser.add_argument('--output', default=BENCHMARK_RESULTS, help="arquivo de resultados (JSON lines)")
+    parser.add_argument('--no-save', action='store_true', help="não grava o resultado em disco")
+    args = parser.parse_args(argv)
+
+    names = args.scenarios or list(SCENARIOS) + (list(APPTEST_SCENARIOS) if args.apptest else [])
+    output = os.path.abspath(args.output)
+    configure_environment(args.workdir or tempfile.mkdtemp(prefix='benchmark_'), args.drive_latency)
+
+    # Carrega os aplicativos (cria as tabelas) antes de gravar as linhas iniciais
+    load_app('perfil')
+    load_app('Investidor')
+    if args.seed_rows:
+        seed(args.seed_rows)
+
+    factories = dict(SCENARIOS, **APPTEST_SCENARIOS)
+    factories.update({name: functools.partial(factory, video_mb=args.video_mb)
+                      for name, factory in VIDEO_SCENARIOS.items()})
+    results = [run_scenario(name, factories[name](args.upload_kb), args.users, args.iterations)
+               for name in names]
+    run = {
+        'commit': git_commit(),
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'workdir': os.getcwd(),
+        'drive_latency_s': args.drive_latency,
+        'upload_kb': args.upload_kb,
+        'video_mb': args.video_mb,
+        'results': results,
+    }
+    print_report(run, load_results(output))
+    if not args.no_save:
+        save_results(run, output)
+        print(f"\nResultados gravados em {output}")
+
+
+if __name__ == "__main__":
+    main()
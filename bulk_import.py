@@ -0,0 +1,235 @@
+import io
+import os
+import csv
+import json
+import database
+import schema
+import leads
+import alocacao as alocacao_engine
+
+# Importação em lote de planilhas (CSV/XLSX) para profiles e clientes.
+# O arquivo é lido linha a linha, cada linha é validada e convertida para o
+# esquema da tabela, e as linhas válidas são gravadas com executemany em
+# lotes grandes. A leitura e a conversão de cada lote acontecem fora da
+# transação: o lock de escrita só fica reservado enquanto o lote é gravado,
+# e os formulários não esperam pela leitura da planilha. Linhas do mesmo
+# lead (e-mail, telefone ou CNPJ/CPF) atualizam o registro existente.
+
+# Linhas por lote (um executemany numa transação)
+BATCH_SIZE = 5000
+# Quantidade máxima de erros guardados para exibição (todos são contados)
+MAX_REPORTED_ERRORS = 500
+
+TRUE_VALUES = {'1', 'true', 'sim', 's', 'yes', 'y', 'x', 'verdadeiro'}
+FALSE_VALUES = {'0', 'false', 'não', 'nao', 'n', 'no', 'falso'}
+
+
+# Função para converter um valor em texto (vazio vira NULL)
+def to_text(value):
+    if value is None:
+        return None
+    value = str(value).strip()
+    return value or None
+
+
+# Função para converter um valor em booleano (sim/não, true/false, 1/0).
+# Célula vazia vira NULL: num lead existente o valor gravado é mantido, e
+# numa linha nova vale o padrão de INSERT_DEFAULTS.
+def to_bool(value):
+    text = to_text(value)
+    if text is None:
+        return None
+    if text.lower() in TRUE_VALUES:
+        return True
+    if text.lower() in FALSE_VALUES:
+        return False
+    raise ValueError(f"valor booleano inválido: {text!r}")
+
+
+# Função para converter uma lista (JSON ou separada por vírgula/ponto e vírgula)
+# no mesmo formato JSON gravado pelo formulário
+def to_list(value):
+    text = to_text(value)
+    if text is None:
+        return json.dumps([])
+    if text.startswith('['):
+        items = json.loads(text)
+        if not isinstance(items, list):
+            raise ValueError(f"lista inválida: {text!r}")
+    else:
+        items = [item.strip() for item in text.replace(';', ',').split(',') if item.strip()]
+    return json.dumps(items)
+
+
+# Função para converter um número, aceitando o formato brasileiro (60.000,50)
+def to_real(value):
+    if isinstance(value, (int, float)):
+        return float(value)
+    text = to_text(value)
+    if text is None:
+        return None
+    if ',' in text:
+        text = text.replace('.', '').replace(',', '.')
+    return float(text)
+
+
+# Colunas preenchidas pelo aplicativo, nunca pela planilha
+GENERATED_COLUMNS = ('id', 'created_at', 'logo_path', 'pdf_path', 'video_path')
+
+# Conversor de cada tipo declarado em schema.TABLES
+CONVERTERS = {'TEXT': to_text, 'BOOLEAN': to_bool, 'REAL': to_real}
+
+
+# Função para montar o esquema de importação de uma tabela (coluna -> conversor)
+# a partir de schema.TABLES, sem as colunas geradas e as chaves normalizadas
+def import_schema(table_name):
+    skipped = set(GENERATED_COLUMNS) | set(schema.KEY_COLUMNS[table_name])
+    return {column: to_list if column in schema.LIST_COLUMNS[table_name] else CONVERTERS[declared_type]
+            for column, declared_type in schema.TABLES[table_name] if column not in skipped}
+
+
+# Esquema de cada tabela: coluna -> conversor
+SCHEMAS = {table_name: import_schema(table_name) for table_name in schema.TABLES}
+
+# Valores das colunas booleanas vazias nas linhas inseridas (só na inserção)
+INSERT_DEFAULTS = {table_name: {column: False for column, converter in converters.items() if converter is to_bool}
+                   for table_name, converters in SCHEMAS.items()}
+
+# Colunas obrigatórias de cada tabela
+REQUIRED = {
+    'profiles': ('company_name',),
+    'clientes': ('nome',),
+}
+
+
+# Função para ler as linhas de um CSV como dicionários, sem carregar o arquivo todo
+def iter_csv(file):
+    text = io.TextIOWrapper(file, encoding='utf-8-sig', newline='')
+    sample = text.read(4096)
+    text.seek(0)
+    try:
+        dialect = csv.Sniffer().sniff(sample, delimiters=',;\t')
+    except csv.Error:
+        dialect = csv.excel
+    reader = csv.DictReader(text, dialect=dialect)
+    for row in reader:
+        yield reader.line_num, row
+    text.detach()
+
+
+# Função para ler as linhas da primeira planilha de um XLSX em modo streaming
+def iter_xlsx(file):
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(file, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        header = [to_text(cell) or '' for cell in next(rows, ())]
+        for line_number, values in enumerate(rows, start=2):
+            if values is None or all(value is None for value in values):
+                continue
+            yield line_number, dict(zip(header, values))
+    finally:
+        workbook.close()
+
+
+# Função para escolher o leitor pelo nome do arquivo
+def iter_rows(file, file_name):
+    extension = os.path.splitext(file_name)[1].lower()
+    if extension == '.csv':
+        return iter_csv(file)
+    if extension in ('.xlsx', '.xlsm'):
+        return iter_xlsx(file)
+    raise ValueError(f"Formato não suportado: {extension}")
+
+
+# Função para validar e converter uma linha da planilha para a tabela
+def coerce_row(table_name, row, columns):
+    schema = SCHEMAS[table_name]
+    normalized = {str(key).strip().lower(): value for key, value in row.items() if key is not None}
+    values = {}
+    for column in columns:
+        try:
+            values[column] = schema[column](normalized.get(column))
+        except (ValueError, TypeError) as e:
+            raise ValueError(f"{column}: {e}")
+    missing = [column for column in REQUIRED[table_name] if not values.get(column)]
+    if missing:
+        raise ValueError(f"campos obrigatórios vazios: {', '.join(missing)}")
+    # O capital dos clientes sem alocação é convertido em fill_allocations; um
+    # valor inválido vira erro desta linha em vez de desfazer a transação inteira
+    if table_name == 'clientes' and needs_allocation(values):
+        try:
+            alocacao_engine.valor_capital(values['capital'])
+        except ValueError as e:
+            raise ValueError(f"capital: {e}")
+    return values
+
+
+# Função para saber se uma linha de clientes terá a alocação calculada pelo capital
+def needs_allocation(values):
+    return bool(values.get('capital')) and all(values.get(column) is None for column in alocacao_engine.COLUNAS)
+
+
+# Função para preencher a alocação das linhas de clientes sem valores,
+# usando a API em lote do motor de alocação
+def fill_allocations(batch):
+    pending = [values for values in batch if needs_allocation(values)]
+    if not pending:
+        return
+    matrix = alocacao_engine.projetar([alocacao_engine.valor_capital(values['capital']) for values in pending])
+    for values, allocation in zip(pending, matrix.tolist()):
+        values.update(zip(alocacao_engine.COLUNAS, allocation))
+
+
+# Função para importar as linhas já lidas de uma planilha.
+# progress(linhas_lidas, inseridas, erros) é chamado a cada lote.
+def import_rows(db_name, table_name, rows, progress=None):
+    if table_name not in SCHEMAS:
+        raise ValueError(f"Tabela não suportada: {table_name}")
+    with database.connection(db_name) as conn:
+        table_columns = {row[1] for row in conn.execute(f"PRAGMA table_info({table_name})")}
+    columns = [column for column in SCHEMAS[table_name] if column in table_columns]
+
+    summary = {'read': 0, 'inserted': 0, 'updated': 0, 'error_count': 0, 'errors': [],
+               'ignored_columns': [column for column in SCHEMAS[table_name] if column not in table_columns]}
+    batch = []
+
+    def flush(conn):
+        # Leads já cadastrados (e repetidos na planilha) são atualizados, não duplicados
+        inserted, updated = leads.upsert_many(conn, table_name, batch, INSERT_DEFAULTS[table_name])
+        summary['inserted'] += inserted
+        summary['updated'] += updated
+        batch.clear()
+
+    rows = iter(rows)
+    finished = False
+    while not finished:
+        # O lote é lido e convertido antes de abrir a transação
+        for line_number, row in rows:
+            summary['read'] += 1
+            try:
+                batch.append(coerce_row(table_name, row, columns))
+            except ValueError as e:
+                summary['error_count'] += 1
+                if len(summary['errors']) < MAX_REPORTED_ERRORS:
+                    summary['errors'].append({'linha': line_number, 'erro': str(e)})
+            if len(batch) >= BATCH_SIZE:
+                break
+        else:
+            finished = True
+        if batch:
+            if table_name == 'clientes':
+                fill_allocations(batch)
+            with database.transaction(db_name) as conn:
+                flush(conn)
+            if progress is not None:
+                progress(summary['read'], summary['inserted'], summary['error_count'])
+    if progress is not None:
+        progress(summary['read'], summary['inserted'], summary['error_count'])
+    return summary
+
+
+# Função para importar um arquivo CSV/XLSX enviado pelo painel
+def import_file(db_name, table_name, file, file_name, progress=None):
+    return import_rows(db_name, table_name, iter_rows(file, file_name), progress)
@@ -0,0 +1,163 @@
+import os
+import io
+import queue
+import hashlib
+import threading
+import drive
+import metrics
+
+# Envio de arquivos grandes (vídeos) ao Drive em partes.
+# Arquivos abaixo de LARGE_FILE seguem pelo envio resumível comum
+# (drive.upload_stream). Acima disso, como a sessão resumível do Google
+# Drive só aceita as partes em ordem, uma thread lê as próximas partes do
+# disco enquanto a atual é enviada, e o MD5 do arquivo inteiro é conferido
+# com o do Drive. progress(enviado, total) recebe o andamento real do envio.
+
+# Tamanho de cada parte (múltiplo de 256 KiB, como exige a API do Drive)
+PART_SIZE = 32 * 256 * 1024
+# Arquivos a partir deste tamanho usam o envio em partes
+LARGE_FILE = 4 * PART_SIZE
+# Partes lidas antes de serem enviadas na leitura antecipada
+PREFETCH_PARTS = 2
+
+
+# Função para descobrir o tamanho de um arquivo aberto sem lê-lo
+def stream_size(stream):
+    stream.seek(0, io.SEEK_END)
+    size = stream.tell()
+    stream.seek(0)
+    return size
+
+
+# Arquivo somente leitura que entrega as partes já lidas por uma thread em
+# segundo plano. O envio resumível lê o arquivo em ordem; se pedir uma
+# posição anterior (nova tentativa de uma parte), ela é relida do arquivo.
+class PrefetchingReader:
+    def __init__(self, stream, size, part_size=PART_SIZE, depth=PREFETCH_PARTS):
+        self.stream = stream
+        self.size = size
+        self.part_size = part_size
+        self.position = 0
+        self._part = None
+        self._next_offset = 0
+        self._md5 = hashlib.md5()
+        self._md5_done = False
+        self._lock = threading.Lock()
+        self._parts = queue.Queue(maxsize=depth)
+        self._closed = threading.Event()
+        self._thread = threading.Thread(target=self._prefetch, name='upload-prefetch', daemon=True)
+        self._thread.start()
+
+    def _read_at(self, offset, length):
+        with self._lock:
+            self.stream.seek(offset)
+            return self.stream.read(length)
+
+    def _prefetch(self):
+        offset = 0
+        try:
+            while offset < self.size and not self._closed.is_set():
+                data = self._read_at(offset, self.part_size)
+                if not data:
+                    raise IOError(f"Arquivo terminou em {offset} bytes; esperados {self.size}")
+                self._md5.update(data)
+                self._put((offset, data))
+                offset += len(data)
+            self._md5_done = offset >= self.size
+        except Exception as e:
+            self._put(e)
+
+    def _put(self, item):
+        while not self._closed.is_set():
+            try:
+                self._parts.put(item, timeout=0.5)
+                return
+            except queue.Full:
+                continue
+
+    # Parte que contém a posição pedida: a atual, a próxima da fila ou relida do arquivo
+    def _part_at(self, position):
+        if self._part is not None and self._part[0] <= position < self._part[0] + len(self._part[1]):
+            return self._part
+        if position < self._next_offset:
+            start = position - position % self.part_size
+            return start, self._read_at(start, self.part_size)
+        while True:
+            item = self._parts.get()
+            if isinstance(item, Exception):
+                raise item
+            self._part = item
+            self._next_offset = item[0] + len(item[1])
+            if position < self._next_offset:
+                return item
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            size = self.size - self.position
+        chunks = []
+        while size > 0 and self.position < self.size:
+            offset, data = self._part_at(self.position)
+            chunk = data[self.position - offset:self.position - offset + size]
+            chunks.append(chunk)
+            self.position += len(chunk)
+            size -= len(chunk)
+        return b''.join(chunks)
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self.position
+        elif whence == io.SEEK_END:
+            offset += self.size
+        self.position = max(0, min(offset, self.size))
+        return self.position
+
+    def tell(self):
+        return self.position
+
+    def seekable(self):
+        return True
+
+    def readable(self):
+        return True
+
+    # MD5 do arquivo inteiro (None se a leitura antecipada não chegou ao fim)
+    def md5(self):
+        self._thread.join()
+        return self._md5.hexdigest() if self._md5_done else None
+
+    def close(self):
+        self._closed.set()
+        self._thread.join()
+
+
+# Função para enviar pela sessão resumível, lendo as próximas partes enquanto
+# a atual é enviada. O MD5 calculado na leitura é conferido com o do Drive.
+def upload_pipelined(service, stream, name, size, mimetype, folder_id=None, progress=None):
+    from googleapiclient.http import MediaIoBaseUpload
+
+    reader = PrefetchingReader(stream, size)
+    try:
+        media = MediaIoBaseUpload(reader, mimetype=mimetype, chunksize=PART_SIZE, resumable=True)
+        response = drive.upload_media(service, media, name, folder_id, progress, fields='id,md5Checksum')
+    finally:
+        reader.close()
+    expected, received = reader.md5(), response.get('md5Checksum')
+    if expected is not None and received is not None and expected != received:
+        raise IOError(f"MD5 do Drive ({received}) diferente do arquivo enviado ({expected})")
+    return response.get('id')
+
+
+# Função para enviar um arquivo aberto escolhendo a estratégia pelo tamanho
+@metrics.timed('chunked_upload.upload')
+def upload(service, stream, name, mimetype=None, folder_id=None, progress=None):
+    size = stream_size(stream)
+    mimetype = mimetype or drive.guess_mimetype(name)
+    if size < LARGE_FILE:
+        return drive.upload_stream(service, stream, name, mimetype, folder_id, progress)
+    return upload_pipelined(service, stream, name, size, mimetype, folder_id, progress)
+
+
+# Função para enviar um arquivo local
+def upload_file(service, file_path, name=None, folder_id=None, progress=None):
+    with open(file_path, 'rb') as f:
+        return upload(service, f, name or os.path.basename(file_path), folder_id=folder_id, progress=progress)
@@ -0,0 +1,221 @@
+import os
+import time
+import queue
+import sqlite3
+import threading
+import atexit
+from contextlib import contextmanager
+
+# Bancos de dados usados pelos aplicativos
+PROFILES_DB = 'client_profiles.db'
+CLIENTES_DB = 'clientes.db'
+
+# Tempo máximo (ms) que uma conexão espera por um lock antes de falhar
+BUSY_TIMEOUT_MS = 5000
+
+# Quantidade de comandos preparados mantidos em cache por conexão
+STATEMENT_CACHE_SIZE = 256
+
+# Quantidade máxima de conexões ociosas mantidas por banco
+MAX_IDLE_CONNECTIONS = 8
+
+# Pragmas aplicados a toda conexão nova. Em modo WAL os leitores não
+# bloqueiam o escritor (e vice-versa), e synchronous=NORMAL só faz fsync
+# nos checkpoints, o que é seguro em WAL.
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}",
+    "PRAGMA cache_size=-16000",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA foreign_keys=ON",
+)
+
+
+# Pool de conexões de um único arquivo de banco de dados
+class ConnectionPool:
+    def __init__(self, path, max_idle=MAX_IDLE_CONNECTIONS):
+        self.path = path
+        self._idle = queue.LifoQueue(maxsize=max_idle)
+        self._version_conn = None
+        self._version_lock = threading.Lock()
+
+    def _open(self):
+        conn = sqlite3.connect(
+            self.path,
+            timeout=BUSY_TIMEOUT_MS / 1000,
+            isolation_level=None,
+            check_same_thread=False,
+            cached_statements=STATEMENT_CACHE_SIZE,
+        )
+        for pragma in PRAGMAS:
+            conn.execute(pragma)
+        return conn
+
+    def acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            return self._open()
+
+    def release(self, conn):
+        # Nunca devolve ao pool uma conexão com transação aberta
+        if conn.in_transaction:
+            conn.rollback()
+        try:
+            self._idle.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+    # PRAGMA data_version só muda quando *outra* conexão grava no banco.
+    # Por isso a versão é lida numa conexão dedicada que nunca escreve: assim
+    # ela enxerga as escritas do próprio pool e as de outros processos.
+    def data_version(self):
+        with self._version_lock:
+            if self._version_conn is None:
+                self._version_conn = self._open()
+            return self._version_conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+        with self._version_lock:
+            if self._version_conn is not None:
+                self._version_conn.close()
+                self._version_conn = None
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+# Esperas acima deste tempo (ms) no BEGIN IMMEDIATE contam como espera por lock
+LOCK_WAIT_THRESHOLD_MS = 1.0
+
+# Contadores de espera pelo lock de escrita (por processo)
+_lock_stats = {'transactions': 0, 'waits': 0, 'wait_ms': 0.0, 'timeouts': 0}
+_lock_stats_lock = threading.Lock()
+
+
+# Função para obter o pool de um banco (um por processo e por arquivo)
+def get_pool(db_name):
+    path = os.path.abspath(db_name)
+    pool = _pools.get(path)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(path)
+            if pool is None:
+                pool = _pools[path] = ConnectionPool(path)
+    return pool
+
+
+# Função para pegar uma conexão do pool durante um bloco "with"
+@contextmanager
+def connection(db_name):
+    pool = get_pool(db_name)
+    conn = pool.acquire()
+    try:
+        yield conn
+    finally:
+        pool.release(conn)
+
+
+# Função para executar um bloco de escrita dentro de uma transação.
+# BEGIN IMMEDIATE reserva o lock de escrita logo no início, evitando
+# falhas de "database is locked" ao promover um lock de leitura.
+@contextmanager
+def transaction(db_name):
+    with connection(db_name) as conn, begin(conn):
+        yield conn
+
+
+# Função para abrir uma transação de escrita numa conexão que já está em uso
+@contextmanager
+def begin(conn):
+    start = time.perf_counter()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+    except sqlite3.OperationalError:
+        record_lock_wait((time.perf_counter() - start) * 1000, timed_out=True)
+        raise
+    record_lock_wait((time.perf_counter() - start) * 1000)
+    try:
+        yield conn
+    except BaseException:
+        conn.rollback()
+        raise
+    else:
+        conn.commit()
+
+
+# Função para registrar quanto tempo uma transação esperou pelo lock de escrita
+def record_lock_wait(wait_ms, timed_out=False):
+    with _lock_stats_lock:
+        _lock_stats['transactions'] += 1
+        if wait_ms >= LOCK_WAIT_THRESHOLD_MS or timed_out:
+            _lock_stats['waits'] += 1
+            _lock_stats['wait_ms'] += wait_ms
+        if timed_out:
+            _lock_stats['timeouts'] += 1
+
+
+# Função para obter uma cópia dos contadores de espera por lock
+def lock_stats():
+    with _lock_stats_lock:
+        return dict(_lock_stats)
+
+
+# Função para zerar os contadores de espera por lock
+def reset_lock_stats():
+    with _lock_stats_lock:
+        _lock_stats.update(transactions=0, waits=0, wait_ms=0.0, timeouts=0)
+
+
+# Função para executar uma consulta e retornar todas as linhas
+def fetch_all(db_name, query, params=()):
+    with connection(db_name) as conn:
+        return conn.execute(query, params).fetchall()
+
+
+# Função para executar um único comando de escrita e retornar o id inserido
+def execute(db_name, query, params=()):
+    with transaction(db_name) as conn:
+        return conn.execute(query, params).lastrowid
+
+
+# Função para copiar um snapshot consistente do banco para outro arquivo.
+# A API de backup online lê dentro de uma única transação de leitura; em
+# modo WAL isso não bloqueia quem está escrevendo no banco.
+def backup_to(db_name, target_path):
+    with connection(db_name) as source:
+        target = sqlite3.connect(target_path)
+        try:
+            source.backup(target)
+        finally:
+            target.close()
+
+
+# Função para adicionar a uma tabela existente as colunas que ainda não existem
+def add_missing_columns(conn, table_name, columns):
+    existing = {row[1] for row in conn.execute(f"PRAGMA table_info({table_name})")}
+    for column, declared_type in columns.items():
+        if column not in existing:
+            conn.execute(f"ALTER TABLE {table_name} ADD COLUMN {column} {declared_type}")
+
+
+# Função para obter a versão atual dos dados do banco (muda a cada escrita)
+def data_version(db_name):
+    return get_pool(db_name).data_version()
+
+
+# Função para fechar todas as conexões ociosas do processo
+def close_all():
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.close()
+        _pools.clear()
+
+
+atexit.register(close_all)
@@ -0,0 +1,186 @@
+import os
+import time
+import tempfile
+import datetime
+import mimetypes
+import threading
+import metrics
+
+# As bibliotecas do Google são importadas dentro das funções: elas só são
+# carregadas quando o Drive é usado de fato, e não ao abrir a página.
+
+SCOPES = ['https://www.googleapis.com/auth/drive.file']
+
+# Antecedência (s) com que o token é renovado antes de expirar
+REFRESH_MARGIN = 5 * 60
+# Espera (s) antes de tentar de novo uma renovação que falhou
+REFRESH_RETRY = 30
+
+# Tamanho de cada parte do envio resumível (a API exige múltiplos de 256 KiB)
+CHUNK_SIZE = 8 * 256 * 1024
+
+# Falhas seguidas toleradas antes de desistir de um envio
+CHUNK_RETRIES = 5
+
+
+_service = None
+_credentials = None
+_service_lock = threading.Lock()
+_refresh_lock = threading.Lock()
+
+
+# Função para gravar o token de forma atômica (arquivo temporário + rename),
+# para que um processo concorrente nunca leia um token.json pela metade
+def save_token(creds, token_path):
+    directory = os.path.dirname(os.path.abspath(token_path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.token-', suffix='.json')
+    try:
+        with os.fdopen(fd, 'w') as token:
+            token.write(creds.to_json())
+        os.replace(tmp_path, token_path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+# Função para carregar (ou obter pela primeira vez) as credenciais do Drive
+@metrics.timed('drive.authenticate')
+def load_credentials(client_secrets_path=None):
+    from google.oauth2.credentials import Credentials
+    from google.auth.transport.requests import Request
+    from google_auth_oauthlib.flow import InstalledAppFlow
+
+    token_path = os.getenv('GOOGLE_TOKEN_PATH', 'token.json')
+    client_secrets_path = client_secrets_path or os.getenv('GOOGLE_CLIENT_SECRETS_PATH', 'client_secret.json')
+
+    creds = None
+    if os.path.exists(token_path):
+        creds = Credentials.from_authorized_user_file(token_path, SCOPES)
+
+    if not creds or not creds.valid:
+        if creds and creds.expired and creds.refresh_token:
+            creds.refresh(Request())
+        else:
+            flow = InstalledAppFlow.from_client_secrets_file(client_secrets_path, SCOPES)
+            creds = flow.run_local_server(port=0)
+        save_token(creds, token_path)
+    return creds
+
+
+# Função para calcular quantos segundos faltam para a próxima renovação
+def seconds_until_refresh(creds):
+    if creds.expiry is None:
+        return None
+    now = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+    return (creds.expiry - now).total_seconds() - REFRESH_MARGIN
+
+
+# Laço em segundo plano que renova o token antes de ele expirar
+def _refresh_loop():
+    from google.auth.transport.requests import Request
+
+    while True:
+        creds = _credentials
+        wait = seconds_until_refresh(creds)
+        if wait is None or not creds.refresh_token:
+            return
+        if wait > 0:
+            time.sleep(wait)
+        try:
+            with _refresh_lock:
+                creds.refresh(Request())
+                save_token(creds, os.getenv('GOOGLE_TOKEN_PATH', 'token.json'))
+        except Exception:
+            time.sleep(REFRESH_RETRY)
+
+
+# Cada requisição usa a sua própria conexão HTTP (httplib2 não é thread-safe),
+# o que permite compartilhar um único serviço entre as threads do processo
+def _build_request(http, *args, **kwargs):
+    import httplib2
+    from google_auth_httplib2 import AuthorizedHttp
+    from googleapiclient.http import HttpRequest
+
+    return HttpRequest(AuthorizedHttp(_credentials, http=httplib2.Http()), *args, **kwargs)
+
+
+# Função para obter o serviço do Google Drive, criado uma vez por processo.
+# O documento de discovery vem da cópia estática distribuída com o
+# google-api-python-client, sem requisição de rede.
+def get_service(client_secrets_path=None):
+    global _service, _credentials
+    import httplib2
+    from google_auth_httplib2 import AuthorizedHttp
+    from googleapiclient.discovery import build
+
+    if _service is not None:
+        return _service
+    with _service_lock:
+        if _service is None:
+            _credentials = load_credentials(client_secrets_path)
+            http = AuthorizedHttp(_credentials, http=httplib2.Http())
+            _service = build('drive', 'v3', http=http, requestBuilder=_build_request,
+                             static_discovery=True, cache_discovery=False)
+            threading.Thread(target=_refresh_loop, name='drive-token-refresh', daemon=True).start()
+    return _service
+
+
+# Função para preparar o serviço em segundo plano ao iniciar o aplicativo.
+# Só roda se já existir um token salvo (o fluxo OAuth interativo não é disparado).
+def warm_up(client_secrets_path=None):
+    if _service is None and os.path.exists(os.getenv('GOOGLE_TOKEN_PATH', 'token.json')):
+        threading.Thread(target=get_service, args=(client_secrets_path,),
+                         name='drive-warm-up', daemon=True).start()
+
+
+# Função para enviar um arquivo aberto (ou buffer em memória) ao Google Drive
+# em partes de CHUNK_SIZE, sem copiá-lo para um arquivo temporário.
+# progress(enviado, total) é opcional.
+@metrics.timed('drive.upload')
+def upload_stream(service, stream, name, mimetype=None, folder_id=None, progress=None):
+    from googleapiclient.http import MediaIoBaseUpload
+
+    mimetype = mimetype or guess_mimetype(name)
+    stream.seek(0)
+    media = MediaIoBaseUpload(stream, mimetype=mimetype, chunksize=CHUNK_SIZE, resumable=True)
+    return upload_media(service, media, name, folder_id, progress).get('id')
+
+
+# Função para descobrir o tipo MIME pelo nome do arquivo
+def guess_mimetype(name):
+    return mimetypes.guess_type(name)[0] or 'application/octet-stream'
+
+
+# Função para enviar uma mídia resumível (MediaIoBaseUpload ou compatível).
+# Se uma parte falhar, a mesma requisição é retomada a partir do último
+# byte confirmado pelo servidor. Retorna a resposta com os campos pedidos.
+def upload_media(service, media, name, folder_id=None, progress=None, fields='id'):
+    file_metadata = {'name': name}
+    if folder_id:
+        file_metadata['parents'] = [folder_id]
+    request = service.files().create(body=file_metadata, media_body=media, fields=fields)
+
+    response = None
+    failures = 0
+    while response is None:
+        try:
+            status, response = request.next_chunk()
+        except Exception:
+            failures += 1
+            if failures > CHUNK_RETRIES:
+                raise
+            time.sleep(min(2 ** failures, 30))
+            continue
+        failures = 0
+        if status is not None and progress is not None:
+            progress(status.resumable_progress, status.total_size)
+    if progress is not None:
+        progress(media.size(), media.size())
+    return response
+
+
+# Função para fazer o upload de um arquivo local para o Google Drive
+def upload_file_to_drive(service, file_path, name=None, folder_id=None, progress=None):
+    with open(file_path, 'rb') as f:
+        return upload_stream(service, f, name or os.path.basename(file_path),
+                             folder_id=folder_id, progress=progress)
@@ -0,0 +1,94 @@
+import os
+import json
+import hashlib
+import uuid
+import time
+import random
+import threading
+
+# Serviço falso do Google Drive para desenvolvimento e testes locais.
+# Implementa só o que os aplicativos usam: files().create(...).execute()
+# e o envio em partes via next_chunk(). Os arquivos ficam em FAKE_DRIVE_DIR.
+FAKE_DRIVE_DIR = os.getenv('FAKE_DRIVE_DIR', 'fake_drive')
+
+# Latência simulada (segundos) por requisição, usada nos benchmarks
+FAKE_DRIVE_LATENCY = float(os.getenv('FAKE_DRIVE_LATENCY', '0'))
+
+
+# Progresso de um envio em partes (mesma interface do MediaUploadProgress)
+class UploadProgress:
+    def __init__(self, resumable_progress, total_size):
+        self.resumable_progress = resumable_progress
+        self.total_size = total_size
+
+    def progress(self):
+        return self.resumable_progress / self.total_size if self.total_size else 1.0
+
+
+# Requisição de criação de arquivo, enviada em partes do tamanho do chunksize da mídia
+class CreateRequest:
+    def __init__(self, service, body, media_body):
+        self.service = service
+        self.body = body or {}
+        self.media = media_body
+        self.file_id = uuid.uuid4().hex
+        self.offset = 0
+        self.path = os.path.join(service.root, self.file_id)
+
+    def next_chunk(self):
+        self.service._simulate_network()
+        total = self.media.size() if self.media is not None else 0
+        if self.media is not None and self.offset < total:
+            chunksize = self.media.chunksize()
+            if chunksize is None or chunksize < 0:
+                chunksize = total
+            data = self.media.getbytes(self.offset, chunksize)
+            with open(self.path, 'ab') as f:
+                f.write(data)
+            self.offset += len(data)
+        if self.offset < total:
+            return UploadProgress(self.offset, total), None
+        return None, self.service._finish(self.file_id, self.body, self.offset)
+
+    def execute(self):
+        response = None
+        while response is None:
+            _, response = self.next_chunk()
+        return response
+
+
+class Files:
+    def __init__(self, service):
+        self.service = service
+
+    def create(self, body=None, media_body=None, fields=None):
+        return CreateRequest(self.service, body, media_body)
+
+
+class FakeDriveService:
+    def __init__(self, root=FAKE_DRIVE_DIR, latency=FAKE_DRIVE_LATENCY, failure_rate=0.0):
+        self.root = root
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    def files(self):
+        return Files(self)
+
+    def _simulate_network(self):
+        if self.latency:
+            time.sleep(self.latency)
+        if self.failure_rate and random.random() < self.failure_rate:
+            raise ConnectionError("Falha simulada no Drive falso")
+
+    def _finish(self, file_id, body, size):
+        md5 = hashlib.md5()
+        with open(os.path.join(self.root, file_id), 'ab+') as f:
+            f.seek(0)
+            while chunk := f.read(1024 * 1024):
+                md5.update(chunk)
+        metadata = dict(body, id=file_id, size=size, md5Checksum=md5.hexdigest())
+        with self._lock, open(os.path.join(self.root, f"{file_id}.json"), 'w') as f:
+            json.dump(metadata, f)
+        return {'id': file_id, 'md5Checksum': metadata['md5Checksum']}
@@ -0,0 +1,132 @@
+import os
+import time
+import hashlib
+import database
+
+# Índice de arquivos por conteúdo (SHA-256 + tamanho).
+# Antes de enviar um arquivo ao Drive o formulário consulta o índice; se o
+# mesmo conteúdo já foi enviado, o ID existente no Drive é reutilizado.
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+# Diretórios locais incluídos no relatório de armazenamento
+LOCAL_DIRECTORIES = ('logos', 'uploads')
+
+
+# Função para criar as tabelas do índice
+def create_file_index_table(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS file_index (
+            sha256 TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            drive_id TEXT NOT NULL,
+            file_name TEXT,
+            reuses INTEGER NOT NULL DEFAULT 0,
+            created_at REAL NOT NULL,
+            PRIMARY KEY (sha256, size)
+        ) WITHOUT ROWID
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS local_files (
+            path TEXT PRIMARY KEY,
+            directory TEXT NOT NULL,
+            sha256 TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            mtime REAL NOT NULL
+        )
+    ''')
+
+
+# Função para indexar o file_index pelo ID do Drive (miniaturas do painel)
+def create_drive_id_index(conn):
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_file_index_drive_id ON file_index (drive_id)")
+
+
+# Função para calcular o SHA-256 e o tamanho de um arquivo aberto ou buffer
+def hash_stream(stream):
+    digest = hashlib.sha256()
+    size = 0
+    stream.seek(0)
+    while chunk := stream.read(HASH_CHUNK_SIZE):
+        digest.update(chunk)
+        size += len(chunk)
+    stream.seek(0)
+    return digest.hexdigest(), size
+
+
+# Função para buscar o ID do Drive de um conteúdo já enviado (ou None)
+def lookup(sha256, size, db_name=database.PROFILES_DB):
+    with database.transaction(db_name) as conn:
+        row = conn.execute("SELECT drive_id FROM file_index WHERE sha256 = ? AND size = ?",
+                           (sha256, size)).fetchone()
+        if row is None:
+            return None
+        conn.execute("UPDATE file_index SET reuses = reuses + 1 WHERE sha256 = ? AND size = ?",
+                     (sha256, size))
+    return row[0]
+
+
+# Função para registrar um conteúdo enviado ao Drive (dentro de uma transação)
+def register(conn, sha256, size, drive_id, file_name=None):
+    conn.execute('''
+        INSERT OR IGNORE INTO file_index (sha256, size, drive_id, file_name, created_at)
+        VALUES (?, ?, ?, ?, ?)
+    ''', (sha256, size, drive_id, file_name, time.time()))
+
+
+# Função para indexar os arquivos de um diretório local.
+# Arquivos com o mesmo tamanho e data de modificação não são lidos de novo.
+def scan_directory(directory, db_name=database.PROFILES_DB):
+    with database.connection(db_name) as conn:
+        known = {path: (size, mtime) for path, size, mtime in
+                 conn.execute("SELECT path, size, mtime FROM local_files WHERE directory = ?", (directory,))}
+    found, changed = set(), []
+    for root, _, names in os.walk(directory):
+        for name in names:
+            path = os.path.join(root, name)
+            stat = os.stat(path)
+            found.add(path)
+            if known.get(path) == (stat.st_size, stat.st_mtime):
+                continue
+            with open(path, 'rb') as f:
+                sha256, size = hash_stream(f)
+            changed.append((path, directory, sha256, size, stat.st_mtime))
+    with database.transaction(db_name) as conn:
+        conn.executemany("INSERT OR REPLACE INTO local_files VALUES (?, ?, ?, ?, ?)", changed)
+        conn.executemany("DELETE FROM local_files WHERE path = ?",
+                         [(path,) for path in known.keys() - found])
+
+
+# Função para montar o resumo de armazenamento (diretórios locais e Drive)
+def storage_summary(db_name=database.PROFILES_DB):
+    for directory in LOCAL_DIRECTORIES:
+        if os.path.isdir(directory):
+            scan_directory(directory, db_name)
+    with database.connection(db_name) as conn:
+        local = conn.execute('''
+            SELECT directory, COUNT(*), SUM(size), SUM(unique_size)
+            FROM (
+                SELECT directory, size,
+                       CASE WHEN ROW_NUMBER() OVER (PARTITION BY directory, sha256, size ORDER BY path) = 1
+                            THEN size ELSE 0 END AS unique_size
+                FROM local_files
+            )
+            GROUP BY directory
+        ''').fetchall()
+        overall = conn.execute('''
+            SELECT 'total', COUNT(*), COALESCE(SUM(size), 0),
+                   (SELECT COALESCE(SUM(size), 0) FROM (SELECT DISTINCT sha256, size FROM local_files))
+            FROM local_files
+        ''').fetchone()
+        drive = conn.execute('''
+            SELECT COUNT(*), COALESCE(SUM(size), 0), COALESCE(SUM(reuses), 0), COALESCE(SUM(size * reuses), 0)
+            FROM file_index
+        ''').fetchone()
+    return {
+        'local': [
+            {'diretório': directory, 'arquivos': files, 'bytes': total, 'bytes únicos': unique}
+            for directory, files, total, unique in local + [overall]
+        ],
+        'drive': {'arquivos únicos': drive[0], 'bytes': drive[1], 'reutilizações': drive[2],
+                  'bytes economizados': drive[3]},
+    }
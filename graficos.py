@@ -0,0 +1,63 @@
+import io
+import threading
+from functools import lru_cache
+import alocacao as alocacao_engine
+import metrics
+
+# Renderização dos gráficos de alocação com cache.
+# Existem poucas combinações (investidor, capital), então o gráfico pronto
+# (PNG/SVG) fica em memória e só é desenhado na primeira vez. O matplotlib
+# só é importado quando o primeiro gráfico é desenhado.
+
+# Quantidade máxima de gráficos mantidos no cache (LRU)
+CHART_CACHE_SIZE = 64
+
+_warm_up_started = False
+_warm_up_lock = threading.Lock()
+
+
+# Função para desenhar o gráfico de pizza de uma alocação e retornar os bytes.
+# Usa Figure diretamente (sem pyplot), então nenhuma figura fica registrada
+# no estado global do matplotlib entre as execuções.
+@metrics.timed('graficos.render')
+def desenhar_grafico(alocacao, formato='png'):
+    from matplotlib.figure import Figure
+    from matplotlib import colormaps
+
+    labels = list(alocacao.keys())[1:]  # Excluir 'Valor em Patrimônio'
+    sizes = list(alocacao.values())[1:]  # Excluir 'Valor em Patrimônio'
+
+    fig = Figure()
+    ax = fig.subplots()
+    ax.pie(sizes, labels=labels, autopct='%1.1f%%', startangle=90,
+           colors=colormaps['Paired'](range(len(labels))))
+    ax.axis('equal')  # Equal aspect ratio ensures that pie is drawn as a circle.
+
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format=formato, bbox_inches='tight')
+    fig.clear()
+    return buffer.getvalue()
+
+
+# Função para obter o gráfico de (investidor, capital), renderizando só na primeira vez
+@lru_cache(maxsize=CHART_CACHE_SIZE)
+def grafico_alocacao(investidor, capital, formato='png'):
+    alocacao = alocacao_engine.alocacao_por_nivel(investidor, capital)
+    return desenhar_grafico(alocacao, formato)
+
+
+# Função para renderizar antecipadamente todos os gráficos do formulário
+def aquecer_cache(formato='png'):
+    for investidor, capitais in alocacao_engine.NIVEIS_CAPITAL.items():
+        for capital in capitais:
+            grafico_alocacao(investidor, capital, formato)
+
+
+# Função para aquecer o cache em segundo plano (uma vez por processo)
+def aquecer_em_segundo_plano(formato='png'):
+    global _warm_up_started
+    with _warm_up_lock:
+        if _warm_up_started:
+            return
+        _warm_up_started = True
+    threading.Thread(target=aquecer_cache, args=(formato,), name='chart-warm-up', daemon=True).start()
@@ -0,0 +1,176 @@
+import os
+import time
+import queue
+import atexit
+import threading
+from concurrent.futures import Future
+import database
+import metrics
+
+# Gravação em grupo (group commit) dos envios de formulário.
+# Cada banco tem um único thread escritor. Os envios que chegam dentro de
+# MAX_DELAY entram na mesma transação, cada um no seu SAVEPOINT (um envio
+# com erro não desfaz os outros), e quem enviou só recebe o resultado
+# depois do COMMIT. Com muitos envios ao mesmo tempo o custo do commit é
+# dividido pelo lote, em vez de pago por envio. Uso:
+#
+#     profile_id = group_commit.write(database.PROFILES_DB, lambda conn: ...)
+
+# Tempo máximo (s) que o primeiro envio de um lote espera pelos próximos
+MAX_DELAY = float(os.getenv('GROUP_COMMIT_DELAY', '0.005'))
+# Quantidade máxima de envios numa transação
+MAX_BATCH = int(os.getenv('GROUP_COMMIT_BATCH', '64'))
+# Tempo máximo (s) que quem enviou espera pela confirmação
+WRITE_TIMEOUT = 30
+# GROUP_COMMIT=0 grava cada envio na sua própria transação, sem o thread escritor
+ENABLED = os.getenv('GROUP_COMMIT', '1') != '0'
+
+_STOP = object()
+
+
+# A gravação não terminou dentro de WRITE_TIMEOUT mas já começou: ainda pode
+# ser confirmada (ou desfeita) depois que quem enviou desistiu de esperar
+class WritePending(TimeoutError):
+    pass
+
+
+# Escritor de um banco: junta os envios da fila e grava cada lote numa transação
+class GroupCommitWriter:
+    def __init__(self, db_name, max_batch=MAX_BATCH, max_delay=MAX_DELAY):
+        self.db_name = db_name
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.batches = 0
+        self.writes = 0
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name=f"group-commit-{os.path.basename(db_name)}",
+                                        daemon=True)
+        self._thread.start()
+
+    def submit(self, func):
+        future = Future()
+        self._queue.put((func, future))
+        return future
+
+    def close(self):
+        self._queue.put(_STOP)
+        self._thread.join(WRITE_TIMEOUT)
+
+    # Pega o primeiro envio (esperando o tempo que for) e os que chegarem até max_delay depois
+    def _next_batch(self):
+        item = self._queue.get()
+        if item is _STOP:
+            return None
+        batch = [item]
+        deadline = time.monotonic() + self.max_delay
+        while len(batch) < self.max_batch:
+            timeout = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is _STOP:
+                self._queue.put(_STOP)
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        while (batch := self._next_batch()) is not None:
+            self._write(batch)
+
+    def _write(self, batch):
+        results = []
+        try:
+            with metrics.span('group_commit.batch'), database.transaction(self.db_name) as conn:
+                for func, future in batch:
+                    if not future.set_running_or_notify_cancel():
+                        continue
+                    conn.execute("SAVEPOINT envio")
+                    try:
+                        result = func(conn)
+                    except Exception as e:
+                        conn.execute("ROLLBACK TO envio")
+                        conn.execute("RELEASE envio")
+                        future.set_exception(e)
+                        continue
+                    conn.execute("RELEASE envio")
+                    results.append((future, result))
+        except Exception as e:
+            # O BEGIN ou o COMMIT falhou: nenhum envio do lote foi gravado
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        # Só contam os envios gravados: os cancelados (tempo esgotado na fila)
+        # e os que falharam foram pulados ou desfeitos
+        if results:
+            self.batches += 1
+            self.writes += len(results)
+        for future, result in results:
+            future.set_result(result)
+
+
+_writers = {}
+_writers_lock = threading.Lock()
+
+
+# Função para obter o escritor de um banco (um por processo e por arquivo)
+def get_writer(db_name):
+    path = os.path.abspath(db_name)
+    writer = _writers.get(path)
+    if writer is None:
+        with _writers_lock:
+            writer = _writers.get(path)
+            if writer is None:
+                writer = _writers[path] = GroupCommitWriter(db_name)
+    return writer
+
+
+# Função para gravar: func(conn) roda dentro da transação do lote e o seu
+# retorno (por exemplo, o id inserido) é devolvido depois do COMMIT.
+# discard() é opcional e roda só quando o envio com certeza não foi gravado
+# (por exemplo, para apagar os arquivos do spool). Se o tempo acabar com o
+# envio ainda na fila, ele é cancelado e sai TimeoutError; se já estiver
+# sendo gravado, sai WritePending e discard() roda só se a gravação falhar.
+def write(db_name, func, discard=None):
+    if not ENABLED:
+        try:
+            with database.transaction(db_name) as conn:
+                return func(conn)
+        except Exception:
+            if discard is not None:
+                discard()
+            raise
+    future = get_writer(db_name).submit(func)
+    try:
+        return future.result(WRITE_TIMEOUT)
+    except Exception:
+        if not future.done() and not future.cancel():
+            if discard is not None:
+                future.add_done_callback(lambda future: future.exception() is not None and discard())
+            raise WritePending("a gravação ainda está em andamento") from None
+        if discard is not None:
+            discard()
+        if future.cancelled():
+            raise TimeoutError("o banco está ocupado; os dados não foram gravados") from None
+        raise
+
+
+# Função para obter o tamanho médio dos lotes de cada banco
+def stats():
+    with _writers_lock:
+        return {writer.db_name: {'batches': writer.batches, 'writes': writer.writes,
+                                 'average_batch': writer.writes / writer.batches if writer.batches else 0}
+                for writer in _writers.values()}
+
+
+# Função para gravar o que estiver na fila e parar os escritores
+def close_all():
+    with _writers_lock:
+        for writer in _writers.values():
+            writer.close()
+        _writers.clear()
+
+
+atexit.register(close_all)
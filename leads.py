@@ -0,0 +1,310 @@
+import json
+import argparse
+import database
+import schema
+import segments
+
+# Detecção de duplicados e upsert de leads (profiles e clientes).
+# Um lead é identificado pelas chaves normalizadas de schema.KEY_COLUMNS
+# (e-mail em minúsculas, telefone e CNPJ/CPF só com dígitos), cada uma com
+# um índice único. Um envio que bate com qualquer chave de um lead existente
+# atualiza esse lead em vez de criar outra linha. Ao juntar, as listas são
+# somadas e o e-mail, telefone ou documento que não ficou na linha vai para
+# lead_aliases, onde continua identificando o lead.
+#
+# Os duplicados antigos não são juntados pelas migrações (juntar apaga
+# linhas): enquanto existirem, os índices das chaves não são únicos. Para
+# juntá-los e criar os índices únicos, depois de conferir os grupos:
+#
+#     python leads.py --dry-run
+#     python leads.py                  # faz um backup de cada banco antes
+
+# Valores por lista "IN (...)"; cada consulta usa duas listas (abaixo do
+# limite antigo do SQLite, 999 variáveis)
+LOOKUP_CHUNK_SIZE = 450
+
+
+# Valores vazios não sobrescrevem o que já está gravado
+def is_empty(value):
+    return value is None or value == '' or value == '[]'
+
+
+# Função para criar os índices das chaves normalizadas.
+# Com unique=False (duplicados ainda não juntados) os índices só aceleram a busca;
+# com unique=True um índice comum que já exista é trocado pelo único.
+def create_key_indexes(conn, table_name, unique=True):
+    existing = {row[1]: row[2] for row in conn.execute(f"PRAGMA index_list({table_name})")}
+    for key in schema.KEY_COLUMNS[table_name]:
+        name = f"idx_{table_name}_{key}"
+        if unique and existing.get(name) == 0:
+            conn.execute(f"DROP INDEX {name}")
+        conn.execute(f'''
+            CREATE {'UNIQUE ' if unique else ''}INDEX IF NOT EXISTS {name}
+            ON {table_name} ({key}) WHERE {key} IS NOT NULL
+        ''')
+
+
+# Função para criar a tabela das chaves antigas dos leads juntados
+def create_alias_table(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS lead_aliases (
+            table_name TEXT NOT NULL,
+            key_name TEXT NOT NULL,
+            key TEXT NOT NULL,
+            lead_id INTEGER NOT NULL,
+            value TEXT,
+            PRIMARY KEY (table_name, key_name, key)
+        ) WITHOUT ROWID
+    ''')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_lead_aliases_lead ON lead_aliases (table_name, lead_id)")
+
+
+# Função para recalcular as chaves de todas as linhas (linhas antigas não têm chave)
+def backfill_keys(conn, table_name):
+    sources = [source for source, _ in schema.KEY_COLUMNS[table_name].values()]
+    keys = list(schema.KEY_COLUMNS[table_name])
+    cursor = conn.execute(f"SELECT id, {', '.join(sources)} FROM {table_name}")
+    assignments = ', '.join(f"{key} = ?" for key in keys)
+    while rows := cursor.fetchmany(5000):
+        updates = []
+        for row in rows:
+            values = schema.lookup_keys(table_name, dict(zip(sources, row[1:])))
+            updates.append(tuple(values[key] for key in keys) + (row[0],))
+        conn.executemany(f"UPDATE {table_name} SET {assignments} WHERE id = ?", updates)
+
+
+# Função para buscar os ids dos leads que batem com qualquer uma das chaves.
+# Cada chave é uma busca no seu índice e outra em lead_aliases.
+def matching_ids(conn, table_name, keys):
+    keys = {key: value for key, value in keys.items() if value is not None}
+    if not keys:
+        return []
+    query = ' UNION '.join(f'''
+        SELECT id FROM {table_name} WHERE {key} = ?
+        UNION SELECT a.lead_id FROM lead_aliases a JOIN {table_name} t ON t.id = a.lead_id
+        WHERE a.table_name = '{table_name}' AND a.key_name = '{key}' AND a.key = ?
+    ''' for key in keys)
+    params = [value for value in keys.values() for _ in range(2)]
+    return sorted(row[0] for row in conn.execute(query, params))
+
+
+# Função para somar duas listas JSON, sem repetir valores e mantendo a ordem
+def union_lists(old, new):
+    items = segments.split_values(old)
+    items += [item for item in segments.split_values(new) if item not in items]
+    return json.dumps(items)
+
+
+# Função para juntar valores de várias linhas do mesmo lead.
+# As linhas vêm da mais antiga para a mais nova; o valor mais novo não vazio
+# vence, menos nas colunas de lista, que ficam com a união das listas.
+def merge_values(table_name, rows):
+    list_columns = schema.LIST_COLUMNS[table_name]
+    merged = {}
+    for row in rows:
+        for column, value in row.items():
+            if column in list_columns and not is_empty(merged.get(column)) and not is_empty(value):
+                value = union_lists(merged[column], value)
+            if column not in merged or not is_empty(value):
+                merged[column] = value
+    return merged
+
+
+# Função para guardar em lead_aliases as chaves das linhas juntadas que não
+# ficaram na linha mantida (ex.: o e-mail antigo de quem trocou de e-mail)
+def save_aliases(conn, table_name, lead_id, rows, merged):
+    for key, (source, normalize) in schema.KEY_COLUMNS[table_name].items():
+        kept = normalize(merged.get(source))
+        for row in rows:
+            alias = normalize(row.get(source))
+            if alias is not None and alias != kept:
+                conn.execute('''
+                    INSERT OR REPLACE INTO lead_aliases (table_name, key_name, key, lead_id, value)
+                    VALUES (?, ?, ?, ?, ?)
+                ''', (table_name, key, alias, lead_id, row[source]))
+
+
+# Função para ler uma linha como dicionário
+def read_row(conn, table_name, row_id):
+    cursor = conn.execute(f"SELECT * FROM {table_name} WHERE id = ?", (row_id,))
+    return dict(zip((description[0] for description in cursor.description), cursor.fetchone()))
+
+
+# Função para juntar as linhas "others" na linha "target" (a mais antiga).
+# Os envios pendentes na fila do Drive e as chaves antigas passam a apontar
+# para a linha mantida.
+def merge_rows(conn, table_name, target, others):
+    ids = [target] + list(others)
+    cursor = conn.execute(f"SELECT * FROM {table_name} WHERE id IN ({', '.join('?' for _ in ids)}) ORDER BY id", ids)
+    names = [description[0] for description in cursor.description]
+    rows = [dict(zip(names, row)) for row in cursor.fetchall()]
+    merged = merge_values(table_name, rows)
+    merged.pop('id')
+    merged.update(schema.lookup_keys(table_name, merged))
+
+    placeholders = ', '.join('?' for _ in others)
+    if table_name == 'profiles':
+        conn.execute(f"UPDATE upload_outbox SET profile_id = ? WHERE profile_id IN ({placeholders})",
+                     [target] + list(others))
+    conn.execute(f"UPDATE lead_aliases SET lead_id = ? WHERE table_name = ? AND lead_id IN ({placeholders})",
+                 [target, table_name] + list(others))
+    save_aliases(conn, table_name, target, rows, merged)
+    # Apaga as cópias antes de atualizar, para liberar as chaves únicas
+    conn.execute(f"DELETE FROM {table_name} WHERE id IN ({placeholders})", list(others))
+    assignments = ', '.join(f"{column} = ?" for column in merged)
+    conn.execute(f"UPDATE {table_name} SET {assignments} WHERE id = ?", list(merged.values()) + [target])
+
+
+# Função para completar uma linha nova com os valores padrão das colunas vazias
+def with_defaults(data, defaults):
+    if not defaults:
+        return data
+    return dict(data, **{column: value for column, value in defaults.items() if data.get(column) is None})
+
+
+# Função para gravar um lead: atualiza o existente (se alguma chave bater) ou insere.
+# defaults só vale para a inserção: num lead existente, coluna vazia mantém o valor gravado.
+# Precisa ser chamada dentro de uma transação. Retorna (id, atualizado).
+def upsert(conn, table_name, data, defaults=None):
+    values = schema.validate(table_name, data)
+    ids = matching_ids(conn, table_name, {key: values.get(key) for key in schema.KEY_COLUMNS[table_name]})
+    if not ids:
+        return schema.insert(conn, table_name, with_defaults(data, defaults)), False
+
+    target = ids[0]
+    # O envio liga leads que estavam separados (ex.: e-mail de um, telefone de outro)
+    if len(ids) > 1:
+        merge_rows(conn, table_name, target, ids[1:])
+    changes = {column: value for column, value in values.items() if not is_empty(value)}
+    if changes:
+        current = read_row(conn, table_name, target)
+        merged = merge_values(table_name, [current, changes])
+        save_aliases(conn, table_name, target, [current], merged)
+        assignments = ', '.join(f"{column} = ?" for column in changes)
+        conn.execute(f"UPDATE {table_name} SET {assignments} WHERE id = ?",
+                     [merged[column] for column in changes] + [target])
+    return target, True
+
+
+# Função para gravar um lote de leads (importação em lote).
+# As linhas que não batem com nenhum lead existente nem com outra linha do
+# lote vão num único executemany; as demais passam, em ordem, pelo upsert.
+# defaults são os valores das colunas vazias nas linhas inseridas.
+# Retorna (inseridas, atualizadas).
+def upsert_many(conn, table_name, rows, defaults=None):
+    row_keys = [schema.lookup_keys(table_name, row) for row in rows]
+    groups = group_duplicates(enumerate(row_keys))
+
+    existing = set()
+    for key in schema.KEY_COLUMNS[table_name]:
+        values = list({keys[key] for keys in row_keys if keys.get(key) is not None})
+        for start in range(0, len(values), LOOKUP_CHUNK_SIZE):
+            chunk = values[start:start + LOOKUP_CHUNK_SIZE]
+            placeholders = ', '.join('?' for _ in chunk)
+            existing.update((key, row[0]) for row in conn.execute(f'''
+                SELECT {key} FROM {table_name} WHERE {key} IN ({placeholders})
+                UNION SELECT key FROM lead_aliases WHERE table_name = ? AND key_name = ? AND key IN ({placeholders})
+            ''', chunk + [table_name, key] + chunk))
+
+    new_rows, inserted, updated = [], 0, 0
+    now = schema.timestamp()
+    for group in groups:
+        if len(group) == 1 and not any(item in existing for item in row_keys[group[0]].items()):
+            row = with_defaults(rows[group[0]], defaults)
+            new_rows.append(dict(schema.validate(table_name, row), created_at=row.get('created_at') or now))
+            continue
+        for index in group:
+            _, was_updated = upsert(conn, table_name, rows[index], defaults)
+            updated += was_updated
+            inserted += not was_updated
+
+    if new_rows:
+        columns = list(new_rows[0])
+        conn.executemany(
+            f"INSERT INTO {table_name} ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)})",
+            [tuple(row.get(column) for column in columns) for row in new_rows])
+    return inserted + len(new_rows), updated
+
+
+# Função para agrupar itens que compartilham alguma chave (union-find).
+# items: iterável de (id, {chave: valor}). Retorna todos os grupos, cada um
+# com os ids em ordem de chegada. Tempo quase linear: uma consulta ao
+# dicionário por chave e union-find com compressão de caminho.
+def group_duplicates(items):
+    parent = {}
+    arrival = {}
+    first_owner = {}
+
+    def find(item):
+        root = item
+        while parent[root] != root:
+            root = parent[root]
+        while parent[item] != root:
+            parent[item], item = root, parent[item]
+        return root
+
+    for item, keys in items:
+        parent[item] = item
+        arrival[item] = len(arrival)
+        for key, value in keys.items():
+            if value is None:
+                continue
+            owner = first_owner.setdefault((key, value), item)
+            if owner != item:
+                a, b = find(owner), find(item)
+                if a != b:
+                    # A raiz é sempre o item que chegou primeiro
+                    if arrival[a] > arrival[b]:
+                        a, b = b, a
+                    parent[b] = a
+
+    groups = {}
+    for item in arrival:
+        groups.setdefault(find(item), []).append(item)
+    return list(groups.values())
+
+
+# Função para juntar os duplicados já gravados numa tabela.
+# Lê só os ids e as chaves, agrupa em memória e junta cada grupo na linha
+# mais antiga. Retorna [(id mantido, [ids juntados])].
+def dedupe(conn, table_name, dry_run=False):
+    keys = list(schema.KEY_COLUMNS[table_name])
+    cursor = conn.execute(f"SELECT id, {', '.join(keys)} FROM {table_name} ORDER BY id")
+    groups = group_duplicates((row[0], dict(zip(keys, row[1:]))) for row in cursor)
+    merged = [(group[0], group[1:]) for group in groups if len(group) > 1]
+    if not dry_run:
+        for target, others in merged:
+            merge_rows(conn, table_name, target, others)
+    return merged
+
+
+# Função para copiar o banco antes de juntar os duplicados (juntar apaga linhas)
+def backup(db_name):
+    path = f"{db_name}.antes-dedupe-{schema.timestamp().replace(' ', '_').replace(':', '')}"
+    database.backup_to(db_name, path)
+    return path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Junta os leads duplicados de profiles e clientes.")
+    parser.add_argument('--dry-run', action='store_true', help="só mostra os grupos encontrados")
+    args = parser.parse_args(argv)
+    import migrations
+
+    for table_name, db_name in schema.DATABASES.items():
+        migrations.ensure_migrated(db_name)
+        if not args.dry_run:
+            print(f"{db_name}: backup em {backup(db_name)}")
+        with database.transaction(db_name) as conn:
+            merged = dedupe(conn, table_name, args.dry_run)
+            if not args.dry_run:
+                create_key_indexes(conn, table_name, unique=True)
+        removed = sum(len(others) for _, others in merged)
+        print(f"{table_name}: {len(merged)} leads com duplicados, {removed} linhas "
+              f"{'a juntar' if args.dry_run else 'juntadas'}")
+        for target, others in merged[:20]:
+            print(f"  {target} <- {json.dumps(others)}")
+
+
+if __name__ == "__main__":
+    main()
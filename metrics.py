@@ -0,0 +1,280 @@
+import os
+import sys
+import json
+import time
+import atexit
+import bisect
+import argparse
+import threading
+from collections import deque
+from contextlib import contextmanager
+from functools import wraps
+
+# Métricas de desempenho dos caminhos críticos (criação de tabelas,
+# autenticação no Drive, uploads, gravações e gráficos).
+# Cada operação é medida com span("nome") ou @timed("nome") e vai para um
+# histograma em memória do processo. Como cada aplicativo Streamlit roda no
+# seu próprio processo, um thread grava de tempos em tempos o snapshot em
+# METRICS_DIR; o painel administrativo junta os snapshots de todos os
+# processos. O formato texto do Prometheus é opcional:
+#
+#     python metrics.py                  # imprime as métricas no formato Prometheus
+#     METRICS_PROM_FILE=/var/lib/node_exporter/virtus.prom streamlit run perfil.py
+
+METRICS_DIR = os.getenv('METRICS_DIR', 'metrics')
+# Arquivo .prom atualizado junto com o snapshot (textfile collector do node_exporter)
+METRICS_PROM_FILE = os.getenv('METRICS_PROM_FILE')
+# Intervalo (s) entre as gravações do snapshot
+FLUSH_INTERVAL = 15
+# Snapshots sem atualização há mais tempo que isso são de processos encerrados
+# (quando não dá para conferir se o processo ainda existe)
+STALE_AFTER = 24 * 60 * 60
+
+# Limites (ms) dos buckets do histograma, no estilo do Prometheus
+BUCKETS_MS = (1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000)
+# Quantidade de latências recentes guardadas por operação (para os percentis)
+RECENT_SAMPLES = 500
+
+_operations = {}
+_lock = threading.Lock()
+_flusher = None
+
+
+# Histograma de uma operação: contagem por bucket, soma, erros e amostras recentes
+class Histogram:
+    def __init__(self):
+        self.buckets = [0] * (len(BUCKETS_MS) + 1)
+        self.count = 0
+        self.errors = 0
+        self.sum_ms = 0.0
+        self.recent = deque(maxlen=RECENT_SAMPLES)
+
+    def observe(self, elapsed_ms, error=False):
+        self.buckets[bisect.bisect_left(BUCKETS_MS, elapsed_ms)] += 1
+        self.count += 1
+        self.sum_ms += elapsed_ms
+        if error:
+            self.errors += 1
+        self.recent.append((time.time(), round(elapsed_ms, 3), error))
+
+    def snapshot(self):
+        return {'buckets': list(self.buckets), 'count': self.count, 'errors': self.errors,
+                'sum_ms': self.sum_ms, 'recent': list(self.recent)}
+
+
+# Função para registrar a duração de uma operação
+def observe(name, elapsed_ms, error=False):
+    with _lock:
+        histogram = _operations.get(name)
+        if histogram is None:
+            histogram = _operations[name] = Histogram()
+        histogram.observe(elapsed_ms, error)
+    _start_flusher()
+
+
+# Função para medir um bloco "with"; exceções contam como erro e seguem adiante
+@contextmanager
+def span(name):
+    start = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        observe(name, (time.perf_counter() - start) * 1000, error=True)
+        raise
+    observe(name, (time.perf_counter() - start) * 1000)
+
+
+# Decorador para medir todas as chamadas de uma função
+def timed(name):
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+# Função para obter o snapshot das operações medidas neste processo
+def snapshot():
+    with _lock:
+        return {name: histogram.snapshot() for name, histogram in _operations.items()}
+
+
+# Função para identificar o aplicativo do processo ("streamlit run perfil.py" -> perfil)
+def process_name():
+    argv = sys.argv
+    script = argv[2] if len(argv) > 2 and argv[1] == 'run' else argv[0] if argv else ''
+    return os.path.splitext(os.path.basename(script))[0].strip('-') or 'python'
+
+
+# Função para montar o caminho do snapshot do processo
+def snapshot_path():
+    return os.path.join(METRICS_DIR, f"{process_name()}-{os.getpid()}.json")
+
+
+# Função para gravar o snapshot do processo em METRICS_DIR (e o .prom, se configurado)
+def flush():
+    data = snapshot()
+    if not data:
+        return
+    os.makedirs(METRICS_DIR, exist_ok=True)
+    app = process_name()
+    path = snapshot_path()
+    with open(path + '.tmp', 'w') as f:
+        json.dump({'app': app, 'pid': os.getpid(), 'updated_at': time.time(), 'operations': data}, f)
+    os.replace(path + '.tmp', path)
+    if METRICS_PROM_FILE:
+        with open(METRICS_PROM_FILE + '.tmp', 'w') as f:
+            f.write(prometheus_text())
+        os.replace(METRICS_PROM_FILE + '.tmp', METRICS_PROM_FILE)
+
+
+def _flush_loop():
+    while True:
+        time.sleep(FLUSH_INTERVAL)
+        try:
+            flush()
+        except OSError:
+            pass
+
+
+# Inicia o thread de gravação na primeira medição do processo
+def _start_flusher():
+    global _flusher
+    if _flusher is not None:
+        return
+    with _lock:
+        if _flusher is None:
+            _flusher = threading.Thread(target=_flush_loop, name='metrics-flush', daemon=True)
+            _flusher.start()
+            atexit.register(remove_snapshot)
+
+
+# Função para apagar o snapshot do processo ao encerrar: as métricas de um
+# processo que terminou não aparecem mais no painel
+def remove_snapshot():
+    try:
+        os.remove(snapshot_path())
+    except OSError:
+        pass
+
+
+# Função para saber se o processo de um snapshot ainda existe.
+# No Windows os.kill encerraria o processo, então lá vale só STALE_AFTER.
+def process_alive(pid):
+    if os.name == 'nt':
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+# Função para somar os snapshots de vários processos numa única visão
+def merge(snapshots):
+    merged = {}
+    for operations in snapshots:
+        for name, data in operations.items():
+            total = merged.setdefault(name, {'buckets': [0] * (len(BUCKETS_MS) + 1), 'count': 0,
+                                             'errors': 0, 'sum_ms': 0.0, 'recent': []})
+            total['buckets'] = [a + b for a, b in zip(total['buckets'], data['buckets'])]
+            total['count'] += data['count']
+            total['errors'] += data['errors']
+            total['sum_ms'] += data['sum_ms']
+            total['recent'].extend(data['recent'])
+    for total in merged.values():
+        total['recent'].sort()
+    return merged
+
+
+# Função para juntar as métricas gravadas por todos os processos com as deste processo.
+# Snapshots de processos que já terminaram (sem apagar o arquivo, por
+# exemplo depois de um kill) são apagados aqui.
+def collect():
+    snapshots = []
+    if os.path.isdir(METRICS_DIR):
+        for file_name in os.listdir(METRICS_DIR):
+            if not file_name.endswith('.json'):
+                continue
+            path = os.path.join(METRICS_DIR, file_name)
+            try:
+                with open(path) as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                continue
+            if data['pid'] == os.getpid():
+                continue
+            if not process_alive(data['pid']) or time.time() - data['updated_at'] > STALE_AFTER:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+                continue
+            snapshots.append(data['operations'])
+    snapshots.append(snapshot())
+    return merge(snapshots)
+
+
+# Função para calcular um percentil (0-100) das amostras recentes
+def percentile(values, p):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+
+# Função para resumir cada operação: contagem, erros, média e percentis recentes
+def summary(operations=None):
+    operations = collect() if operations is None else operations
+    rows = []
+    for name, data in sorted(operations.items()):
+        recent = [elapsed_ms for _, elapsed_ms, _ in data['recent']]
+        rows.append({
+            'operação': name, 'chamadas': data['count'], 'erros': data['errors'],
+            'média ms': round(data['sum_ms'] / data['count'], 2) if data['count'] else None,
+            'p50 ms': percentile(recent, 50), 'p95 ms': percentile(recent, 95),
+            'p99 ms': percentile(recent, 99), 'máx. recente ms': max(recent) if recent else None,
+        })
+    return rows
+
+
+# Função para gerar as métricas no formato texto de exposição do Prometheus
+def prometheus_text(operations=None):
+    operations = collect() if operations is None else operations
+    lines = [
+        '# HELP virtus_operation_duration_seconds Duração das operações medidas.',
+        '# TYPE virtus_operation_duration_seconds histogram',
+    ]
+    for name, data in sorted(operations.items()):
+        cumulative = 0
+        for limit, count in zip(BUCKETS_MS + ('+Inf',), data['buckets']):
+            cumulative += count
+            le = limit if limit == '+Inf' else f"{limit / 1000:g}"
+            lines.append(f'virtus_operation_duration_seconds_bucket{{operation="{name}",le="{le}"}} {cumulative}')
+        lines.append(f'virtus_operation_duration_seconds_sum{{operation="{name}"}} {data["sum_ms"] / 1000:.6f}')
+        lines.append(f'virtus_operation_duration_seconds_count{{operation="{name}"}} {data["count"]}')
+    lines.append('# HELP virtus_operation_errors_total Operações que terminaram com exceção.')
+    lines.append('# TYPE virtus_operation_errors_total counter')
+    for name, data in sorted(operations.items()):
+        lines.append(f'virtus_operation_errors_total{{operation="{name}"}} {data["errors"]}')
+    return '\n'.join(lines) + '\n'
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Exporta as métricas gravadas pelos aplicativos.")
+    parser.add_argument('--output', help="grava o texto Prometheus neste arquivo em vez de imprimir")
+    args = parser.parse_args(argv)
+    text = prometheus_text()
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text)
+    else:
+        sys.stdout.write(text)
+
+
+if __name__ == "__main__":
+    main()
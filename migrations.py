@@ -0,0 +1,185 @@
+import time
+import threading
+import database
+import schema
+import metrics
+import segments
+import search
+import file_index
+import upload_queue
+import leads
+import summaries
+
+# Migrações versionadas dos bancos.
+# Cada banco tem uma tabela schema_version com as versões já aplicadas, e
+# MIGRATIONS lista os passos em ordem. ensure_migrated() roda uma vez por
+# processo: nas reexecuções do Streamlit (a cada interação) não há DDL nem
+# consulta ao banco. Para mudar o esquema, acrescente um passo no fim da
+# lista do banco; nunca altere nem reordene os passos já publicados.
+
+
+# Passos de client_profiles.db
+def create_profiles(conn):
+    conn.execute(schema.create_statement('profiles'))
+
+
+# Bancos antigos foram criados com um esquema anterior; acrescenta as colunas que faltam
+def add_profiles_columns(conn):
+    database.add_missing_columns(conn, 'profiles', dict(schema.TABLES['profiles'][1:]))
+
+
+def create_filter_indexes(table_name):
+    def step(conn):
+        for column in schema.FILTER_COLUMNS[table_name]:
+            conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table_name}_{column} ON {table_name} ({column})")
+    return step
+
+
+# Chaves normalizadas dos leads: as linhas antigas recebem as chaves e os
+# índices são criados. Juntar duplicados apaga linhas, então a migração não
+# junta nada: se já houver duplicados, os índices ficam comuns até alguém
+# rodar "python leads.py" (que faz backup, junta e cria os índices únicos).
+def add_lead_keys(table_name):
+    def step(conn):
+        database.add_missing_columns(conn, table_name, {key: 'TEXT' for key in schema.KEY_COLUMNS[table_name]})
+        leads.backfill_keys(conn, table_name)
+        leads.create_key_indexes(conn, table_name, unique=not leads.dedupe(conn, table_name, dry_run=True))
+    return step
+
+
+# Data de cadastro (relatórios por mês); as linhas antigas ficam sem data
+def add_created_at(table_name):
+    def step(conn):
+        database.add_missing_columns(conn, table_name, {'created_at': 'TEXT'})
+        conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table_name}_created_at ON {table_name} (created_at)")
+    return step
+
+
+# Registro das linhas inseridas, alteradas ou apagadas, lido pela exportação
+# incremental do analytics_export.py (que apaga o que já exportou).
+# O registro guarda só a última alteração de cada linha: o INSERT OR REPLACE
+# troca a entrada anterior por uma com seq novo (AUTOINCREMENT nunca reusa
+# um seq). Assim, mesmo que a exportação nunca rode, o registro não passa de
+# uma entrada por linha da tabela (mais as linhas apagadas ainda não
+# exportadas). As linhas que já existiam entram no registro, então a
+# primeira exportação inclui todas.
+def create_change_log(table_name):
+    def step(conn):
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS row_changes (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                table_name TEXT NOT NULL,
+                row_id INTEGER NOT NULL
+            )
+        ''')
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_row_changes_table ON row_changes (table_name, seq)")
+        conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_row_changes_row ON row_changes (table_name, row_id)")
+        for event, row in (('INSERT', 'NEW'), ('UPDATE', 'NEW'), ('DELETE', 'OLD')):
+            conn.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS {table_name}_changes_{event.lower()} AFTER {event} ON {table_name} BEGIN
+                    INSERT OR REPLACE INTO row_changes (table_name, row_id) VALUES ('{table_name}', {row}.id);
+                END
+            ''')
+        conn.execute(f"INSERT OR IGNORE INTO row_changes (table_name, row_id) "
+                     f"SELECT '{table_name}', id FROM {table_name} ORDER BY id")
+    return step
+
+
+# Passos de clientes.db
+def create_clientes(conn):
+    conn.execute(schema.create_statement('clientes'))
+
+
+# (versão, descrição, função) por banco
+MIGRATIONS = {
+    database.PROFILES_DB: [
+        (1, "cria profiles", create_profiles),
+        (2, "acrescenta as colunas do esquema atual", add_profiles_columns),
+        (3, "tags de segmento", segments.create_segment_tables),
+        (4, "fila de envios ao Drive", upload_queue.create_outbox_table),
+        (5, "índice de arquivos", file_index.create_file_index_table),
+        (6, "busca textual", search.create_search_index),
+        (7, "índices dos filtros do painel", create_filter_indexes('profiles')),
+        (8, "chaves únicas dos leads", add_lead_keys('profiles')),
+        (9, "resumos do painel", summaries.create_profile_summary),
+        (10, "andamento dos envios ao Drive", upload_queue.add_progress_column),
+        (11, "busca de arquivos pelo ID do Drive", file_index.create_drive_id_index),
+        (12, "data de cadastro", add_created_at('profiles')),
+        (13, "registro de alterações", create_change_log('profiles')),
+        (14, "listas antigas convertidas para JSON", segments.normalize_legacy_lists),
+        (15, "chaves antigas dos leads juntados", leads.create_alias_table),
+    ],
+    database.CLIENTES_DB: [
+        (1, "cria clientes", create_clientes),
+        (2, "índices dos filtros do painel", create_filter_indexes('clientes')),
+        (3, "chaves únicas dos leads", add_lead_keys('clientes')),
+        (4, "resumos do painel", summaries.create_clientes_summary),
+        (5, "data de cadastro", add_created_at('clientes')),
+        (6, "registro de alterações", create_change_log('clientes')),
+        (7, "chaves antigas dos leads juntados", leads.create_alias_table),
+    ],
+}
+
+# Tabelas de cada banco conferidas com schema.verify depois das migrações
+VERIFIED_TABLES = {
+    database.PROFILES_DB: ('profiles',),
+    database.CLIENTES_DB: ('clientes',),
+}
+
+_migrated = set()
+_migrated_lock = threading.Lock()
+
+
+# Função para ler a versão atual do banco
+def current_version(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            description TEXT NOT NULL,
+            applied_at REAL NOT NULL
+        )
+    ''')
+    return conn.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version").fetchone()[0]
+
+
+# Função para aplicar os passos pendentes de um banco.
+# Cada passo roda na sua própria transação junto com o registro da versão;
+# a versão é relida dentro da transação, então dois processos iniciando ao
+# mesmo tempo não aplicam o mesmo passo duas vezes.
+# Retorna as versões aplicadas.
+def migrate(db_name):
+    applied = []
+    with metrics.span('migrations.migrate'):
+        for version, description, step in MIGRATIONS[db_name]:
+            with database.transaction(db_name) as conn:
+                if current_version(conn) >= version:
+                    continue
+                step(conn)
+                conn.execute("INSERT INTO schema_version (version, description, applied_at) VALUES (?, ?, ?)",
+                             (version, description, time.time()))
+            applied.append(version)
+        with database.connection(db_name) as conn:
+            for table_name in VERIFIED_TABLES[db_name]:
+                schema.verify(conn, table_name)
+    return applied
+
+
+# Função para garantir que o banco está migrado (uma vez por processo)
+def ensure_migrated(db_name):
+    if db_name in _migrated:
+        return
+    with _migrated_lock:
+        if db_name not in _migrated:
+            migrate(db_name)
+            _migrated.add(db_name)
+
+
+# Função para migrar todos os bancos (por exemplo, antes de um deploy)
+def main():
+    for db_name in MIGRATIONS:
+        applied = migrate(db_name)
+        print(f"{db_name}: {'versões ' + ', '.join(map(str, applied)) + ' aplicadas' if applied else 'em dia'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,123 +1,85 @@
 import os
-import json
 import streamlit as st
 import sqlite3
 from dotenv import load_dotenv
-from google.oauth2.credentials import Credentials
-from googleapiclient.discovery import build
-from googleapiclient.http import MediaFileUpload
-from google.auth.transport.requests import Request
-from google_auth_oauthlib.flow import InstalledAppFlow
 
-# Função para autenticar no Google Drive
-def authenticate_google_drive():
-    SCOPES = ['https://www.googleapis.com/auth/drive.file']
-    
-    creds = None
-    token_path = os.getenv('GOOGLE_TOKEN_PATH', 'token.json')
-    client_secrets_path = os.getenv('GOOGLE_CLIENT_SECRETS_PATH', 'client_secret.json')
-    
-    if os.path.exists(token_path):
-        creds = Credentials.from_authorized_user_file(token_path, SCOPES)
-    
-    if not creds or not creds.valid:
-        if creds and creds.expired and creds.refresh_token:
-            creds.refresh(Request())
-        else:
-            flow = InstalledAppFlow.from_client_secrets_file(client_secrets_path, SCOPES)
-            creds = flow.run_local_server(port=0)
-        with open(token_path, 'w') as token:
-            token.write(creds.to_json())
-    
-    return build('drive', 'v3', credentials=creds)
-
-# Função para fazer o upload do arquivo para o Google Drive
-def upload_file_to_drive(service, file, folder_id=None):
-    if file is None:
-        return None
-
-    # Salvar o arquivo temporariamente
-    file_path = f"temp_{file.name}"
-    with open(file_path, "wb") as f:
-        f.write(file.getbuffer())
-
-    file_metadata = {'name': file.name}
-    if folder_id:
-        file_metadata['parents'] = [folder_id]
-    media = MediaFileUpload(file_path, resumable=True)
-    
-    try:
-        uploaded_file = service.files().create(body=file_metadata, media_body=media, fields='id').execute()
-    except Exception as e:
-        st.error(f"Erro ao fazer upload do arquivo: {e}")
-        return None
-    
-    # Remover o arquivo temporário após o upload
-    os.remove(file_path)
-    
-    return uploaded_file.get('id')
-
-# Função para carregar variáveis de ambiente
+# Função para carregar variáveis de ambiente.
+# Precisa rodar antes de importar os módulos do projeto, que leem as
+# configurações (UPLOAD_*, GROUP_COMMIT*, METRICS_DIR, DRIVE_BACKEND...) ao
+# serem importados.
 load_dotenv()
 
-# Função para criar conexão com o banco de dados
-def create_connection():
-    try:
-        conn = sqlite3.connect('client_profiles.db')
-        return conn
-    except sqlite3.Error as e:
-        st.error(f"Erro ao conectar ao banco de dados: {e}")
-        return None
-
-# Função para criar a tabela no banco de dados
+import database
+import drive
+import fake_drive
+import upload_queue
+import leads
+import group_commit
+import migrations
+import metrics
+
+# Função para obter o serviço do Drive usado pelos workers de upload.
+# Com DRIVE_BACKEND=fake os arquivos vão para um Drive falso local.
+def get_drive_service():
+    if os.getenv('DRIVE_BACKEND') == 'fake':
+        return fake_drive.FakeDriveService()
+    return drive.get_service()
+
+# Função para criar e atualizar as tabelas no banco de dados.
+# As migrações rodam uma vez por processo; nas reexecuções não fazem nada.
 def create_table():
-    conn = create_connection()
-    if conn is not None:
-        try:
-            conn.execute('''
-                CREATE TABLE IF NOT EXISTS profiles (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    company_name TEXT, website TEXT, client_type TEXT,
-                    contact_name TEXT, email TEXT, phone TEXT, address TEXT,
-                    no_physical_address BOOLEAN, capital TEXT, desired_revenue TEXT,
-                    services TEXT, payment_methods TEXT, source TEXT, business_field TEXT,
-                    business_type TEXT, context TEXT, return_time TEXT, market_analysis BOOLEAN,
-                    difficulties TEXT, cnpj_or_cpf TEXT, logo_path TEXT, pdf_path TEXT,
-                    video_path TEXT, employees TEXT
-                )
-            ''')
-            conn.commit()
-        except sqlite3.Error as e:
-            st.error(f"Erro ao criar tabela: {e}")
-        finally:
-            conn.close()
-
-# Função para inserir dados no banco de dados
-def insert_data(data, logo_path=None, pdf_path=None, video_path=None):
-    conn = create_connection()
-    if conn is not None:
-        try:
-            cursor = conn.cursor()
-            columns = [
-                'company_name', 'website', 'client_type', 'contact_name', 
-                'email', 'phone', 'address', 'no_physical_address', 
-                'capital', 'desired_revenue', 'services', 'payment_methods', 
-                'source', 'business_field', 'business_type', 'context', 
-                'return_time', 'market_analysis', 'difficulties', 
-                'cnpj_or_cpf', 'logo_path', 'pdf_path', 'video_path', 'employees'
-            ]
-
-            placeholders = ', '.join('?' for _ in columns)
-            query = f'INSERT INTO profiles ({", ".join(columns)}) VALUES ({placeholders})'
+    try:
+        migrations.ensure_migrated(database.PROFILES_DB)
+    except (sqlite3.Error, RuntimeError) as e:
+        st.error(f"Erro ao criar tabela: {e}")
+
+# Função para inserir dados no banco de dados.
+# Se o e-mail, telefone ou CNPJ/CPF já pertence a um perfil, esse perfil é
+# atualizado em vez de duplicado. Os arquivos em "uploads" entram na fila de
+# envio na mesma transação do perfil. Envios simultâneos são gravados juntos
+# pelo escritor do group_commit; o id volta depois do COMMIT. Os arquivos do
+# spool são apagados só quando o perfil com certeza não foi gravado. Se o
+# banco demorar e a gravação ainda estiver em andamento, sai
+# group_commit.WritePending.
+def insert_data(data, logo_path=None, pdf_path=None, video_path=None, uploads=None):
+    row = dict(data, logo_path=logo_path, pdf_path=pdf_path, video_path=video_path)
+
+    def write(conn):
+        profile_id, _ = leads.upsert(conn, 'profiles', row)
+        if uploads:
+            upload_queue.enqueue(conn, profile_id, uploads)
+        return profile_id
 
-            values = [json.dumps(item) if isinstance(item, list) else item for item in data.values()]
-            values.extend([logo_path, pdf_path, video_path])
-            cursor.execute(query, values)
-            conn.commit()
-        except sqlite3.Error as e:
-            st.error(f"Erro ao inserir dados: {e}")
-        finally:
-            conn.close()
+    try:
+        with metrics.span('perfil.insert_data'):
+            profile_id = group_commit.write(database.PROFILES_DB, write,
+                                            discard=lambda: upload_queue.discard(uploads or {}))
+        if uploads:
+            upload_queue.notify()
+        return profile_id
+    except group_commit.WritePending:
+        raise
+    except (sqlite3.Error, ValueError, TimeoutError) as e:
+        st.error(f"Erro ao inserir dados: {e}")
+
+# Função para mostrar o andamento dos envios desta sessão ao Drive.
+# Roda como fragmento: atualiza a cada segundo sem reexecutar a página.
+@st.fragment(run_every=1)
+def show_upload_progress():
+    tokens = st.session_state.get('upload_tokens', {})
+    if not tokens:
+        return
+    st.subheader("Envios ao Google Drive")
+    for token, (status, sent, size) in upload_queue.upload_progress(tokens).items():
+        name = tokens[token]
+        if status == 'done':
+            st.progress(1.0, text=f"{name}: enviado")
+        elif status == 'failed':
+            st.error(f"{name}: o envio falhou")
+        else:
+            total = size or 0
+            st.progress(min(sent / total, 1.0) if total else 0.0,
+                        text=f"{name}: {sent / 1024 ** 2:.1f} de {total / 1024 ** 2:.1f} MB")
 
 # Função para limpar o formulário
 def clear_form():
@@ -153,6 +115,11 @@ st.title("Levantamento de Perfil do Cliente")
 # Criação da tabela no banco de dados
 create_table()
 
+# Workers que enviam os arquivos da fila para o Google Drive em segundo plano
+upload_queue.start_workers(get_drive_service)
+if os.getenv('DRIVE_BACKEND') != 'fake':
+    drive.warm_up()
+
 # Adiciona CSS para melhorar o layout do formulário
 st.markdown("""
     <style>
@@ -248,16 +215,32 @@ with st.form(key='profile_form'):
             'employees': employees
         }
 
-        # Autenticar e fazer upload dos arquivos
-        drive_service = authenticate_google_drive()
-        logo_id = upload_file_to_drive(drive_service, logo) if logo else None
-        pdf_id = upload_file_to_drive(drive_service, pdf) if pdf else None
-        video_id = upload_file_to_drive(drive_service, video) if video else None
+        # Guardar os arquivos na fila; o envio ao Drive acontece em segundo plano.
+        # Arquivos com conteúdo já enviado reutilizam o ID existente no Drive.
+        files = {'logo_path': logo, 'pdf_path': pdf, 'video_path': video}
+        with metrics.span('perfil.prepare_uploads'):
+            uploads, references = upload_queue.prepare(files)
 
-        # Inserir dados no banco de dados
-        insert_data(data, logo_path=logo_id, pdf_path=pdf_id, video_path=video_id)
-        
-        # Limpar formulário após envio
-        clear_form()
-
-        st.success("Dados enviados com sucesso!")
+        # Inserir dados no banco de dados (os arquivos do spool são apagados se não for gravado)
+        try:
+            saved = insert_data(data, uploads=uploads, **references) is not None
+            message = "Dados enviados com sucesso!"
+        except group_commit.WritePending:
+            # O banco demorou, mas a gravação continua: um novo envio duplicaria o cadastro
+            saved = True
+            message = ("O banco está ocupado: os dados ainda estão sendo gravados e aparecerão em instantes. "
+                       "Não é preciso enviar de novo.")
+
+        if saved:
+            st.session_state.setdefault('upload_tokens', {}).update(
+                {spooled['token']: spooled['file_name'] for spooled in uploads.values()})
+
+            # Limpar formulário após envio
+            clear_form()
+
+            if uploads:
+                message += " Os arquivos serão enviados ao Google Drive em segundo plano."
+            st.success(message)
+
+# Andamento dos envios ao Drive desta sessão
+show_upload_progress()
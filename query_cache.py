@@ -0,0 +1,46 @@
+import os
+import threading
+from collections import OrderedDict
+import database
+
+# Cache de leituras do painel administrativo.
+# Cada resultado fica guardado junto com o PRAGMA data_version do banco no
+# momento da leitura. Enquanto ninguém gravar no banco (neste processo ou
+# em outro aplicativo), os reruns do Streamlit são servidos da memória.
+
+# Quantidade máxima de resultados guardados (LRU)
+CACHE_SIZE = 128
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+# Função para obter um resultado do cache ou calculá-lo com compute()
+def cached(db_name, key, compute):
+    cache_key = (os.path.abspath(db_name),) + tuple(key)
+    # A versão é lida antes da consulta: uma escrita concorrente invalida o
+    # resultado na próxima chamada em vez de ficar escondida no cache
+    version = database.data_version(db_name)
+    with _cache_lock:
+        entry = _cache.get(cache_key)
+        if entry is not None and entry[0] == version:
+            _cache.move_to_end(cache_key)
+            return entry[1]
+    value = compute()
+    with _cache_lock:
+        _cache[cache_key] = (version, value)
+        _cache.move_to_end(cache_key)
+        while len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+    return value
+
+
+# Função para descartar todo o cache (ou só o de um banco)
+def clear(db_name=None):
+    with _cache_lock:
+        if db_name is None:
+            _cache.clear()
+            return
+        path = os.path.abspath(db_name)
+        for cache_key in [cache_key for cache_key in _cache if cache_key[0] == path]:
+            del _cache[cache_key]
@@ -0,0 +1,376 @@
+import os
+import re
+import atexit
+import zipfile
+import argparse
+import tempfile
+import threading
+import unicodedata
+import multiprocessing
+from datetime import date
+from concurrent.futures import ProcessPoolExecutor
+import database
+import schema
+import metrics
+
+# Relatórios em PDF dos perfis (profiles) e dos clientes do Investidor.
+# Cada linha vira um PDF no formato dos relatórios feitos à mão, como o
+# antigo "temp_file_client_profile (15).pdf" ("Rótulo: valor" e o logotipo;
+# o arquivo saiu do repositório com os outros temp_file*, mas continua no
+# histórico do git). Os clientes recebem a tabela e o gráfico de alocação.
+# Os lotes de linhas são renderizados num pool de processos e os PDFs vão
+# direto para o ZIP à medida que ficam prontos, sem juntar tudo em memória.
+#
+# Cada processo do pool lê as imagens (logotipos e gráficos) e a fonte
+# TrueType, se configurada, uma única vez e reaproveita o resultado em todos
+# os PDFs; o FPDF 1.7.2 faria essa leitura de novo a cada documento. Uso:
+#
+#     python reports.py profiles --month 2026-10 -o perfis-2026-10.zip
+#     python reports.py clientes --all -o clientes.zip
+
+# Fonte TrueType opcional (ex.: DejaVuSans.ttf), para textos fora do latin-1.
+# Sem ela os PDFs usam a Helvetica, que já cobre o português e é bem mais
+# rápida: o FPDF recorta e embute a fonte TrueType em cada documento.
+REPORT_FONT = os.getenv('REPORT_FONT')
+# Processos do pool de renderização
+WORKERS = int(os.getenv('REPORT_WORKERS', str(os.cpu_count() or 1)))
+# Linhas enviadas a cada processo por vez
+BATCH_SIZE = 50
+# Lotes em andamento por processo (limita a memória usada pelos PDFs prontos)
+IN_FLIGHT_PER_WORKER = 2
+
+# Campos do relatório de perfil: (coluna, rótulo), como no formulário
+PROFILE_FIELDS = (
+    ('company_name', 'Nome da Empresa/Cliente'), ('website', 'Site'), ('client_type', 'Tipo de Cliente'),
+    ('contact_name', 'Nome do Contato'), ('city', 'Cidade'), ('email', 'E-mail'), ('phone', 'Telefone'),
+    ('address', 'Endereço'), ('no_physical_address', 'Não Possuo Endereço Físico'),
+    ('capital', 'Nível de Capital Disponível'), ('desired_revenue', 'Faturamento Desejado'),
+    ('services', 'Serviços Requeridos'), ('payment_methods', 'Forma de Pagamento Preferida'),
+    ('source', 'Como nos conheceu'), ('business_field', 'Ramo de Negócio'), ('business_type', 'Tipo de Negócio'),
+    ('context', 'Contexto e Objetivos'), ('return_time', 'Tempo para Retorno Desejado'),
+    ('market_analysis', 'Análise de Mercado'), ('difficulties', 'Dificuldades Enfrentadas'),
+    ('cnpj_or_cpf', 'CNPJ/CPF'), ('employees', 'Número de Funcionários'),
+)
+
+# Campos do relatório de cliente do Investidor
+CLIENTE_FIELDS = (
+    ('nome', 'Nome'), ('telefone', 'Telefone'), ('email', 'Email'),
+    ('investidor', 'Nível de Investidor'), ('capital', 'Nível de Capital'),
+)
+
+# Recursos lidos uma vez por processo: fonte, imagens já decodificadas e
+# arquivos PNG dos gráficos e logotipos
+_assets = {'font': None, 'images': {}, 'files': {}, 'dir': None}
+_pool = None
+_pool_lock = threading.Lock()
+
+
+# Função para carregar a fonte num documento modelo e guardar o resultado.
+# Roda ao iniciar cada processo do pool.
+def load_assets(font_path=REPORT_FONT):
+    import fpdf
+    from fpdf import FPDF
+
+    # O cache de métricas do FPDF gravaria um .pkl ao lado da fonte
+    fpdf.set_global('FPDF_CACHE_MODE', 1)
+    _assets['dir'] = tempfile.mkdtemp(prefix='reports_')
+    if font_path and os.path.exists(font_path):
+        template = FPDF()
+        template.add_font('Report', '', font_path, uni=True)
+        _assets['font'] = (dict(template.fonts), dict(template.font_files))
+
+
+# Função para criar um documento com a fonte do modelo já carregada
+def new_document():
+    from fpdf import FPDF
+
+    pdf = FPDF()
+    if _assets['font'] is not None:
+        fonts, font_files = _assets['font']
+        for key, font in fonts.items():
+            # O subconjunto de caracteres é de cada documento
+            pdf.fonts[key] = dict(font, i=len(pdf.fonts) + 1, subset=list(font['subset']))
+        pdf.font_files.update({key: dict(value) for key, value in font_files.items()})
+        pdf.set_font('Report', '', 12)
+    else:
+        pdf.set_font('Helvetica', '', 12)
+    pdf.add_page()
+    return pdf
+
+
+# Função para escrever texto respeitando a fonte disponível
+def text(pdf, value):
+    value = '' if value is None else str(value)
+    if _assets['font'] is None:
+        value = value.encode('latin-1', 'replace').decode('latin-1')
+    return value
+
+
+# Função para inserir uma imagem PNG decodificada uma só vez por processo.
+# O FPDF apaga os dados da imagem ao gerar o PDF, então cada documento
+# recebe uma cópia rasa das informações guardadas.
+def add_image(pdf, path, x, y, w=0, h=0):
+    info = _assets['images'].get(path)
+    if info is None:
+        parser = new_document()
+        parser.image(path, 0, 0)
+        info = _assets['images'][path] = dict(parser.images[path])
+    if path not in pdf.images:
+        pdf.images[path] = dict(info, i=len(pdf.images) + 1)
+    pdf.image(path, x, y, w, h)
+
+
+# Função para gravar uma imagem como PNG sem transparência sobre fundo branco.
+# O FPDF 1.7.2 separa o canal alfa com expressões regulares, o que leva
+# quase um segundo por gráfico; sem alfa a leitura é imediata.
+def opaque_png(source, key):
+    from PIL import Image
+
+    path = os.path.join(_assets['dir'], f"{key}_{len(_assets['files'])}.png")
+    with Image.open(source) as image:
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, 'white')
+        background.paste(image, mask=image.getchannel('A'))
+        background.save(path, 'PNG')
+    return path
+
+
+# Função para obter o PNG do gráfico de alocação de (investidor, capital)
+def chart_file(investidor, capital):
+    import io
+    import graficos
+
+    key = ('chart', investidor, capital)
+    if key not in _assets['files']:
+        try:
+            path = opaque_png(io.BytesIO(graficos.grafico_alocacao(investidor, capital)), 'chart')
+        except ValueError:
+            path = None
+        _assets['files'][key] = path
+    return _assets['files'][key]
+
+
+# Função para obter o PNG de um logotipo (prévia do cache de miniaturas ou arquivo local)
+def logo_file(source):
+    key = ('logo', source)
+    if key not in _assets['files']:
+        try:
+            path = opaque_png(source, 'logo')
+        except (OSError, ValueError):
+            path = None
+        _assets['files'][key] = path
+    return _assets['files'][key]
+
+
+# Função para formatar um valor gravado (listas JSON, booleanos, números)
+def format_value(column, value, list_columns=()):
+    import json
+
+    if value is None:
+        return ''
+    if column in list_columns and isinstance(value, str) and value.startswith('['):
+        try:
+            return ', '.join(map(str, json.loads(value)))
+        except ValueError:
+            return value
+    if column in ('no_physical_address', 'market_analysis', 'website_no_site'):
+        return 'Sim' if value in (1, True, '1', 'True') else 'Não'
+    if isinstance(value, float):
+        return f"R$ {value:,.2f}".replace(',', 'X').replace('.', ',').replace('X', '.')
+    return str(value)
+
+
+# Função para escrever as linhas "Rótulo: valor" de um relatório
+def write_fields(pdf, row, fields, list_columns=()):
+    for column, label in fields:
+        pdf.multi_cell(0, 10, text(pdf, f"{label}: {format_value(column, row.get(column), list_columns)}"))
+
+
+# Função para renderizar o PDF de um perfil
+def render_profile(row):
+    pdf = new_document()
+    write_fields(pdf, row, PROFILE_FIELDS, schema.LIST_COLUMNS['profiles'])
+    logo = logo_file(row['logo_source']) if row.get('logo_source') else None
+    if logo is not None:
+        if pdf.get_y() > 230:
+            pdf.add_page()
+        add_image(pdf, logo, 10, pdf.get_y() + 5, 50)
+    return pdf.output(dest='S').encode('latin-1')
+
+
+# Função para renderizar o PDF de um cliente do Investidor com a alocação e o gráfico
+def render_cliente(row):
+    import alocacao as alocacao_engine
+
+    pdf = new_document()
+    write_fields(pdf, row, CLIENTE_FIELDS)
+    pdf.ln(4)
+    pdf.multi_cell(0, 10, text(pdf, "Alocação de capital:"))
+    for rotulo, coluna in zip(alocacao_engine.ROTULOS, alocacao_engine.COLUNAS):
+        pdf.multi_cell(0, 8, text(pdf, f"{rotulo}: {format_value(coluna, row.get(coluna))}"))
+    chart = chart_file(row.get('investidor'), row.get('capital'))
+    if chart is not None:
+        if pdf.get_y() > 170:
+            pdf.add_page()
+        add_image(pdf, chart, 30, pdf.get_y() + 5, 150)
+    return pdf.output(dest='S').encode('latin-1')
+
+
+RENDERERS = {
+    'profiles': render_profile,
+    'clientes': render_cliente,
+}
+
+
+# Função para montar o nome do arquivo de um relatório
+def file_name(table_name, row):
+    title = row.get('company_name') if table_name == 'profiles' else row.get('nome')
+    title = unicodedata.normalize('NFKD', str(title or '')).encode('ascii', 'ignore').decode('ascii')
+    title = re.sub(r'[^A-Za-z0-9]+', '_', title).strip('_')[:60]
+    return f"{table_name}_{row['id']}{'_' + title if title else ''}.pdf"
+
+
+# Função para renderizar um lote de linhas (roda nos processos do pool).
+# Retorna [(nome do arquivo, conteúdo do PDF ou None, erro ou None)].
+def render_batch(table_name, rows):
+    if _assets['dir'] is None:
+        load_assets()
+    results = []
+    for row in rows:
+        try:
+            results.append((file_name(table_name, row), RENDERERS[table_name](row), None))
+        except Exception as e:
+            results.append((file_name(table_name, row), None, f"{type(e).__name__}: {e}"))
+    return results
+
+
+# Função para calcular o intervalo [início, fim) de um mês 'AAAA-MM'
+def month_range(month):
+    year, number = map(int, month.split('-'))
+    start = date(year, number, 1)
+    end = date(year + number // 12, number % 12 + 1, 1)
+    return start.isoformat(), end.isoformat()
+
+
+# Função para ler as linhas de uma tabela em lotes, paginando pelo id.
+# since/until filtram created_at ('AAAA-MM-DD'); sem eles vêm todas as linhas.
+# Nos perfis, o logotipo vira o caminho da prévia no cache de miniaturas
+# (ou do arquivo local), resolvido no processo principal.
+def iter_batches(table_name, since=None, until=None, batch_size=BATCH_SIZE):
+    import thumbnails
+
+    db_name = schema.DATABASES[table_name]
+    clauses, params = ["id > ?"], []
+    if since:
+        clauses.append("created_at >= ?")
+        params.append(since)
+    if until:
+        clauses.append("created_at < ?")
+        params.append(until)
+    query = f"SELECT * FROM {table_name} WHERE {' AND '.join(clauses)} ORDER BY id LIMIT ?"
+    last_id = 0
+    while True:
+        with database.connection(db_name) as conn:
+            cursor = conn.execute(query, [last_id] + params + [batch_size])
+            names = [description[0] for description in cursor.description]
+            rows = [dict(zip(names, row)) for row in cursor.fetchall()]
+        if not rows:
+            return
+        last_id = rows[-1]['id']
+        if table_name == 'profiles':
+            hashes = thumbnails.resolve_references([row['logo_path'] for row in rows], db_name)
+            for row in rows:
+                sha256 = hashes.get(row['logo_path'])
+                preview = thumbnails.cache_path(sha256, 'preview') if sha256 else None
+                if preview is not None and os.path.exists(preview):
+                    row['logo_source'] = os.path.abspath(preview)
+                elif row['logo_path'] and os.path.isfile(row['logo_path']):
+                    row['logo_source'] = os.path.abspath(row['logo_path'])
+        yield rows
+
+
+# Função para obter o pool de processos (spawn, como o de thumbnails.py).
+# Um só pool por processo, com WORKERS processos, compartilhado pelas sessões.
+def get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ProcessPoolExecutor(WORKERS, mp_context=multiprocessing.get_context('spawn'),
+                                            initializer=load_assets)
+    return _pool
+
+
+# Função para gerar os relatórios na ordem das linhas.
+# Mantém no máximo IN_FLIGHT_PER_WORKER lotes por processo em andamento.
+# Gera (nome do arquivo, conteúdo ou None, erro ou None).
+def iter_reports(table_name, since=None, until=None):
+    pool = get_pool()
+    pending = []
+    for rows in iter_batches(table_name, since, until):
+        pending.append(pool.submit(render_batch, table_name, rows))
+        if len(pending) >= WORKERS * IN_FLIGHT_PER_WORKER:
+            yield from pending.pop(0).result()
+    for future in pending:
+        yield from future.result()
+
+
+# Função para gravar os relatórios num ZIP (caminho ou arquivo aberto).
+# Os PDFs já saem comprimidos do FPDF, então entram no ZIP sem nova compressão.
+# progress(gerados, erros) é opcional. Retorna {'reports', 'errors'}.
+@metrics.timed('reports.export')
+def export_zip(target, table_name, since=None, until=None, progress=None):
+    generated, errors = 0, []
+    with zipfile.ZipFile(target, 'w', zipfile.ZIP_STORED) as archive:
+        for name, content, error in iter_reports(table_name, since, until):
+            if content is None:
+                errors.append((name, error))
+            else:
+                archive.writestr(name, content)
+                generated += 1
+            if progress is not None:
+                progress(generated, len(errors))
+        if errors:
+            archive.writestr('erros.txt', '\n'.join(f"{name}: {error}" for name, error in errors))
+    return {'reports': generated, 'errors': errors}
+
+
+# Função para encerrar o pool
+def shutdown():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+atexit.register(shutdown)
+
+
+def main(argv=None):
+    # O pool é criado no primeiro uso com o tamanho de WORKERS
+    global WORKERS
+    parser = argparse.ArgumentParser(description="Gera os relatórios em PDF de profiles ou clientes num ZIP.")
+    parser.add_argument('table', choices=list(RENDERERS))
+    period = parser.add_mutually_exclusive_group()
+    period.add_argument('--month', help="mês de cadastro (AAAA-MM; padrão: mês atual)")
+    period.add_argument('--all', action='store_true', help="todas as linhas, inclusive as sem data de cadastro")
+    parser.add_argument('-o', '--output', help="arquivo ZIP de saída")
+    parser.add_argument('--workers', type=int, default=WORKERS, help="processos do pool")
+    args = parser.parse_args(argv)
+    WORKERS = args.workers
+    import migrations
+
+    migrations.ensure_migrated(schema.DATABASES[args.table])
+    since = until = None
+    if not args.all:
+        month = args.month or date.today().strftime('%Y-%m')
+        since, until = month_range(month)
+    output = args.output or f"{args.table}-{'todos' if args.all else month}.zip"
+    summary = export_zip(output, args.table, since, until)
+    print(f"{output}: {summary['reports']} relatórios, {len(summary['errors'])} com erro")
+    shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+import re
+import json
+from datetime import datetime
+import database
+
+# Definição única das tabelas principais, usada pelos três aplicativos.
+# As migrações (migrations.py) criam e atualizam as tabelas a partir daqui,
+# e toda gravação passa por validate(), que recusa colunas desconhecidas
+# em vez de deixar o INSERT falhar (ou gravar no lugar errado).
+
+TABLES = {
+    'profiles': (
+        ('id', 'INTEGER PRIMARY KEY AUTOINCREMENT'),
+        ('company_name', 'TEXT'), ('website', 'TEXT'), ('client_type', 'TEXT'),
+        ('contact_name', 'TEXT'), ('email', 'TEXT'), ('phone', 'TEXT'), ('address', 'TEXT'),
+        ('no_physical_address', 'BOOLEAN'), ('capital', 'TEXT'), ('desired_revenue', 'TEXT'),
+        ('services', 'TEXT'), ('payment_methods', 'TEXT'), ('source', 'TEXT'), ('business_field', 'TEXT'),
+        ('business_type', 'TEXT'), ('context', 'TEXT'), ('return_time', 'TEXT'), ('market_analysis', 'BOOLEAN'),
+        ('difficulties', 'TEXT'), ('cnpj_or_cpf', 'TEXT'), ('logo_path', 'TEXT'), ('pdf_path', 'TEXT'),
+        ('video_path', 'TEXT'), ('employees', 'TEXT'), ('city', 'TEXT'), ('website_no_site', 'BOOLEAN'),
+        ('market_segment', 'TEXT'), ('email_key', 'TEXT'), ('phone_key', 'TEXT'), ('document_key', 'TEXT'),
+        ('created_at', 'TEXT'),
+    ),
+    'clientes': (
+        ('id', 'INTEGER PRIMARY KEY AUTOINCREMENT'),
+        ('nome', 'TEXT'), ('telefone', 'TEXT'), ('email', 'TEXT'), ('investidor', 'TEXT'),
+        ('capital', 'TEXT'), ('patrimonio', 'REAL'), ('valor_virtus', 'REAL'),
+        ('reserva_emergencia', 'REAL'), ('custos_abertura', 'REAL'), ('custos_trafego', 'REAL'),
+        ('treinamento_empresarial', 'REAL'), ('infraestrutura', 'REAL'),
+        ('email_key', 'TEXT'), ('phone_key', 'TEXT'), ('created_at', 'TEXT'),
+    ),
+}
+
+# Banco de cada tabela
+DATABASES = {
+    'profiles': database.PROFILES_DB,
+    'clientes': database.CLIENTES_DB,
+}
+
+# Colunas gravadas como listas JSON
+LIST_COLUMNS = {
+    'profiles': ('client_type', 'services', 'payment_methods', 'market_segment'),
+    'clientes': (),
+}
+
+# Colunas filtráveis no painel administrativo (cada uma com o seu índice)
+FILTER_COLUMNS = {
+    'profiles': ('company_name', 'email', 'business_field', 'business_type', 'capital'),
+    'clientes': ('nome', 'email', 'investidor', 'capital'),
+}
+
+
+# Função para normalizar um e-mail (minúsculas, sem espaços)
+def normalize_email(value):
+    if value is None:
+        return None
+    value = str(value).strip().lower()
+    return value if '@' in value else None
+
+
+# Função para manter só os dígitos de um telefone ou documento.
+# Valores curtos demais (menos de min_digits) não identificam ninguém.
+def digits_only(value, min_digits):
+    if value is None:
+        return None
+    digits = re.sub(r'\D', '', str(value))
+    return digits if len(digits) >= min_digits else None
+
+
+def normalize_phone(value):
+    return digits_only(value, 8)
+
+
+def normalize_document(value):
+    return digits_only(value, 11)
+
+
+# Chaves normalizadas de cada tabela: coluna da chave -> (coluna de origem, normalização).
+# Cada chave tem um índice único (migrations.py) e identifica o mesmo lead.
+KEY_COLUMNS = {
+    'profiles': {
+        'email_key': ('email', normalize_email),
+        'phone_key': ('phone', normalize_phone),
+        'document_key': ('cnpj_or_cpf', normalize_document),
+    },
+    'clientes': {
+        'email_key': ('email', normalize_email),
+        'phone_key': ('telefone', normalize_phone),
+    },
+}
+
+
+# Função para calcular as chaves normalizadas das colunas de origem presentes em data
+def lookup_keys(table_name, data):
+    return {key: normalize(data[source])
+            for key, (source, normalize) in KEY_COLUMNS[table_name].items() if source in data}
+
+
+# Função para listar as colunas graváveis de uma tabela (sem o id)
+def columns(table_name):
+    return [column for column, _ in TABLES[table_name] if column != 'id']
+
+
+# Função para montar o CREATE TABLE de uma tabela
+def create_statement(table_name):
+    definitions = ',\n    '.join(f"{column} {declared_type}" for column, declared_type in TABLES[table_name])
+    return f"CREATE TABLE IF NOT EXISTS {table_name} (\n    {definitions}\n)"
+
+
+# Função para validar os dados de uma gravação.
+# Recusa colunas que não existem na tabela, grava as listas como JSON e
+# recalcula as chaves normalizadas a partir das colunas de origem.
+def validate(table_name, data):
+    if table_name not in TABLES:
+        raise ValueError(f"Tabela desconhecida: {table_name}")
+    unknown = [column for column in data if column not in columns(table_name)]
+    if unknown:
+        raise ValueError(f"Colunas desconhecidas em {table_name}: {', '.join(unknown)}")
+    values = {column: json.dumps(value) if isinstance(value, list) else value
+              for column, value in data.items()}
+    values.update(lookup_keys(table_name, data))
+    return values
+
+
+# Função para obter a data de cadastro gravada em created_at (hora local)
+def timestamp():
+    return datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+
+# Função para inserir uma linha validada numa conexão já aberta
+def insert(conn, table_name, data):
+    data = validate(table_name, data)
+    data.setdefault('created_at', timestamp())
+    placeholders = ', '.join('?' for _ in data)
+    query = f"INSERT INTO {table_name} ({', '.join(data)}) VALUES ({placeholders})"
+    return conn.execute(query, tuple(data.values())).lastrowid
+
+
+# Função para conferir se a tabela do banco tem todas as colunas da definição.
+# Colunas antigas a mais (de versões anteriores) são permitidas.
+def verify(conn, table_name):
+    existing = {row[1] for row in conn.execute(f"PRAGMA table_info({table_name})")}
+    missing = [column for column, _ in TABLES[table_name] if column not in existing]
+    if missing:
+        raise RuntimeError(f"Tabela {table_name} sem as colunas: {', '.join(missing)}")
@@ -0,0 +1,82 @@
+import re
+import database
+
+# Busca textual (FTS5) nos perfis de clientes.
+# profiles_fts é um índice de conteúdo externo: guarda só os tokens e lê o
+# texto da própria tabela profiles. Os triggers mantêm o índice em dia em
+# cada INSERT, UPDATE e DELETE, venha a escrita de qualquer aplicativo.
+
+# Colunas indexadas e o peso de cada uma no ranking (bm25)
+SEARCH_COLUMNS = (
+    ('company_name', 5.0),
+    ('business_field', 3.0),
+    ('services', 2.0),
+    ('context', 1.0),
+    ('difficulties', 1.0),
+)
+
+SEARCH_LIMIT = 20
+
+
+# Função para criar o índice de busca e os triggers de sincronização
+def create_search_index(conn):
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'profiles_fts'").fetchone()
+    columns = ', '.join(column for column, _ in SEARCH_COLUMNS)
+    new_values = ', '.join(f"new.{column}" for column, _ in SEARCH_COLUMNS)
+    old_values = ', '.join(f"old.{column}" for column, _ in SEARCH_COLUMNS)
+    conn.execute(f'''
+        CREATE VIRTUAL TABLE IF NOT EXISTS profiles_fts USING fts5(
+            {columns},
+            content='profiles', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2'
+        )
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS profiles_fts_insert AFTER INSERT ON profiles BEGIN
+            INSERT INTO profiles_fts (rowid, {columns}) VALUES (new.id, {new_values});
+        END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS profiles_fts_delete AFTER DELETE ON profiles BEGIN
+            INSERT INTO profiles_fts (profiles_fts, rowid, {columns}) VALUES ('delete', old.id, {old_values});
+        END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS profiles_fts_update AFTER UPDATE ON profiles BEGIN
+            INSERT INTO profiles_fts (profiles_fts, rowid, {columns}) VALUES ('delete', old.id, {old_values});
+            INSERT INTO profiles_fts (rowid, {columns}) VALUES (new.id, {new_values});
+        END
+    ''')
+    # Índice recém-criado: indexa os perfis que já existiam
+    if exists is None:
+        conn.execute("INSERT INTO profiles_fts (profiles_fts) VALUES ('rebuild')")
+
+
+# Função para transformar o texto digitado numa consulta FTS5 segura.
+# Cada palavra vira um termo entre aspas com busca por prefixo ("term"*).
+def build_match_query(text):
+    terms = re.findall(r'\w+', text)
+    return ' '.join(f'"{term}"*' for term in terms)
+
+
+# Função para buscar perfis por texto, ordenados por relevância.
+# Retorna dicionários com os campos principais, o trecho destacado e o rank.
+def search_profiles(text, limit=SEARCH_LIMIT, db_name=database.PROFILES_DB):
+    match = build_match_query(text)
+    if not match:
+        return []
+    weights = ', '.join(str(weight) for _, weight in SEARCH_COLUMNS)
+    query = f'''
+        SELECT p.id, p.company_name, p.contact_name, p.email,
+               highlight(profiles_fts, 0, '**', '**'),
+               snippet(profiles_fts, -1, '**', '**', '…', 16),
+               bm25(profiles_fts, {weights}) AS rank
+        FROM profiles_fts
+        JOIN profiles p ON p.id = profiles_fts.rowid
+        WHERE profiles_fts MATCH ?
+        ORDER BY rank
+        LIMIT ?
+    '''
+    keys = ('id', 'company_name', 'contact_name', 'email', 'company_highlight', 'snippet', 'rank')
+    return [dict(zip(keys, row)) for row in database.fetch_all(db_name, query, (match, limit))]
@@ -0,0 +1,157 @@
+import json
+import database
+
+# Atributos de múltiplos valores dos perfis, normalizados numa tabela de junção.
+# profiles continua guardando as listas em JSON (como o formulário grava), e
+# profile_tags tem uma linha por (atributo, valor, perfil). A chave primária
+# (attribute, value, profile_id) é o índice usado pelos filtros de segmento,
+# e os triggers mantêm a tabela em dia em qualquer escrita em profiles.
+
+SEGMENT_ATTRIBUTES = ('client_type', 'services', 'payment_methods', 'market_segment')
+
+
+# Função para separar o texto de uma coluna de lista (JSON ou separado por vírgula)
+def split_values(value):
+    if value is None or value == '':
+        return []
+    if isinstance(value, str) and value.startswith('['):
+        try:
+            return [str(item) for item in json.loads(value) if str(item).strip()]
+        except ValueError:
+            pass
+    return [item.strip() for item in str(value).split(',') if item.strip()]
+
+
+# Função para criar a tabela de junção, os triggers e preencher os perfis existentes
+def create_segment_tables(conn):
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'profile_tags'").fetchone()
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS profile_tags (
+            attribute TEXT NOT NULL,
+            value TEXT NOT NULL,
+            profile_id INTEGER NOT NULL,
+            PRIMARY KEY (attribute, value, profile_id)
+        ) WITHOUT ROWID
+    ''')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_profile_tags_profile ON profile_tags (profile_id)")
+
+    inserts = '\n'.join(f'''
+            INSERT OR IGNORE INTO profile_tags (attribute, value, profile_id)
+            SELECT '{attribute}', value, new.id FROM json_each(
+                CASE WHEN json_valid(new.{attribute}) AND json_type(new.{attribute}) = 'array'
+                     THEN new.{attribute} ELSE '[]' END)
+            WHERE value IS NOT NULL AND value <> '';''' for attribute in SEGMENT_ATTRIBUTES)
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS profile_tags_insert AFTER INSERT ON profiles BEGIN
+            {inserts}
+        END
+    ''')
+    changed = ' OR '.join(f"new.{attribute} IS NOT old.{attribute}" for attribute in SEGMENT_ATTRIBUTES)
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS profile_tags_update AFTER UPDATE ON profiles
+        WHEN {changed} BEGIN
+            DELETE FROM profile_tags WHERE profile_id = old.id;
+            {inserts}
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS profile_tags_delete AFTER DELETE ON profiles BEGIN
+            DELETE FROM profile_tags WHERE profile_id = old.id;
+        END
+    ''')
+    # Tabela recém-criada: preenche com os perfis que já existiam
+    if exists is None:
+        backfill(conn)
+
+
+# Função para preencher profile_tags a partir das colunas de profiles.
+# Aceita listas em JSON e também os valores antigos separados por vírgula.
+def backfill(conn):
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(profiles)")}
+    attributes = [attribute for attribute in SEGMENT_ATTRIBUTES if attribute in columns]
+    if not attributes:
+        return 0
+    cursor = conn.execute(f"SELECT id, {', '.join(attributes)} FROM profiles")
+    inserted = 0
+    while rows := cursor.fetchmany(5000):
+        tags = [(attribute, value, row[0])
+                for row in rows
+                for attribute, raw in zip(attributes, row[1:])
+                for value in split_values(raw)]
+        conn.executemany("INSERT OR IGNORE INTO profile_tags (attribute, value, profile_id) VALUES (?, ?, ?)", tags)
+        inserted += len(tags)
+    return inserted
+
+
+# Função para regravar como lista JSON os valores antigos separados por vírgula.
+# Os triggers só leem JSON: sem esta conversão, qualquer UPDATE posterior de
+# um perfil antigo (um lead juntado, por exemplo) apagaria as suas tags. O
+# trigger de UPDATE refaz as tags de cada perfil convertido.
+# Retorna quantos perfis foram convertidos.
+def normalize_legacy_lists(conn):
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(profiles)")}
+    attributes = [attribute for attribute in SEGMENT_ATTRIBUTES if attribute in columns]
+    if not attributes:
+        return 0
+    legacy = ' OR '.join(f"({attribute} IS NOT NULL AND NOT (json_valid({attribute}) "
+                         f"AND json_type({attribute}) = 'array'))" for attribute in attributes)
+    rows = conn.execute(f"SELECT id, {', '.join(attributes)} FROM profiles WHERE {legacy}").fetchall()
+    for row in rows:
+        values = {attribute: json.dumps(split_values(raw)) for attribute, raw in zip(attributes, row[1:])
+                  if raw is not None and not is_json_list(raw)}
+        if not values:
+            continue
+        conn.execute(f"UPDATE profiles SET {', '.join(f'{column} = ?' for column in values)} WHERE id = ?",
+                     (*values.values(), row[0]))
+    return len(rows)
+
+
+def is_json_list(value):
+    try:
+        return isinstance(json.loads(value), list)
+    except (TypeError, ValueError):
+        return False
+
+
+# Função para montar a consulta de ids de um filtro de segmento.
+# filters: {atributo: [valores]}. Dentro de um atributo basta um dos valores
+# (OU); entre atributos todos precisam bater (E). Cada parte é uma busca
+# direta no índice de profile_tags.
+def segment_query(filters):
+    parts, params = [], []
+    for attribute, values in filters.items():
+        if attribute not in SEGMENT_ATTRIBUTES:
+            raise ValueError(f"Atributo de segmento inválido: {attribute}")
+        if not values:
+            continue
+        parts.append(f"SELECT profile_id FROM profile_tags WHERE attribute = ? "
+                     f"AND value IN ({', '.join('?' for _ in values)})")
+        params.append(attribute)
+        params.extend(values)
+    if not parts:
+        return None, []
+    return ' INTERSECT '.join(parts), params
+
+
+# Função para montar a cláusula "id IN (...)" usada nas consultas de profiles
+def segment_clause(filters):
+    query, params = segment_query(filters)
+    if query is None:
+        return None, []
+    return f"id IN ({query})", params
+
+
+# Função para buscar os ids dos perfis de um segmento
+def find_profile_ids(filters, db_name=database.PROFILES_DB):
+    query, params = segment_query(filters)
+    if query is None:
+        return []
+    return [row[0] for row in database.fetch_all(db_name, query, params)]
+
+
+# Função para listar os valores existentes de um atributo e a quantidade de perfis
+def attribute_values(attribute, db_name=database.PROFILES_DB):
+    return database.fetch_all(db_name, '''
+        SELECT value, COUNT(*) FROM profile_tags WHERE attribute = ? GROUP BY value ORDER BY value
+    ''', (attribute,))
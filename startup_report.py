@@ -0,0 +1,126 @@
+import os
+import ast
+import sys
+import json
+import argparse
+import subprocess
+
+# Relatório de tempo de inicialização dos aplicativos.
+# Para cada script, importa num processo Python limpo (com -X importtime)
+# todos os módulos importados no nível superior do script e mostra quanto
+# tempo cada um custou. Uso:
+#
+#     python startup_report.py perfil.py Investidor.py admin_panel.py app.py
+#     python startup_report.py perfil.py --json startup.json
+
+ENTRY_POINTS = ('perfil.py', 'Investidor.py', 'admin_panel.py', 'app.py')
+
+# Marcadores escritos no stderr do processo medido
+START_MARKER = '# startup-report: início'
+FAILED_MARKER = '# startup-report: falhou '
+
+# Código executado no processo medido: separa os imports do próprio
+# interpretador e continua mesmo se algum módulo não estiver instalado
+PROFILE_CODE = '''
+import sys
+sys.stderr.write({start!r} + "\\n"); sys.stderr.flush()
+for module in {modules!r}:
+    try:
+        __import__(module)
+    except Exception as e:
+        sys.stderr.write({failed!r} + module + ": " + repr(e) + "\\n"); sys.stderr.flush()
+'''
+
+
+# Função para listar os módulos importados no nível superior de um script
+def top_level_imports(script_path):
+    with open(script_path, encoding='utf-8') as f:
+        tree = ast.parse(f.read(), script_path)
+    modules = []
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            modules.extend(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+            modules.append(node.module)
+        elif isinstance(node, ast.Try):
+            # Imports opcionais (try/except ImportError)
+            for child in node.body:
+                if isinstance(child, ast.Import):
+                    modules.extend(alias.name for alias in child.names)
+    return list(dict.fromkeys(modules))
+
+
+# Função para interpretar a saída de -X importtime (a partir do marcador de início).
+# Retorna ([(módulo, self_us, cumulativo_us, profundidade)], [falhas]).
+def parse_importtime(stderr):
+    entries, failures = [], []
+    started = False
+    for line in stderr.splitlines():
+        if line == START_MARKER:
+            started = True
+            continue
+        if line.startswith(FAILED_MARKER):
+            failures.append(line[len(FAILED_MARKER):])
+            continue
+        if not started or not line.startswith('import time:') or 'imported package' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|', 2)
+        depth = (len(name) - len(name.lstrip(' ')) - 1) // 2
+        entries.append((name.strip(), int(self_us), int(cumulative_us), depth))
+    return entries, failures
+
+
+# Função para medir o custo de importação dos módulos de um script
+def profile_script(script_path):
+    modules = top_level_imports(script_path)
+    code = PROFILE_CODE.format(start=START_MARKER, failed=FAILED_MARKER, modules=modules)
+    directory = os.path.dirname(os.path.abspath(script_path))
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code],
+                            cwd=directory, capture_output=True, text=True)
+    entries, failures = parse_importtime(result.stderr)
+    direct = {}
+    for name, _, cumulative_us, depth in entries:
+        if depth == 0:
+            direct[name] = cumulative_us
+    return {
+        'script': os.path.basename(script_path),
+        'failures': failures,
+        'total_ms': sum(direct.values()) / 1000,
+        'imports': sorted(({'module': name, 'ms': us / 1000} for name, us in direct.items()),
+                          key=lambda item: item['ms'], reverse=True),
+        'slowest': sorted(({'module': name, 'self_ms': self_us / 1000, 'cumulative_ms': cumulative_us / 1000}
+                           for name, self_us, cumulative_us, _ in entries),
+                          key=lambda item: item['self_ms'], reverse=True),
+    }
+
+
+# Função para imprimir o relatório de um script
+def print_report(report, top=10):
+    print(f"\n{report['script']}: {report['total_ms']:.1f} ms em imports")
+    for failure in report['failures']:
+        print(f"  Falhou: {failure}")
+    print("  Imports diretos:")
+    for item in report['imports'][:top]:
+        print(f"    {item['ms']:9.1f} ms  {item['module']}")
+    print("  Módulos mais lentos (tempo próprio):")
+    for item in report['slowest'][:top]:
+        print(f"    {item['self_ms']:9.1f} ms  {item['module']}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Tempo de importação por módulo de cada aplicativo.")
+    parser.add_argument('scripts', nargs='*', default=ENTRY_POINTS)
+    parser.add_argument('--top', type=int, default=10, help="quantidade de módulos listados")
+    parser.add_argument('--json', help="grava o relatório completo neste arquivo")
+    args = parser.parse_args(argv)
+
+    reports = [profile_script(script) for script in args.scripts]
+    for report in reports:
+        print_report(report, args.top)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(reports, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
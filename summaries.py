@@ -0,0 +1,146 @@
+import database
+import query_cache
+import alocacao as alocacao_engine
+
+# Tabelas de resumo do painel, mantidas por triggers a cada escrita.
+# Cada INSERT, UPDATE ou DELETE em clientes (e em profile_tags, que os
+# triggers de segments.py mantêm a partir de profiles) ajusta só as linhas
+# de resumo afetadas, então o painel lê os totais em tempo constante, sem
+# varrer as tabelas.
+
+# Atributos de profile_tags exibidos no painel
+DASHBOARD_ATTRIBUTES = ('client_type', 'services')
+
+
+# Função para criar a contagem de linhas de uma tabela (table_counts) e os seus triggers
+def create_row_count(conn, table_name):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS table_counts (
+            table_name TEXT PRIMARY KEY,
+            rows INTEGER NOT NULL
+        )
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS {table_name}_count_insert AFTER INSERT ON {table_name} BEGIN
+            UPDATE table_counts SET rows = rows + 1 WHERE table_name = '{table_name}';
+        END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS {table_name}_count_delete AFTER DELETE ON {table_name} BEGIN
+            UPDATE table_counts SET rows = rows - 1 WHERE table_name = '{table_name}';
+        END
+    ''')
+    conn.execute(f'''
+        INSERT OR REPLACE INTO table_counts (table_name, rows)
+        SELECT '{table_name}', COUNT(*) FROM {table_name}
+    ''')
+
+
+# Função para criar o resumo de clientes por nível de investidor e capital
+def create_clientes_summary(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS clientes_summary (
+            investidor TEXT NOT NULL,
+            capital TEXT NOT NULL,
+            clientes INTEGER NOT NULL,
+            patrimonio REAL NOT NULL,
+            valor_virtus REAL NOT NULL,
+            PRIMARY KEY (investidor, capital)
+        ) WITHOUT ROWID
+    ''')
+    add = '''
+            INSERT INTO clientes_summary (investidor, capital, clientes, patrimonio, valor_virtus)
+            VALUES (COALESCE(new.investidor, ''), COALESCE(new.capital, ''), 1,
+                    COALESCE(new.patrimonio, 0), COALESCE(new.valor_virtus, 0))
+            ON CONFLICT (investidor, capital) DO UPDATE SET
+                clientes = clientes + 1,
+                patrimonio = patrimonio + excluded.patrimonio,
+                valor_virtus = valor_virtus + excluded.valor_virtus;'''
+    remove = '''
+            UPDATE clientes_summary SET
+                clientes = clientes - 1,
+                patrimonio = patrimonio - COALESCE(old.patrimonio, 0),
+                valor_virtus = valor_virtus - COALESCE(old.valor_virtus, 0)
+            WHERE investidor = COALESCE(old.investidor, '') AND capital = COALESCE(old.capital, '');
+            DELETE FROM clientes_summary WHERE clientes = 0;'''
+    conn.execute(f"CREATE TRIGGER IF NOT EXISTS clientes_summary_insert AFTER INSERT ON clientes BEGIN {add} END")
+    conn.execute(f"CREATE TRIGGER IF NOT EXISTS clientes_summary_delete AFTER DELETE ON clientes BEGIN {remove} END")
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS clientes_summary_update AFTER UPDATE OF
+            investidor, capital, patrimonio, valor_virtus ON clientes BEGIN
+            {remove}
+            {add}
+        END
+    ''')
+    conn.execute("DELETE FROM clientes_summary")
+    conn.execute('''
+        INSERT INTO clientes_summary (investidor, capital, clientes, patrimonio, valor_virtus)
+        SELECT COALESCE(investidor, ''), COALESCE(capital, ''), COUNT(*),
+               COALESCE(SUM(patrimonio), 0), COALESCE(SUM(valor_virtus), 0)
+        FROM clientes GROUP BY 1, 2
+    ''')
+    create_row_count(conn, 'clientes')
+
+
+# Função para criar a contagem de perfis por valor de cada atributo de segmento
+def create_profile_summary(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS profile_tag_counts (
+            attribute TEXT NOT NULL,
+            value TEXT NOT NULL,
+            profiles INTEGER NOT NULL,
+            PRIMARY KEY (attribute, value)
+        ) WITHOUT ROWID
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS profile_tag_counts_insert AFTER INSERT ON profile_tags BEGIN
+            INSERT INTO profile_tag_counts (attribute, value, profiles) VALUES (new.attribute, new.value, 1)
+            ON CONFLICT (attribute, value) DO UPDATE SET profiles = profiles + 1;
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS profile_tag_counts_delete AFTER DELETE ON profile_tags BEGIN
+            UPDATE profile_tag_counts SET profiles = profiles - 1
+            WHERE attribute = old.attribute AND value = old.value;
+            DELETE FROM profile_tag_counts WHERE attribute = old.attribute AND value = old.value AND profiles = 0;
+        END
+    ''')
+    conn.execute("DELETE FROM profile_tag_counts")
+    conn.execute('''
+        INSERT INTO profile_tag_counts (attribute, value, profiles)
+        SELECT attribute, value, COUNT(*) FROM profile_tags GROUP BY attribute, value
+    ''')
+    create_row_count(conn, 'profiles')
+
+
+# Função para ler o total de linhas de uma tabela
+def row_count(db_name, table_name):
+    rows = database.fetch_all(db_name, "SELECT rows FROM table_counts WHERE table_name = ?", (table_name,))
+    return rows[0][0] if rows else 0
+
+
+# Função para ler o resumo de clientes, em ordem de nível e de capital
+def clientes_summary(db_name=database.CLIENTES_DB):
+    def read():
+        rows = database.fetch_all(db_name, '''
+            SELECT investidor, capital, clientes, patrimonio, valor_virtus FROM clientes_summary
+        ''')
+        niveis = list(alocacao_engine.NIVEIS_CAPITAL)
+        return sorted(rows, key=lambda row: (niveis.index(row[0]) if row[0] in niveis else len(niveis),
+                                             capital_order(row[1])))
+    return query_cache.cached(db_name, ('clientes_summary',), read)
+
+
+# Ordem de um nível de capital ('20mil' < '1milhão'); valores desconhecidos vão para o fim
+def capital_order(capital):
+    try:
+        return alocacao_engine.valor_capital(capital)
+    except ValueError:
+        return float('inf')
+
+
+# Função para ler a contagem de perfis por valor de um atributo
+def profile_counts(attribute, db_name=database.PROFILES_DB):
+    return query_cache.cached(db_name, ('profile_tag_counts', attribute), lambda: database.fetch_all(db_name, '''
+        SELECT value, profiles FROM profile_tag_counts WHERE attribute = ? ORDER BY profiles DESC, value
+    ''', (attribute,)))
@@ -0,0 +1,23 @@
+import os
+import sys
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+import migrations
+import group_commit
+
+
+# Bancos vazios e migrados num diretório temporário (os nomes dos bancos são
+# caminhos relativos, então basta mudar o diretório de trabalho)
+@pytest.fixture
+def databases(tmp_path, monkeypatch):
+    database.close_all()
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(migrations, '_migrated', set())
+    for db_name in migrations.MIGRATIONS:
+        migrations.ensure_migrated(db_name)
+    yield tmp_path
+    group_commit.close_all()
+    database.close_all()
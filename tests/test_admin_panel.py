@@ -0,0 +1,56 @@
+import os
+import gzip
+import time
+import sqlite3
+import database
+import admin_panel
+
+
+def insert_clientes(names):
+    with database.transaction(database.CLIENTES_DB) as conn:
+        conn.executemany("INSERT INTO clientes (nome, email) VALUES (?, ?)",
+                         [(name, f"{name.lower().replace(' ', '.')}@x.com") for name in names])
+
+
+def walk_pages(filters, descending, page_size):
+    ids, after_id = [], None
+    while True:
+        df = admin_panel.fetch_page(database.CLIENTES_DB, 'clientes', filters, after_id=after_id,
+                                    descending=descending, page_size=page_size)
+        if df.empty:
+            return ids
+        ids.extend(df['id'].tolist())
+        after_id = int(df['id'].iloc[-1])
+
+
+def test_keyset_pages_cover_every_row_once_in_order(databases):
+    insert_clientes([f"Cliente {n}" for n in range(23)])
+    ascending = walk_pages({}, descending=False, page_size=5)
+    assert ascending == sorted(ascending) and len(ascending) == 23
+    assert walk_pages({}, descending=True, page_size=5) == ascending[::-1]
+
+
+def test_prefix_filters_match_only_the_prefix(databases):
+    insert_clientes(["Ana", "Ana Maria", "Anabela", "Mariana", "Bruno"])
+    filters = {'nome': 'Ana', 'email': ''}
+    names = admin_panel.fetch_page(database.CLIENTES_DB, 'clientes', filters, page_size=2)['nome'].tolist()
+    assert names == ["Ana", "Ana Maria"]
+    assert admin_panel.count_rows(database.CLIENTES_DB, 'clientes', filters) == 3
+    assert len(walk_pages(filters, descending=True, page_size=2)) == 3
+
+
+def test_database_export_is_written_to_the_served_directory(databases, monkeypatch):
+    monkeypatch.setattr(admin_panel, 'EXPORT_DIR', str(databases / 'static' / 'exports'))
+    insert_clientes(['Ana', 'Bia'])
+    path, url, file_name = admin_panel.download_database(database.CLIENTES_DB, 'gzip')
+
+    assert file_name == 'clientes.db.gz'
+    assert url.startswith('app/static/exports/') and url.endswith('/clientes.db.gz')
+    copy = databases / 'copia.db'
+    copy.write_bytes(gzip.decompress(open(path, 'rb').read()))
+    conn = sqlite3.connect(copy)
+    assert conn.execute("SELECT COUNT(*) FROM clientes").fetchone() == (2,)
+    conn.close()
+
+    admin_panel.remove_old_exports(now=time.time() + admin_panel.EXPORT_TTL + 1)
+    assert not os.path.exists(path)
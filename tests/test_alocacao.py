@@ -0,0 +1,65 @@
+import pytest
+import database
+import alocacao
+
+# Valores da tabela fixa que o Investidor.py usava antes do motor de alocação
+# (Valor em Patrimônio e a parte da Virtus de cada rótulo de capital)
+TABELA_ANTIGA = {
+    '20mil': (60000, 2000), '40mil': (120000, 4000), '60mil': (180000, 6000),
+    '80mil': (240000, 8000), '100mil': (300000, 10000), '200mil': (600000, 20000),
+    '400mil': (1200000, 40000), '600mil': (1800000, 60000), '800mil': (2400000, 80000),
+    '1milhão': (3000000, 100000),
+}
+
+
+def test_legacy_labels_keep_the_old_allocation():
+    for investidor, capitais in alocacao.NIVEIS_CAPITAL.items():
+        for capital in capitais:
+            resultado = alocacao.alocacao_por_nivel(investidor, capital)
+            valor = alocacao.valor_capital(capital)
+            patrimonio, virtus = TABELA_ANTIGA[capital]
+            assert list(resultado) == list(alocacao.ROTULOS)
+            assert resultado['Valor em Patrimônio'] == patrimonio
+            assert resultado['10% para o valor de investimento na Virtus'] == virtus
+            assert resultado['30% para reserva de emergência'] == valor * 30 / 100
+            assert resultado['20% para custos de tráfego'] == valor * 20 / 100
+            assert resultado['15% para infraestrutura'] == valor * 15 / 100
+
+
+def test_projection_matches_single_allocation():
+    capitais = alocacao.NIVEIS_CAPITAL['Inicial']
+    matriz = alocacao.projetar_cenarios(['Inicial'] * len(capitais), capitais)
+    for linha, capital in zip(matriz.tolist(), capitais):
+        assert linha == [float(parte) for parte in alocacao.calcular_alocacao(capital).values()]
+
+
+def test_invalid_capital_is_rejected():
+    with pytest.raises(ValueError):
+        alocacao.valor_capital('muito')
+    with pytest.raises(ValueError):
+        alocacao.alocacao_por_nivel('Avançado', '20mil')
+
+
+def test_odd_capital_is_rounded_to_centavos_the_same_way_for_every_type():
+    esperado = {'Valor em Patrimônio': 3000.03, '10% para o valor de investimento na Virtus': 100.0,
+                '30% para reserva de emergência': 300.0, '10% para custos de abertura': 100.0,
+                '20% para custos de tráfego': 200.0, '15% para Treinamento Empresarial': 150.0,
+                '15% para infraestrutura': 150.0}
+    assert alocacao.calcular_alocacao(1000.01) == esperado
+    assert alocacao.calcular_alocacao('1000,01') == esperado
+    assert alocacao.calcular_alocacao(1003) == alocacao.calcular_alocacao(1003.0) == alocacao.calcular_alocacao('1003')
+    assert alocacao.calcular_alocacao(1003)['15% para infraestrutura'] == 150.45
+    for capital in (1003, 1000.01, 0.07, 12345.67):
+        assert alocacao.projetar([capital]).tolist() == [list(alocacao.calcular_alocacao(capital).values())]
+
+
+def test_recalculation_skips_invalid_capital(databases):
+    with database.transaction(database.CLIENTES_DB) as conn:
+        conn.executemany("INSERT INTO clientes (nome, capital) VALUES (?, ?)",
+                         [('Ana', '20mil'), ('Bia', None), ('Caio', 'muito'), ('Duda', '1milhão')])
+
+    resumo = alocacao.recalcular_clientes()
+    assert (resumo['updated'], resumo['error_count']) == (2, 2)
+    assert [erro['id'] for erro in resumo['errors']] == [2, 3]
+    assert database.fetch_all(database.CLIENTES_DB, "SELECT nome, patrimonio FROM clientes ORDER BY id") == [
+        ('Ana', 60000.0), ('Bia', None), ('Caio', None), ('Duda', 3000000.0)]
@@ -0,0 +1,57 @@
+import sqlite3
+import pyarrow.parquet as pq
+import database
+import migrations
+import analytics_export
+
+
+def current_rows(output_dir):
+    rows = pq.read_table(output_dir / 'profiles').to_pylist()
+    latest = {}
+    for row in sorted(rows, key=lambda row: row['_change_seq']):
+        latest[row['id']] = row
+    return {row_id: row for row_id, row in latest.items() if not row['_deleted']}
+
+
+def test_updated_and_deleted_rows_are_exported_again(databases):
+    output_dir = databases / 'analytics'
+    with database.transaction(database.PROFILES_DB) as conn:
+        conn.executemany("INSERT INTO profiles (company_name, email) VALUES (?, ?)",
+                         [('A', 'a@example.com'), ('B', 'b@example.com'), ('C', 'c@example.com')])
+    assert analytics_export.export_all(str(output_dir))['profiles'] == 3
+
+    database.execute(database.PROFILES_DB, "UPDATE profiles SET logo_path = 'drive-id' WHERE company_name = 'A'")
+    database.execute(database.PROFILES_DB, "DELETE FROM profiles WHERE company_name = 'B'")
+    assert analytics_export.export_all(str(output_dir))['profiles'] == 2
+    assert analytics_export.export_all(str(output_dir))['profiles'] == 0
+
+    rows = current_rows(output_dir)
+    assert sorted(row['company_name'] for row in rows.values()) == ['A', 'C']
+    assert [row['logo_path'] for row in rows.values() if row['company_name'] == 'A'] == ['drive-id']
+    assert database.fetch_all(database.PROFILES_DB, "SELECT COUNT(*) FROM row_changes") == [(0,)]
+
+
+def test_rows_from_before_the_change_log_are_exported(tmp_path, monkeypatch):
+    database.close_all()
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(migrations, '_migrated', set())
+    conn = sqlite3.connect(database.PROFILES_DB)
+    conn.execute("CREATE TABLE profiles (id INTEGER PRIMARY KEY AUTOINCREMENT, company_name TEXT)")
+    conn.executemany("INSERT INTO profiles (company_name) VALUES (?)", [('A',), ('B',)])
+    conn.commit()
+    conn.close()
+    try:
+        assert analytics_export.export_table('profiles', database.PROFILES_DB, str(tmp_path)) == 2
+        assert sorted(row['company_name'] for row in current_rows(tmp_path).values()) == ['A', 'B']
+        assert analytics_export.load_watermarks(str(tmp_path))['profiles']['seq'] == 2
+    finally:
+        database.close_all()
+
+
+def test_change_log_keeps_one_entry_per_row(databases):
+    profile_id = database.execute(database.PROFILES_DB, "INSERT INTO profiles (company_name) VALUES ('A')")
+    for n in range(5):
+        database.execute(database.PROFILES_DB, "UPDATE profiles SET context = ? WHERE id = ?", (str(n), profile_id))
+    rows = database.fetch_all(database.PROFILES_DB, "SELECT table_name, row_id, seq FROM row_changes")
+    assert [(table_name, row_id) for table_name, row_id, _ in rows] == [('profiles', profile_id)]
+    assert rows[0][2] == 6
@@ -0,0 +1,70 @@
+import io
+import json
+import database
+import bulk_import
+
+
+def csv_file(lines):
+    return io.BytesIO('\n'.join(lines).encode('utf-8'))
+
+
+def test_invalid_capital_is_a_row_error(databases):
+    file = csv_file([
+        'nome,email,capital',
+        'Ana,ana@example.com,60000',
+        'Bruno,bruno@example.com,vinte',
+        'Carla,carla@example.com,100 mil',
+    ])
+    summary = bulk_import.import_file(database.CLIENTES_DB, 'clientes', file, 'clientes.csv')
+
+    assert summary['inserted'] == 2
+    assert summary['error_count'] == 1
+    assert summary['errors'][0]['linha'] == 3
+    assert summary['errors'][0]['erro'].startswith('capital:')
+    rows = database.fetch_all(database.CLIENTES_DB, "SELECT nome, reserva_emergencia FROM clientes ORDER BY nome")
+    assert [nome for nome, _ in rows] == ['Ana', 'Carla']
+    assert all(reserva is not None for _, reserva in rows)
+
+
+def test_profile_import_keeps_current_columns(databases):
+    file = csv_file([
+        'company_name;email;city;market_segment;website_no_site',
+        'Empresa;contato@empresa.com;Curitiba;Saúde, Educação;sim',
+    ])
+    summary = bulk_import.import_file(database.PROFILES_DB, 'profiles', file, 'perfis.csv')
+
+    assert summary['inserted'] == 1
+    assert summary['ignored_columns'] == []
+    assert database.fetch_all(database.PROFILES_DB, "SELECT city, market_segment, website_no_site FROM profiles") == [
+        ('Curitiba', json.dumps(['Saúde', 'Educação']), 1)]
+
+
+def test_rows_are_read_outside_the_write_transaction(databases):
+    def rows():
+        for number in range(3):
+            # Com o lock de escrita reservado pela importação, esta gravação esperaria o busy_timeout
+            database.execute(database.PROFILES_DB, "INSERT INTO profiles (company_name) VALUES (?)",
+                             (f"Formulário {number}",))
+            yield number + 2, {'company_name': f"Planilha {number}"}
+
+    summary = bulk_import.import_rows(database.PROFILES_DB, 'profiles', rows())
+    assert summary['inserted'] == 3
+    assert database.fetch_all(database.PROFILES_DB, "SELECT COUNT(*) FROM profiles") == [(6,)]
+
+
+def test_reimport_keeps_flags_of_existing_leads(databases):
+    database.execute(database.PROFILES_DB, '''
+        INSERT INTO profiles (company_name, email, email_key, no_physical_address, market_analysis, website_no_site)
+        VALUES (?, ?, ?, 1, 1, 1)
+    ''', ('Empresa', 'contato@empresa.com', 'contato@empresa.com'))
+    file = csv_file([
+        'company_name,email,city',
+        'Empresa,contato@empresa.com,Curitiba',
+        'Nova,nova@empresa.com,Recife',
+    ])
+    summary = bulk_import.import_file(database.PROFILES_DB, 'profiles', file, 'perfis.csv')
+
+    assert (summary['inserted'], summary['updated']) == (1, 1)
+    assert database.fetch_all(database.PROFILES_DB, '''
+        SELECT company_name, city, no_physical_address, market_analysis, website_no_site FROM profiles ORDER BY id
+    ''') == [('Empresa', 'Curitiba', 1, 1, 1), ('Nova', 'Recife', 0, 0, 0)]
@@ -0,0 +1,83 @@
+import io
+import os
+import hashlib
+import pytest
+import drive
+import chunked_upload
+import fake_drive
+
+PART_SIZE = 256 * 1024
+
+
+@pytest.fixture
+def service(tmp_path, monkeypatch):
+    # Partes pequenas para os testes serem rápidos, sem espera entre as tentativas
+    monkeypatch.setattr(chunked_upload, 'PART_SIZE', PART_SIZE)
+    monkeypatch.setattr(chunked_upload, 'LARGE_FILE', 4 * PART_SIZE)
+    monkeypatch.setattr(drive.time, 'sleep', lambda seconds: None)
+    return fake_drive.FakeDriveService(root=str(tmp_path / 'drive'))
+
+
+# Arquivo de teste com tamanho que não é múltiplo da parte
+def video(size=6 * PART_SIZE + 1234):
+    stream = io.BytesIO(os.urandom(size))
+    stream.name = 'video.mp4'
+    return stream
+
+
+def stored(service, file_id):
+    with open(os.path.join(service.root, file_id), 'rb') as f:
+        return f.read()
+
+
+# Faz as primeiras chamadas de um método do serviço falharem
+def fail_first(monkeypatch, target, name, failures):
+    original = getattr(target, name)
+    calls = {'count': 0}
+
+    def flaky(*args):
+        calls['count'] += 1
+        if calls['count'] <= failures:
+            raise ConnectionError("falha simulada")
+        return original(*args)
+    monkeypatch.setattr(target, name, flaky)
+    return calls
+
+
+def test_prefetching_reader_rereads_earlier_parts():
+    data = os.urandom(5 * PART_SIZE + 10)
+    reader = chunked_upload.PrefetchingReader(io.BytesIO(data), len(data), part_size=PART_SIZE)
+    try:
+        assert reader.read(PART_SIZE + 5) == data[:PART_SIZE + 5]
+        assert reader.read(3 * PART_SIZE) == data[PART_SIZE + 5:4 * PART_SIZE + 5]
+        # Nova tentativa de uma parte já enviada: volta a posição e relê
+        reader.seek(10)
+        assert reader.read(PART_SIZE) == data[10:PART_SIZE + 10]
+        reader.seek(4 * PART_SIZE + 5)
+        assert reader.read() == data[4 * PART_SIZE + 5:]
+        assert reader.md5() == hashlib.md5(data).hexdigest()
+    finally:
+        reader.close()
+
+
+def test_pipelined_upload_matches_md5(service):
+    pytest.importorskip('googleapiclient.http')
+    stream = video()
+    file_id = chunked_upload.upload(service, stream, 'video.mp4')
+    assert stored(service, file_id) == stream.getvalue()
+
+
+def test_pipelined_upload_resumes_failed_chunks(service, monkeypatch):
+    pytest.importorskip('googleapiclient.http')
+    fail_first(monkeypatch, fake_drive.CreateRequest, 'next_chunk', 2)
+    stream = video()
+    file_id = chunked_upload.upload(service, stream, 'video.mp4')
+    assert stored(service, file_id) == stream.getvalue()
+
+
+def test_pipelined_upload_rejects_md5_mismatch(service, monkeypatch):
+    pytest.importorskip('googleapiclient.http')
+    finish = service._finish
+    monkeypatch.setattr(service, '_finish', lambda *args: dict(finish(*args), md5Checksum='0' * 32))
+    with pytest.raises(IOError, match="MD5"):
+        chunked_upload.upload(service, video(), 'video.mp4')
@@ -0,0 +1,72 @@
+import threading
+import pytest
+import database
+import group_commit
+
+
+@pytest.fixture
+def short_timeout(monkeypatch):
+    monkeypatch.setattr(group_commit, 'WRITE_TIMEOUT', 0.2)
+
+
+def insert_profile(name, wait=None, error=None):
+    def write(conn):
+        if wait is not None:
+            assert wait.wait(5)
+        if error is not None:
+            raise error
+        return conn.execute("INSERT INTO profiles (company_name) VALUES (?)", (name,)).lastrowid
+    return write
+
+
+def company_names():
+    return [name for name, in database.fetch_all(database.PROFILES_DB, "SELECT company_name FROM profiles")]
+
+
+def test_failed_write_discards(databases):
+    discarded = []
+    with pytest.raises(ValueError):
+        group_commit.write(database.PROFILES_DB, insert_profile('A', error=ValueError('inválido')),
+                           discard=lambda: discarded.append(True))
+    assert discarded == [True]
+
+
+def test_timeout_while_queued_cancels_and_discards(databases, short_timeout):
+    release = threading.Event()
+    writer = group_commit.get_writer(database.PROFILES_DB)
+    blocking = writer.submit(insert_profile('A', wait=release))
+    discarded = []
+    try:
+        with pytest.raises(TimeoutError) as raised:
+            group_commit.write(database.PROFILES_DB, insert_profile('B'), discard=lambda: discarded.append(True))
+        assert not isinstance(raised.value, group_commit.WritePending)
+        assert discarded == [True]
+    finally:
+        release.set()
+    blocking.result(5)
+    assert company_names() == ['A']
+    # O envio cancelado não conta como gravado
+    assert (writer.batches, writer.writes) == (1, 1)
+
+
+def test_timeout_while_running_keeps_files_if_committed(databases, short_timeout):
+    release = threading.Event()
+    discarded = []
+    with pytest.raises(group_commit.WritePending):
+        group_commit.write(database.PROFILES_DB, insert_profile('A', wait=release),
+                           discard=lambda: discarded.append(True))
+    release.set()
+    group_commit.close_all()
+    assert company_names() == ['A']
+    assert discarded == []
+
+
+def test_timeout_while_running_discards_if_write_fails(databases, short_timeout):
+    release = threading.Event()
+    discarded = threading.Event()
+    with pytest.raises(group_commit.WritePending):
+        group_commit.write(database.PROFILES_DB, insert_profile('A', wait=release, error=ValueError('inválido')),
+                           discard=discarded.set)
+    release.set()
+    assert discarded.wait(5)
+    assert company_names() == []
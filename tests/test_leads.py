@@ -0,0 +1,64 @@
+import json
+import sqlite3
+import database
+import leads
+import migrations
+
+
+def add_profile(data):
+    with database.transaction(database.PROFILES_DB) as conn:
+        return leads.upsert(conn, 'profiles', data)
+
+
+def profiles():
+    return database.fetch_all(database.PROFILES_DB, "SELECT id, email, phone, services FROM profiles ORDER BY id")
+
+
+def test_update_keeps_old_email_and_unions_lists(databases):
+    lead_id, _ = add_profile({'company_name': 'A', 'email': 'a@x.com', 'phone': '(11) 99999-0000',
+                              'services': ['Marketing']})
+    assert add_profile({'company_name': 'B', 'email': 'b@x.com', 'phone': '11 99999-0000',
+                        'services': ['Design']}) == (lead_id, True)
+
+    assert profiles() == [(lead_id, 'b@x.com', '11 99999-0000', json.dumps(['Marketing', 'Design']))]
+    assert database.fetch_all(database.PROFILES_DB, "SELECT key_name, key, lead_id FROM lead_aliases") == [
+        ('email_key', 'a@x.com', lead_id)]
+    # O e-mail antigo continua identificando o lead
+    assert add_profile({'company_name': 'A', 'email': 'A@X.com'}) == (lead_id, True)
+
+
+def test_merge_keeps_keys_of_removed_rows(databases):
+    first, _ = add_profile({'company_name': 'A', 'email': 'a@x.com', 'services': ['Marketing']})
+    second, _ = add_profile({'company_name': 'B', 'phone': '11 98888-0000', 'services': ['Design']})
+    assert add_profile({'company_name': 'C', 'email': 'a@x.com', 'phone': '11 98888-0000'}) == (first, True)
+
+    assert profiles() == [(first, 'a@x.com', '11 98888-0000', json.dumps(['Marketing', 'Design']))]
+
+
+def test_migration_does_not_merge_existing_duplicates(tmp_path, monkeypatch):
+    database.close_all()
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(migrations, '_migrated', set())
+    conn = sqlite3.connect(database.CLIENTES_DB)
+    # Esquema criado pelas versões antigas do Investidor.py
+    conn.execute("CREATE TABLE clientes (id INTEGER PRIMARY KEY AUTOINCREMENT, nome TEXT, telefone TEXT, "
+                 "email TEXT, investidor TEXT, capital TEXT, patrimonio REAL, valor_virtus REAL, "
+                 "reserva_emergencia REAL, custos_abertura REAL, custos_trafego REAL, "
+                 "treinamento_empresarial REAL, infraestrutura REAL)")
+    conn.executemany("INSERT INTO clientes (nome, email) VALUES (?, ?)",
+                     [('Ana', 'ana@x.com'), ('Ana Maria', 'ANA@x.com ')])
+    conn.commit()
+    conn.close()
+    try:
+        migrations.ensure_migrated(database.CLIENTES_DB)
+        assert database.fetch_all(database.CLIENTES_DB, "SELECT COUNT(*) FROM clientes") == [(2,)]
+
+        migrations.ensure_migrated(database.PROFILES_DB)
+        leads.main([])
+        assert database.fetch_all(database.CLIENTES_DB, "SELECT nome FROM clientes") == [('Ana Maria',)]
+        assert len(list(tmp_path.glob('clientes.db.antes-dedupe-*'))) == 1
+        with database.connection(database.CLIENTES_DB) as conn:
+            unique = {row[1] for row in conn.execute("PRAGMA index_list(clientes)") if row[2]}
+        assert {'idx_clientes_email_key', 'idx_clientes_phone_key'} <= unique
+    finally:
+        database.close_all()
@@ -0,0 +1,28 @@
+import os
+import json
+import subprocess
+import metrics
+
+
+def test_collect_prunes_snapshots_of_dead_processes(tmp_path, monkeypatch):
+    monkeypatch.setattr(metrics, 'METRICS_DIR', str(tmp_path))
+    dead = subprocess.Popen(['true'])
+    dead.wait()
+    operations = {'op': {'buckets': [1] + [0] * len(metrics.BUCKETS_MS), 'count': 1, 'errors': 0,
+                         'sum_ms': 0.5, 'recent': []}}
+    for name, pid in (('perfil', os.getppid()), ('perfil', dead.pid)):
+        with open(tmp_path / f"{name}-{pid}.json", 'w') as f:
+            json.dump({'app': name, 'pid': pid, 'updated_at': 0 if pid == dead.pid else 9e12,
+                       'operations': operations}, f)
+
+    assert metrics.collect()['op']['count'] == 1
+    assert sorted(os.listdir(tmp_path)) == [f"perfil-{os.getppid()}.json"]
+
+
+def test_snapshot_is_removed_at_exit(tmp_path, monkeypatch):
+    monkeypatch.setattr(metrics, 'METRICS_DIR', str(tmp_path))
+    metrics.observe('teste', 1.0)
+    metrics.flush()
+    assert os.path.exists(metrics.snapshot_path())
+    metrics.remove_snapshot()
+    assert os.listdir(tmp_path) == []
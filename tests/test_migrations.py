@@ -0,0 +1,91 @@
+import sqlite3
+import pytest
+import database
+import migrations
+import schema
+import search
+import segments
+import summaries
+
+# Esquemas criados pelas versões antigas do perfil.py e do Investidor.py
+OLD_SCHEMAS = {
+    database.PROFILES_DB: '''
+        CREATE TABLE profiles (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            company_name TEXT, website TEXT, client_type TEXT,
+            contact_name TEXT, email TEXT, phone TEXT, address TEXT,
+            no_physical_address BOOLEAN, capital TEXT, desired_revenue TEXT,
+            services TEXT, payment_methods TEXT, source TEXT, business_field TEXT,
+            business_type TEXT, context TEXT, return_time TEXT, market_analysis BOOLEAN,
+            difficulties TEXT, cnpj_or_cpf TEXT, logo_path TEXT, pdf_path TEXT,
+            video_path TEXT, employees TEXT
+        )
+    ''',
+    database.CLIENTES_DB: '''
+        CREATE TABLE clientes (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, nome TEXT, telefone TEXT, email TEXT,
+            investidor TEXT, capital TEXT, patrimonio REAL, valor_virtus REAL,
+            reserva_emergencia REAL, custos_abertura REAL, custos_trafego REAL,
+            treinamento_empresarial REAL, infraestrutura REAL
+        )
+    ''',
+}
+
+
+# Bancos com o esquema antigo e uma linha em cada, ainda sem migrar
+@pytest.fixture
+def old_databases(tmp_path, monkeypatch):
+    database.close_all()
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(migrations, '_migrated', set())
+    for db_name, statement in OLD_SCHEMAS.items():
+        conn = sqlite3.connect(db_name)
+        conn.execute(statement)
+        conn.commit()
+        conn.close()
+    conn = sqlite3.connect(database.PROFILES_DB)
+    conn.execute("INSERT INTO profiles (company_name, email, services, business_field) VALUES (?, ?, ?, ?)",
+                 ('Escola Nova', 'contato@escola.com', 'Consultoria, Treinamento', 'Educação'))
+    conn.commit()
+    conn.close()
+    conn = sqlite3.connect(database.CLIENTES_DB)
+    conn.execute("INSERT INTO clientes (nome, email, investidor, capital, patrimonio, valor_virtus) "
+                 "VALUES (?, ?, ?, ?, ?, ?)", ('Ana', 'ana@x.com', 'Inicial', '20mil', 60000, 2000))
+    conn.commit()
+    conn.close()
+    yield tmp_path
+    database.close_all()
+
+
+def test_old_databases_are_migrated_once(old_databases):
+    for db_name, steps in migrations.MIGRATIONS.items():
+        assert migrations.migrate(db_name) == [version for version, _, _ in steps]
+        assert migrations.migrate(db_name) == []
+        with database.connection(db_name) as conn:
+            for table_name in migrations.VERIFIED_TABLES[db_name]:
+                schema.verify(conn, table_name)
+
+    assert database.fetch_all(database.PROFILES_DB, "SELECT company_name, email, services FROM profiles") == [
+        ('Escola Nova', 'contato@escola.com', '["Consultoria", "Treinamento"]')]
+    assert database.fetch_all(database.CLIENTES_DB, "SELECT nome, capital, patrimonio FROM clientes") == [
+        ('Ana', '20mil', 60000.0)]
+
+    # Os índices e resumos criados pelas migrações já incluem as linhas antigas
+    assert [row['company_name'] for row in search.search_profiles('educacao')] == ['Escola Nova']
+    assert segments.find_profile_ids({'services': ['Treinamento']}) == [1]
+    assert summaries.row_count(database.PROFILES_DB, 'profiles') == 1
+    assert summaries.row_count(database.CLIENTES_DB, 'clientes') == 1
+
+
+def test_interrupted_migration_resumes(old_databases, monkeypatch):
+    steps = migrations.MIGRATIONS[database.PROFILES_DB]
+
+    def fail(conn):
+        raise sqlite3.OperationalError("interrompida")
+    monkeypatch.setitem(migrations.MIGRATIONS, database.PROFILES_DB, steps[:5] + [(6, "falha", fail)])
+    with pytest.raises(sqlite3.OperationalError):
+        migrations.migrate(database.PROFILES_DB)
+
+    monkeypatch.setitem(migrations.MIGRATIONS, database.PROFILES_DB, steps)
+    assert migrations.migrate(database.PROFILES_DB) == [version for version, _, _ in steps[5:]]
+    assert migrations.migrate(database.PROFILES_DB) == []
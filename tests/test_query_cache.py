@@ -0,0 +1,41 @@
+import sqlite3
+import database
+import query_cache
+
+
+def counting(calls, db_name):
+    def compute():
+        calls.append(1)
+        return database.fetch_all(db_name, "SELECT COUNT(*) FROM profiles")[0][0]
+    return compute
+
+
+def test_reads_are_cached_until_a_write(databases):
+    query_cache.clear()
+    calls = []
+    compute = counting(calls, database.PROFILES_DB)
+
+    assert query_cache.cached(database.PROFILES_DB, ('total',), compute) == 0
+    assert query_cache.cached(database.PROFILES_DB, ('total',), compute) == 0
+    assert len(calls) == 1
+
+    database.execute(database.PROFILES_DB, "INSERT INTO profiles (company_name) VALUES (?)", ('Empresa',))
+    assert query_cache.cached(database.PROFILES_DB, ('total',), compute) == 1
+    assert len(calls) == 2
+
+
+def test_write_from_another_connection_invalidates(databases):
+    query_cache.clear()
+    calls = []
+    compute = counting(calls, database.PROFILES_DB)
+    assert query_cache.cached(database.PROFILES_DB, ('total',), compute) == 0
+
+    # Outro aplicativo gravando no mesmo arquivo
+    conn = sqlite3.connect(database.PROFILES_DB)
+    with conn:
+        conn.execute("INSERT INTO profiles (company_name) VALUES (?)", ('Outra',))
+    conn.close()
+
+    assert query_cache.cached(database.PROFILES_DB, ('total',), compute) == 1
+    assert query_cache.cached(database.PROFILES_DB, ('total',), compute) == 1
+    assert len(calls) == 2
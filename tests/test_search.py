@@ -0,0 +1,32 @@
+import database
+import search
+
+
+def found(text):
+    return [row['id'] for row in search.search_profiles(text)]
+
+
+def test_search_ignores_accents(databases):
+    profile_id = database.execute(database.PROFILES_DB, '''
+        INSERT INTO profiles (company_name, business_field) VALUES (?, ?)
+    ''', ('Escola Nova', 'Educação infantil'))
+
+    assert found('educacao') == [profile_id]
+    assert found('EDUCAÇÃO') == [profile_id]
+    assert found('educ') == [profile_id]
+
+
+def test_triggers_follow_updates_and_deletes(databases):
+    profile_id = database.execute(database.PROFILES_DB, '''
+        INSERT INTO profiles (company_name, business_field) VALUES (?, ?)
+    ''', ('Padaria Central', 'Alimentação'))
+    assert found('padaria') == [profile_id]
+
+    database.execute(database.PROFILES_DB, "UPDATE profiles SET company_name = ? WHERE id = ?",
+                     ('Confeitaria Central', profile_id))
+    assert found('padaria') == []
+    assert found('confeitaria') == [profile_id]
+    assert found('central') == [profile_id]
+
+    database.execute(database.PROFILES_DB, "DELETE FROM profiles WHERE id = ?", (profile_id,))
+    assert found('central') == []
@@ -0,0 +1,26 @@
+import json
+import database
+import segments
+
+
+def tags(profile_id):
+    return database.fetch_all(database.PROFILES_DB, '''
+        SELECT attribute, value FROM profile_tags WHERE profile_id = ? ORDER BY attribute, value
+    ''', (profile_id,))
+
+
+def test_legacy_lists_keep_their_tags_after_updates(databases):
+    with database.transaction(database.PROFILES_DB) as conn:
+        profile_id = conn.execute('''
+            INSERT INTO profiles (company_name, services, client_type) VALUES (?, ?, ?)
+        ''', ('Empresa', 'Marketing, Vendas', json.dumps(['PJ']))).lastrowid
+        assert segments.normalize_legacy_lists(conn) == 1
+
+    expected = [('client_type', 'PJ'), ('services', 'Marketing'), ('services', 'Vendas')]
+    assert tags(profile_id) == expected
+    assert database.fetch_all(database.PROFILES_DB, "SELECT services FROM profiles WHERE id = ?",
+                              (profile_id,)) == [(json.dumps(['Marketing', 'Vendas']),)]
+
+    database.execute(database.PROFILES_DB, "UPDATE profiles SET client_type = ? WHERE id = ?",
+                     (json.dumps(['PJ', 'PF']), profile_id))
+    assert tags(profile_id) == [('client_type', 'PF')] + expected
@@ -0,0 +1,82 @@
+from collections import Counter
+import database
+import leads
+import segments
+
+
+def upsert(db_name, table_name, data):
+    with database.transaction(db_name) as conn:
+        return leads.upsert(conn, table_name, data)[0]
+
+
+# Resumo de clientes recalculado a partir da própria tabela
+def expected_clientes_summary():
+    return database.fetch_all(database.CLIENTES_DB, '''
+        SELECT COALESCE(investidor, ''), COALESCE(capital, ''), COUNT(*),
+               COALESCE(SUM(patrimonio), 0), COALESCE(SUM(valor_virtus), 0)
+        FROM clientes GROUP BY 1, 2 ORDER BY 1, 2
+    ''')
+
+
+def assert_clientes_consistent():
+    assert database.fetch_all(database.CLIENTES_DB, '''
+        SELECT investidor, capital, clientes, patrimonio, valor_virtus FROM clientes_summary ORDER BY 1, 2
+    ''') == expected_clientes_summary()
+    assert database.fetch_all(database.CLIENTES_DB, "SELECT rows FROM table_counts WHERE table_name = 'clientes'") \
+        == database.fetch_all(database.CLIENTES_DB, "SELECT COUNT(*) FROM clientes")
+
+
+# Contagem de perfis por tag recalculada a partir das listas em profiles
+def assert_profiles_consistent():
+    columns = ', '.join(segments.SEGMENT_ATTRIBUTES)
+    expected = Counter()
+    for row in database.fetch_all(database.PROFILES_DB, f"SELECT {columns} FROM profiles"):
+        for attribute, raw in zip(segments.SEGMENT_ATTRIBUTES, row):
+            expected.update((attribute, value) for value in set(segments.split_values(raw)))
+    counts = database.fetch_all(database.PROFILES_DB, "SELECT attribute, value, profiles FROM profile_tag_counts")
+    assert {(attribute, value): profiles for attribute, value, profiles in counts} == dict(expected)
+    assert database.fetch_all(database.PROFILES_DB, "SELECT rows FROM table_counts WHERE table_name = 'profiles'") \
+        == database.fetch_all(database.PROFILES_DB, "SELECT COUNT(*) FROM profiles")
+
+
+def test_clientes_summary_follows_upsert_merge_and_delete(databases):
+    ana = upsert(database.CLIENTES_DB, 'clientes', {'nome': 'Ana', 'email': 'ana@x.com', 'investidor': 'Inicial',
+                                                    'capital': '20mil', 'patrimonio': 60000, 'valor_virtus': 2000})
+    upsert(database.CLIENTES_DB, 'clientes', {'nome': 'Bia', 'telefone': '11 97777-0000', 'investidor': 'Inicial',
+                                              'capital': '40mil', 'patrimonio': 120000, 'valor_virtus': 4000})
+    assert_clientes_consistent()
+
+    # Atualização do mesmo lead muda o nível de capital
+    assert upsert(database.CLIENTES_DB, 'clientes', {'email': 'ANA@x.com', 'capital': '60mil',
+                                                     'patrimonio': 180000, 'valor_virtus': 6000}) == ana
+    assert_clientes_consistent()
+
+    # Um envio com o e-mail de um e o telefone do outro junta os dois leads
+    upsert(database.CLIENTES_DB, 'clientes', {'nome': 'Ana B.', 'email': 'ana@x.com', 'telefone': '11 97777-0000',
+                                              'investidor': 'Intermediário', 'capital': '200mil',
+                                              'patrimonio': 600000, 'valor_virtus': 20000})
+    assert database.fetch_all(database.CLIENTES_DB, "SELECT COUNT(*) FROM clientes") == [(1,)]
+    assert_clientes_consistent()
+
+    database.execute(database.CLIENTES_DB, "DELETE FROM clientes")
+    assert_clientes_consistent()
+    assert database.fetch_all(database.CLIENTES_DB, "SELECT COUNT(*) FROM clientes_summary") == [(0,)]
+
+
+def test_profile_counts_follow_upsert_merge_and_delete(databases):
+    first = upsert(database.PROFILES_DB, 'profiles', {'company_name': 'A', 'email': 'a@x.com',
+                                                      'services': ['Marketing'], 'client_type': ['MEI']})
+    upsert(database.PROFILES_DB, 'profiles', {'company_name': 'B', 'phone': '11 98888-0000',
+                                              'services': ['Design', 'Marketing']})
+    assert_profiles_consistent()
+
+    assert upsert(database.PROFILES_DB, 'profiles', {'email': 'a@x.com', 'services': ['Consultoria']}) == first
+    assert_profiles_consistent()
+
+    upsert(database.PROFILES_DB, 'profiles', {'company_name': 'C', 'email': 'a@x.com', 'phone': '11 98888-0000'})
+    assert database.fetch_all(database.PROFILES_DB, "SELECT COUNT(*) FROM profiles") == [(1,)]
+    assert_profiles_consistent()
+
+    database.execute(database.PROFILES_DB, "DELETE FROM profiles")
+    assert_profiles_consistent()
+    assert database.fetch_all(database.PROFILES_DB, "SELECT COUNT(*) FROM profile_tag_counts") == [(0,)]
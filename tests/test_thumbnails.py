@@ -0,0 +1,29 @@
+import os
+import thumbnails
+
+
+def write(path, size):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(b'x' * size)
+    return path
+
+
+def test_cache_is_scanned_only_when_the_limit_is_crossed(tmp_path, monkeypatch):
+    monkeypatch.setattr(thumbnails, 'THUMBNAIL_DIR', str(tmp_path / 'thumbnails'))
+    monkeypatch.setattr(thumbnails, 'CACHE_MAX_BYTES', 1000)
+    monkeypatch.setattr(thumbnails, '_cache_bytes', None)
+    scans = []
+    walk = os.walk
+    monkeypatch.setattr(thumbnails.os, 'walk', lambda top: scans.append(top) or walk(top))
+
+    for n in range(9):
+        thumbnails.track([write(thumbnails.cache_path(f"{n:02d}" * 32, 'thumb'), 100)])
+    # Só a primeira miniatura varre o diretório; as outras somam ao contador
+    assert len(scans) == 1
+    assert thumbnails._cache_bytes == 900
+
+    thumbnails.track([write(thumbnails.cache_path('aa' * 32, 'thumb'), 200)])
+    assert len(scans) == 2
+    assert thumbnails._cache_bytes <= 900
+    assert os.path.exists(thumbnails.cache_path('aa' * 32, 'thumb'))
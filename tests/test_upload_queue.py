@@ -0,0 +1,99 @@
+import io
+import os
+import sqlite3
+import pytest
+import database
+import upload_queue
+
+
+class FailingService:
+    def files(self):
+        raise ConnectionError("sem conexão")
+
+
+def spooled_profile(monkeypatch, tmp_path):
+    monkeypatch.setattr(upload_queue, 'OUTBOX_DIR', str(tmp_path / 'outbox'))
+    monkeypatch.setattr(upload_queue, 'MAX_ATTEMPTS', 1)
+    file = io.BytesIO(b'%PDF-1.4 conteudo')
+    file.name = 'proposta.pdf'
+    uploads = {'pdf_path': upload_queue.spool_file(file, size=17)}
+    reference = upload_queue.pending_reference(uploads['pdf_path'])
+    with database.transaction(database.PROFILES_DB) as conn:
+        profile_id = conn.execute("INSERT INTO profiles (company_name, pdf_path) VALUES (?, ?)",
+                                  ('Empresa', reference)).lastrowid
+        upload_queue.enqueue(conn, profile_id, uploads)
+    upload_queue.drain(FailingService(), db_name=database.PROFILES_DB)
+    return profile_id, uploads['pdf_path']
+
+
+def test_failed_job_is_listed_and_requeued(databases, monkeypatch):
+    _, spooled = spooled_profile(monkeypatch, databases)
+    jobs = upload_queue.failed_jobs()
+    assert [job['file_name'] for job in jobs] == ['proposta.pdf']
+    assert os.path.exists(spooled['spool_path'])
+
+    assert upload_queue.requeue([jobs[0]['id']]) == 1
+    assert upload_queue.failed_jobs() == []
+    assert upload_queue.upload_progress([spooled['token']])[spooled['token']][0] == 'pending'
+
+
+def test_discard_failed_removes_spool_and_reference(databases, monkeypatch):
+    profile_id, spooled = spooled_profile(monkeypatch, databases)
+    job_id = upload_queue.failed_jobs()[0]['id']
+
+    assert upload_queue.discard_failed([job_id]) == 1
+    assert not os.path.exists(spooled['spool_path'])
+    assert upload_queue.failed_jobs() == []
+    assert database.fetch_all(database.PROFILES_DB, "SELECT pdf_path FROM profiles WHERE id = ?",
+                              (profile_id,)) == [(None,)]
+
+
+def test_expired_lease_counts_as_attempt(databases, monkeypatch):
+    monkeypatch.setattr(upload_queue, 'OUTBOX_DIR', str(databases / 'outbox'))
+    monkeypatch.setattr(upload_queue, 'MAX_ATTEMPTS', 2)
+    file = io.BytesIO(b'conteudo')
+    file.name = 'logo.png'
+    spooled = upload_queue.spool_file(file, size=8)
+    with database.transaction(database.PROFILES_DB) as conn:
+        upload_queue.enqueue(conn, 1, {'logo_path': spooled})
+
+    assert upload_queue.claim_next()['attempts'] == 0
+    expire = "UPDATE upload_outbox SET claimed_at = 0"
+    database.execute(database.PROFILES_DB, expire)
+    assert upload_queue.claim_next()['attempts'] == 1
+    database.execute(database.PROFILES_DB, expire)
+    assert upload_queue.claim_next() is None
+    assert upload_queue.failed_jobs()[0]['attempts'] == 2
+
+
+def test_drive_id_is_kept_when_complete_fails(databases, monkeypatch):
+    monkeypatch.setattr(upload_queue, 'OUTBOX_DIR', str(databases / 'outbox'))
+    monkeypatch.setattr(upload_queue, 'COMPLETE_RETRIES', 0)
+    file = io.BytesIO(b'conteudo')
+    file.name = 'logo.png'
+    spooled = upload_queue.spool_file(file, size=8)
+    with database.transaction(database.PROFILES_DB) as conn:
+        profile_id = conn.execute("INSERT INTO profiles (company_name, logo_path) VALUES (?, ?)",
+                                  ('Empresa', upload_queue.pending_reference(spooled))).lastrowid
+        upload_queue.enqueue(conn, profile_id, {'logo_path': spooled})
+
+    uploads = []
+    monkeypatch.setattr(upload_queue.chunked_upload, 'upload_file',
+                        lambda *args, **kwargs: uploads.append(args) or 'drive-1')
+    real_complete = upload_queue.complete
+
+    def locked(*args):
+        raise sqlite3.OperationalError("database is locked")
+
+    monkeypatch.setattr(upload_queue, 'complete', locked)
+    with pytest.raises(sqlite3.OperationalError):
+        upload_queue.process(None, upload_queue.claim_next())
+
+    monkeypatch.setattr(upload_queue, 'complete', real_complete)
+    database.execute(database.PROFILES_DB, "UPDATE upload_outbox SET claimed_at = 0")
+    job = upload_queue.claim_next()
+    assert job['drive_id'] == 'drive-1'
+    assert upload_queue.process(None, job)
+    assert len(uploads) == 1
+    assert database.fetch_all(database.PROFILES_DB, "SELECT logo_path FROM profiles WHERE id = ?",
+                              (profile_id,)) == [('drive-1',)]
@@ -0,0 +1,305 @@
+import os
+import io
+import time
+import base64
+import atexit
+import argparse
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import database
+import metrics
+
+# Miniaturas e prévias dos logotipos.
+# Cada imagem é decodificada uma vez, num pool de processos (a decodificação
+# e o redimensionamento ocupam a CPU e não liberam o GIL), e as versões
+# reduzidas ficam num cache em disco endereçado pelo SHA-256 do original:
+#
+#     thumbnails/<sha256[:2]>/<sha256>_<variante>.webp
+#
+# O painel administrativo lê só as miniaturas; os originais (no Drive ou em
+# logos/) não são baixados nem abertos. Quando o cache passa de
+# THUMBNAIL_CACHE_MB, os arquivos usados há mais tempo são apagados. Para
+# gerar as miniaturas de um diretório:
+#
+#     python thumbnails.py logos
+
+THUMBNAIL_DIR = os.getenv('THUMBNAIL_DIR', 'thumbnails')
+# Tamanho máximo do cache em disco
+CACHE_MAX_BYTES = int(os.getenv('THUMBNAIL_CACHE_MB', '256')) * 1024 * 1024
+# Processos do pool de geração
+POOL_WORKERS = int(os.getenv('THUMBNAIL_WORKERS', str(min(4, os.cpu_count() or 1))))
+# Imagens maiores que isto (pixels) não são decodificadas
+MAX_PIXELS = 40_000_000
+
+# Variantes: nome -> (lado máximo em pixels, qualidade WebP)
+VARIANTS = {
+    'thumb': (96, 80),
+    'preview': (640, 85),
+}
+
+# Extensões tratadas como imagem em diretórios locais
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.webp', '.gif', '.bmp')
+# Colunas de profiles com imagens
+IMAGE_COLUMNS = ('logo_path',)
+# Variáveis por consulta "IN (...)"
+LOOKUP_CHUNK_SIZE = 900
+
+_pool = None
+_pool_lock = threading.Lock()
+_pending = set()
+# Tamanho do cache conhecido por este processo (None até a primeira varredura)
+_cache_bytes = None
+_cache_lock = threading.Lock()
+
+
+# Função para montar o caminho de uma variante no cache
+def cache_path(sha256, variant):
+    return os.path.join(THUMBNAIL_DIR, sha256[:2], f"{sha256}_{variant}.webp")
+
+
+# Função para gerar as variantes de uma imagem (roda nos processos do pool).
+# source é o conteúdo (bytes) ou o caminho do original. Cada arquivo é gravado
+# num temporário e renomeado, então um leitor nunca vê uma imagem pela metade.
+def render(source, sha256, cache_dir=THUMBNAIL_DIR):
+    from PIL import Image, ImageOps
+
+    Image.MAX_IMAGE_PIXELS = MAX_PIXELS
+    with Image.open(io.BytesIO(source) if isinstance(source, bytes) else source) as image:
+        image.draft('RGB', (max(size for size, _ in VARIANTS.values()),) * 2)
+        image = ImageOps.exif_transpose(image)
+        image = image.convert('RGBA' if 'A' in image.getbands() or 'transparency' in image.info else 'RGB')
+        written = {}
+        for variant, (size, quality) in VARIANTS.items():
+            resized = image.copy()
+            resized.thumbnail((size, size), Image.LANCZOS)
+            path = os.path.join(cache_dir, sha256[:2], f"{sha256}_{variant}.webp")
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            resized.save(tmp_path, 'WEBP', quality=quality, method=4)
+            os.replace(tmp_path, path)
+            written[variant] = path
+    return written
+
+
+# Função para obter o pool de processos (criado uma vez por processo).
+# Usa "spawn": os aplicativos têm threads (workers, escritor do group commit)
+# e um fork copiaria locks no meio do uso.
+def get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ProcessPoolExecutor(POOL_WORKERS, mp_context=multiprocessing.get_context('spawn'))
+    return _pool
+
+
+# Função para pedir as variantes de uma imagem sem esperar por elas.
+# Conteúdos que já estão no cache (ou já foram pedidos) não são gerados de novo.
+# Retorna o Future da geração, ou None se não há nada a fazer.
+def submit(source, sha256):
+    if has_thumbnail(sha256):
+        return None
+    with _pool_lock:
+        if sha256 in _pending:
+            return None
+        _pending.add(sha256)
+    started = time.perf_counter()
+    future = get_pool().submit(render, source, sha256, THUMBNAIL_DIR)
+
+    def done(future):
+        with _pool_lock:
+            _pending.discard(sha256)
+        metrics.observe('thumbnails.render', (time.perf_counter() - started) * 1000,
+                        error=future.exception() is not None)
+        if future.exception() is None:
+            track(future.result().values())
+    future.add_done_callback(done)
+    return future
+
+
+# Função para pedir as variantes de um arquivo enviado pelo formulário
+def submit_upload(file, sha256):
+    file.seek(0)
+    data = file.read()
+    file.seek(0)
+    return submit(data, sha256)
+
+
+# Função para saber se as variantes de um conteúdo já estão no cache
+def has_thumbnail(sha256):
+    return all(os.path.exists(cache_path(sha256, variant)) for variant in VARIANTS)
+
+
+# Função para ler uma variante do cache como data URI (ou None se não existe).
+# A leitura atualiza a data de modificação, usada pela remoção por antiguidade.
+def data_uri(sha256, variant='thumb'):
+    path = cache_path(sha256, variant)
+    try:
+        with open(path, 'rb') as f:
+            content = f.read()
+        os.utime(path)
+    except FileNotFoundError:
+        return None
+    return "data:image/webp;base64," + base64.b64encode(content).decode('ascii')
+
+
+# Função para somar ao tamanho do cache os arquivos recém-gerados.
+# O diretório só é varrido (evict) na primeira vez e quando a soma passa do
+# limite, e não a cada miniatura. Outros processos também gravam no cache:
+# a soma deste processo fica abaixo do real e é corrigida a cada varredura.
+def track(paths):
+    global _cache_bytes
+    added = 0
+    for path in paths:
+        try:
+            added += os.stat(path).st_size
+        except FileNotFoundError:
+            continue
+    with _cache_lock:
+        if _cache_bytes is not None:
+            _cache_bytes += added
+            if _cache_bytes <= CACHE_MAX_BYTES:
+                return
+    evict()
+
+
+# Função para manter o cache abaixo de max_bytes, apagando os arquivos usados
+# há mais tempo até sobrar 90% do limite. Retorna os bytes liberados.
+def evict(max_bytes=None):
+    global _cache_bytes
+    max_bytes = CACHE_MAX_BYTES if max_bytes is None else max_bytes
+    entries, total = [], 0
+    for root, _, names in os.walk(THUMBNAIL_DIR):
+        for name in names:
+            path = os.path.join(root, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+    freed = 0
+    if total > max_bytes:
+        for _, size, path in sorted(entries):
+            if total - freed <= max_bytes * 0.9:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                continue
+            freed += size
+    with _cache_lock:
+        _cache_bytes = total - freed
+    return freed
+
+
+# Função para descobrir o SHA-256 do logotipo de cada referência gravada em profiles.
+# A referência pode ser um ID do Drive (file_index), um envio pendente
+# ("pending:<token>", upload_outbox) ou um caminho local (local_files).
+# Retorna {referência: sha256} só para as referências encontradas.
+def resolve_references(references, db_name=database.PROFILES_DB):
+    import upload_queue
+
+    references = {reference for reference in references if reference}
+    pending = {reference[len(upload_queue.PENDING_PREFIX):]: reference for reference in references
+               if reference.startswith(upload_queue.PENDING_PREFIX)}
+    others = list(references - set(pending.values()))
+    found = {}
+    with database.connection(db_name) as conn:
+        for start in range(0, len(others), LOOKUP_CHUNK_SIZE):
+            chunk = others[start:start + LOOKUP_CHUNK_SIZE]
+            placeholders = ', '.join('?' for _ in chunk)
+            found.update(conn.execute(f"SELECT drive_id, sha256 FROM file_index WHERE drive_id IN ({placeholders})",
+                                      chunk).fetchall())
+            found.update(conn.execute(f"SELECT path, sha256 FROM local_files WHERE path IN ({placeholders})",
+                                      chunk).fetchall())
+        tokens = list(pending)
+        for start in range(0, len(tokens), LOOKUP_CHUNK_SIZE):
+            chunk = tokens[start:start + LOOKUP_CHUNK_SIZE]
+            rows = conn.execute(f'''
+                SELECT token, sha256 FROM upload_outbox
+                WHERE token IN ({', '.join('?' for _ in chunk)}) AND sha256 IS NOT NULL
+            ''', chunk).fetchall()
+            found.update({pending[token]: sha256 for token, sha256 in rows})
+    return found
+
+
+# Função para montar a coluna de miniaturas de uma lista de referências.
+# Caminhos em logos/ ou uploads/ ainda desconhecidos são indexados pelo
+# file_index (só os arquivos novos ou alterados são lidos), e logotipos
+# locais sem miniatura são pedidos ao pool e aparecem na próxima
+# atualização. Originais no Drive nunca são baixados aqui.
+def thumbnail_column(references, db_name=database.PROFILES_DB):
+    import file_index
+
+    hashes = resolve_references(references, db_name)
+    unknown = {directory for reference in references if reference and reference not in hashes
+               for directory in file_index.LOCAL_DIRECTORIES
+               if reference.startswith(directory + os.sep) and is_image(reference)}
+    if unknown:
+        for directory in unknown:
+            file_index.scan_directory(directory, db_name)
+        hashes = resolve_references(references, db_name)
+    column = []
+    for reference in references:
+        sha256 = hashes.get(reference)
+        uri = data_uri(sha256) if sha256 else None
+        if uri is None and sha256 and os.path.isfile(reference) and is_image(reference):
+            submit(reference, sha256)
+        column.append(uri)
+    return column
+
+
+def is_image(path):
+    return path.lower().endswith(IMAGE_EXTENSIONS)
+
+
+# Função para gerar as miniaturas de todas as imagens de um diretório
+def generate_directory(directory):
+    import file_index
+
+    futures = []
+    for root, _, names in os.walk(directory):
+        for name in names:
+            path = os.path.join(root, name)
+            if not is_image(path):
+                continue
+            with open(path, 'rb') as f:
+                sha256, _ = file_index.hash_stream(f)
+            future = submit(path, sha256)
+            if future is not None:
+                futures.append((path, future))
+    failed = []
+    for path, future in futures:
+        if future.exception() is not None:
+            failed.append((path, future.exception()))
+    return len(futures), failed
+
+
+# Função para encerrar o pool sem esperar pelas gerações pendentes
+def shutdown():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+atexit.register(shutdown)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Gera as miniaturas e prévias das imagens de um diretório.")
+    parser.add_argument('directories', nargs='*', default=['logos'], help="diretórios com as imagens")
+    args = parser.parse_args(argv)
+    for directory in args.directories:
+        generated, failed = generate_directory(directory)
+        print(f"{directory}: {generated} imagens processadas, {len(failed)} com erro")
+        for path, error in failed:
+            print(f"  {path}: {error}")
+    shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,379 @@
+import os
+import time
+import uuid
+import random
+import shutil
+import logging
+import sqlite3
+import threading
+import database
+import chunked_upload
+import file_index
+import thumbnails
+import metrics
+
+# Fila persistente (outbox) de envios para o Google Drive.
+# O formulário grava o perfil com referências "pending:<token>" e os arquivos
+# num diretório de spool; os workers em segundo plano enviam cada arquivo,
+# tentam de novo com backoff exponencial e gravam o ID do Drive no perfil.
+
+OUTBOX_DIR = os.getenv('UPLOAD_OUTBOX_DIR', 'outbox')
+WORKERS = int(os.getenv('UPLOAD_WORKERS', '2'))
+
+# Tentativas antes de marcar o envio como falho
+MAX_ATTEMPTS = 6
+# Espera (s) antes da n-ésima nova tentativa: BACKOFF_BASE * 2 ** (n - 1)
+BACKOFF_BASE = 2.0
+# Intervalo (s) em que um worker ocioso volta a olhar a fila
+POLL_INTERVAL = 2.0
+# Tempo (s) após o qual um envio "uploading" é considerado abandonado
+LEASE_SECONDS = 15 * 60
+# Intervalo mínimo (s) entre gravações do andamento de um envio
+PROGRESS_INTERVAL = 1.0
+
+# Novas tentativas de concluir (complete) um envio já aceito pelo Drive
+COMPLETE_RETRIES = 5
+
+PENDING_PREFIX = 'pending:'
+
+# Colunas de profiles que recebem o ID do arquivo no Drive
+UPLOAD_COLUMNS = ('logo_path', 'pdf_path', 'video_path')
+
+logger = logging.getLogger(__name__)
+
+_wake = threading.Event()
+_workers = []
+_workers_lock = threading.Lock()
+
+
+# Função para criar a tabela da fila de envios
+def create_outbox_table(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS upload_outbox (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            token TEXT UNIQUE NOT NULL,
+            profile_id INTEGER NOT NULL,
+            column_name TEXT NOT NULL,
+            file_name TEXT NOT NULL,
+            spool_path TEXT NOT NULL,
+            sha256 TEXT,
+            size INTEGER,
+            status TEXT NOT NULL DEFAULT 'pending',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            next_attempt_at REAL NOT NULL DEFAULT 0,
+            claimed_at REAL,
+            drive_id TEXT,
+            last_error TEXT
+        )
+    ''')
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_upload_outbox_status
+        ON upload_outbox (status, next_attempt_at)
+    ''')
+
+
+# Função para acrescentar o andamento do envio (bytes já enviados) à fila
+def add_progress_column(conn):
+    database.add_missing_columns(conn, 'upload_outbox', {'bytes_sent': 'INTEGER NOT NULL DEFAULT 0'})
+
+
+# Função para copiar um arquivo enviado pelo formulário para o spool.
+# Retorna o token e o caminho usados depois em enqueue().
+def spool_file(file, sha256=None, size=None):
+    os.makedirs(OUTBOX_DIR, exist_ok=True)
+    token = uuid.uuid4().hex
+    name = os.path.basename(file.name)
+    spool_path = os.path.join(OUTBOX_DIR, f"{token}_{name}")
+    file.seek(0)
+    with open(spool_path, 'wb') as f:
+        shutil.copyfileobj(file, f)
+    return {'token': token, 'file_name': name, 'spool_path': spool_path, 'sha256': sha256, 'size': size}
+
+
+# Função para preparar os arquivos do formulário antes de gravar o perfil.
+# Conteúdos já enviados ao Drive reutilizam o ID existente; os demais vão
+# para o spool. As imagens também vão para o pool de miniaturas.
+# Retorna (uploads para enqueue, referências para o perfil).
+def prepare(files, db_name=database.PROFILES_DB):
+    uploads, references = {}, {}
+    for column, file in files.items():
+        if file is None:
+            continue
+        sha256, size = file_index.hash_stream(file)
+        if column in thumbnails.IMAGE_COLUMNS:
+            thumbnails.submit_upload(file, sha256)
+        drive_id = file_index.lookup(sha256, size, db_name)
+        if drive_id is not None:
+            references[column] = drive_id
+            continue
+        uploads[column] = spool_file(file, sha256, size)
+        references[column] = pending_reference(uploads[column])
+    return uploads, references
+
+
+# Função para apagar do spool arquivos que não chegaram a entrar na fila
+def discard(uploads):
+    for spooled in uploads.values():
+        if os.path.exists(spooled['spool_path']):
+            os.remove(spooled['spool_path'])
+
+
+# Função para montar a referência gravada no perfil enquanto o envio não termina
+def pending_reference(spooled):
+    return PENDING_PREFIX + spooled['token']
+
+
+# Função para registrar os envios de um perfil, na mesma transação do perfil
+def enqueue(conn, profile_id, uploads):
+    for column, spooled in uploads.items():
+        if column not in UPLOAD_COLUMNS:
+            raise ValueError(f"Coluna de upload inválida: {column}")
+        conn.execute('''
+            INSERT INTO upload_outbox (token, profile_id, column_name, file_name, spool_path, sha256, size)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', (spooled['token'], profile_id, column, spooled['file_name'], spooled['spool_path'],
+              spooled.get('sha256'), spooled.get('size')))
+
+
+# Função para avisar os workers que há envios novos
+def notify():
+    _wake.set()
+
+
+# Função para reservar o próximo envio disponível (ou None).
+# Retomar um envio "uploading" com a reserva vencida conta como uma tentativa
+# (o worker anterior caiu no meio do envio); depois de MAX_ATTEMPTS ele fica
+# "failed" em vez de ser retomado para sempre.
+def claim_next(db_name=database.PROFILES_DB):
+    now = time.time()
+    with database.transaction(db_name) as conn:
+        while True:
+            row = conn.execute('''
+                SELECT id, token, profile_id, column_name, file_name, spool_path, sha256, size, attempts,
+                    drive_id, status
+                FROM upload_outbox
+                WHERE (status = 'pending' AND next_attempt_at <= ?)
+                   OR (status = 'uploading' AND claimed_at < ?)
+                ORDER BY id LIMIT 1
+            ''', (now, now - LEASE_SECONDS)).fetchone()
+            if row is None:
+                return None
+            *row, status = row
+            if status == 'uploading':
+                row[8] += 1
+                if row[8] >= MAX_ATTEMPTS:
+                    conn.execute('''
+                        UPDATE upload_outbox SET status = 'failed', attempts = ?, claimed_at = NULL,
+                            last_error = 'reserva vencida'
+                        WHERE id = ?
+                    ''', (row[8], row[0]))
+                    continue
+            conn.execute("UPDATE upload_outbox SET status = 'uploading', claimed_at = ?, attempts = ? WHERE id = ?",
+                         (now, row[8], row[0]))
+            break
+    keys = ('id', 'token', 'profile_id', 'column_name', 'file_name', 'spool_path', 'sha256', 'size', 'attempts',
+            'drive_id')
+    return dict(zip(keys, row))
+
+
+# Função para gravar o ID do Drive no perfil e concluir o envio
+def complete(job, drive_id, db_name=database.PROFILES_DB):
+    column = job['column_name']
+    with database.transaction(db_name) as conn:
+        conn.execute('''
+            UPDATE upload_outbox SET status = 'done', drive_id = ?, bytes_sent = COALESCE(size, bytes_sent),
+                last_error = NULL
+            WHERE id = ?
+        ''', (drive_id, job['id']))
+        conn.execute(f"UPDATE profiles SET {column} = ? WHERE id = ? AND {column} = ?",
+                     (drive_id, job['profile_id'], PENDING_PREFIX + job['token']))
+        if job['sha256'] is not None:
+            file_index.register(conn, job['sha256'], job['size'], drive_id, job['file_name'])
+    if os.path.exists(job['spool_path']):
+        os.remove(job['spool_path'])
+
+
+# Função para guardar na fila o ID de um arquivo que o Drive já aceitou.
+# Se o envio for retomado depois, ele é concluído sem enviar o arquivo de novo.
+def save_drive_id(job, drive_id, db_name=database.PROFILES_DB):
+    database.execute(db_name, "UPDATE upload_outbox SET drive_id = ? WHERE id = ?", (drive_id, job['id']))
+
+
+# Função para repetir uma gravação que falhou com o banco ocupado
+def with_retries(func, *args):
+    for attempt in range(COMPLETE_RETRIES + 1):
+        try:
+            return func(*args)
+        except sqlite3.Error:
+            if attempt == COMPLETE_RETRIES:
+                raise
+            time.sleep(min(BACKOFF_BASE * 2 ** attempt, 30) * random.uniform(0.8, 1.2))
+
+
+# Função para registrar uma falha e agendar a próxima tentativa com backoff.
+# Depois de MAX_ATTEMPTS o envio fica "failed", com o arquivo ainda no spool,
+# até ser devolvido à fila (requeue) ou descartado (discard_failed) no painel.
+def fail(job, error, db_name=database.PROFILES_DB):
+    attempts = job['attempts'] + 1
+    if attempts >= MAX_ATTEMPTS:
+        status, next_attempt_at = 'failed', 0
+    else:
+        delay = BACKOFF_BASE * 2 ** (attempts - 1)
+        status, next_attempt_at = 'pending', time.time() + delay * random.uniform(0.8, 1.2)
+    database.execute(db_name, '''
+        UPDATE upload_outbox
+        SET status = ?, attempts = ?, next_attempt_at = ?, claimed_at = NULL, bytes_sent = 0, last_error = ?
+        WHERE id = ?
+    ''', (status, attempts, next_attempt_at, str(error), job['id']))
+
+
+# Função para listar os envios que esgotaram as tentativas (para o painel)
+def failed_jobs(db_name=database.PROFILES_DB):
+    rows = database.fetch_all(db_name, '''
+        SELECT id, profile_id, column_name, file_name, size, attempts, last_error FROM upload_outbox
+        WHERE status = 'failed' ORDER BY id
+    ''')
+    keys = ('id', 'profile_id', 'column_name', 'file_name', 'size', 'attempts', 'last_error')
+    return [dict(zip(keys, row)) for row in rows]
+
+
+# Função para devolver envios falhos à fila, com as tentativas zeradas.
+# Retorna quantos envios voltaram para a fila.
+def requeue(job_ids, db_name=database.PROFILES_DB):
+    job_ids = list(job_ids)
+    if not job_ids:
+        return 0
+    with database.transaction(db_name) as conn:
+        requeued = conn.execute(f'''
+            UPDATE upload_outbox SET status = 'pending', attempts = 0, next_attempt_at = 0, claimed_at = NULL
+            WHERE status = 'failed' AND id IN ({', '.join('?' for _ in job_ids)})
+        ''', job_ids).rowcount
+    notify()
+    return requeued
+
+
+# Função para desistir de envios falhos: apaga o arquivo do spool, tira a
+# referência "pending:<token>" do perfil e remove o envio da fila.
+# Retorna quantos envios foram descartados.
+def discard_failed(job_ids, db_name=database.PROFILES_DB):
+    job_ids = list(job_ids)
+    if not job_ids:
+        return 0
+    with database.transaction(db_name) as conn:
+        rows = conn.execute(f'''
+            SELECT id, token, profile_id, column_name, spool_path FROM upload_outbox
+            WHERE status = 'failed' AND id IN ({', '.join('?' for _ in job_ids)})
+        ''', job_ids).fetchall()
+        for job_id, token, profile_id, column, _ in rows:
+            if column not in UPLOAD_COLUMNS:
+                raise ValueError(f"Coluna de upload inválida: {column}")
+            conn.execute(f"UPDATE profiles SET {column} = NULL WHERE id = ? AND {column} = ?",
+                         (profile_id, PENDING_PREFIX + token))
+            conn.execute("DELETE FROM upload_outbox WHERE id = ?", (job_id,))
+    for *_, spool_path in rows:
+        if os.path.exists(spool_path):
+            os.remove(spool_path)
+    return len(rows)
+
+
+# Função para criar o callback que grava o andamento de um envio.
+# Grava no máximo a cada PROGRESS_INTERVAL e renova a reserva (claimed_at),
+# então um vídeo grande que demora mais que LEASE_SECONDS não é retomado
+# por outro worker enquanto ainda está sendo enviado.
+def record_progress(job, db_name=database.PROFILES_DB):
+    last = [0.0]
+
+    def progress(sent, total):
+        now = time.time()
+        if now - last[0] < PROGRESS_INTERVAL and sent < total:
+            return
+        last[0] = now
+        try:
+            database.execute(db_name, "UPDATE upload_outbox SET bytes_sent = ?, claimed_at = ? WHERE id = ?",
+                             (sent, now, job['id']))
+        except sqlite3.Error:
+            pass
+    return progress
+
+
+# Função para ler o andamento dos envios pelos tokens.
+# Retorna {token: (status, bytes enviados, tamanho)}.
+def upload_progress(tokens, db_name=database.PROFILES_DB):
+    tokens = list(tokens)
+    if not tokens:
+        return {}
+    rows = database.fetch_all(db_name, f'''
+        SELECT token, status, bytes_sent, size FROM upload_outbox
+        WHERE token IN ({', '.join('?' for _ in tokens)})
+    ''', tokens)
+    return {row[0]: tuple(row[1:]) for row in rows}
+
+
+# Função para enviar um arquivo reservado da fila.
+# Vídeos e outros arquivos grandes vão em partes pelo chunked_upload. Um
+# envio que o Drive já aceitou (drive_id gravado) é só concluído. Se não der
+# para concluir, o ID do Drive fica guardado na fila antes do erro subir.
+@metrics.timed('upload_queue.process')
+def process(service, job, folder_id=None, db_name=database.PROFILES_DB):
+    drive_id = job.get('drive_id')
+    if drive_id is None:
+        try:
+            drive_id = chunked_upload.upload_file(service, job['spool_path'], job['file_name'], folder_id,
+                                                  progress=record_progress(job, db_name))
+        except Exception as e:
+            fail(job, e, db_name)
+            return False
+    try:
+        with_retries(complete, job, drive_id, db_name)
+    except sqlite3.Error:
+        with_retries(save_drive_id, job, drive_id, db_name)
+        raise
+    return True
+
+
+# Função para processar de forma síncrona todos os envios disponíveis agora
+def drain(service, folder_id=None, db_name=database.PROFILES_DB):
+    processed = 0
+    while (job := claim_next(db_name)) is not None:
+        process(service, job, folder_id, db_name)
+        processed += 1
+    return processed
+
+
+# Laço de um worker. Todos os workers usam o serviço do Drive devolvido por
+# service_factory (drive.get_service é compartilhado pelo processo); depois
+# de uma falha ele é pedido de novo. Um erro num envio é registrado no log e
+# o laço continua: o envio volta para a fila quando a reserva vencer.
+def _worker_loop(service_factory, folder_id, db_name):
+    service = None
+    while True:
+        try:
+            job = claim_next(db_name)
+            if job is None:
+                _wake.wait(POLL_INTERVAL)
+                _wake.clear()
+                continue
+            try:
+                if service is None:
+                    service = service_factory()
+            except Exception as e:
+                fail(job, e, db_name)
+                continue
+            if not process(service, job, folder_id, db_name):
+                # Pede o serviço de novo depois de uma falha (conexão pode estar quebrada)
+                service = None
+        except Exception:
+            logger.exception("Erro no worker de envios ao Drive")
+            time.sleep(POLL_INTERVAL)
+
+
+# Função para iniciar o pool de workers (apenas uma vez por processo)
+def start_workers(service_factory, folder_id=None, workers=WORKERS, db_name=database.PROFILES_DB):
+    with _workers_lock:
+        if _workers:
+            return
+        for i in range(workers):
+            thread = threading.Thread(target=_worker_loop, args=(service_factory, folder_id, db_name),
+                                      name=f"upload-worker-{i}", daemon=True)
+            thread.start()
+            _workers.append(thread)